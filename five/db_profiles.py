@@ -0,0 +1,42 @@
+"""
+Database profiles for five.settings, picked with DJANGO_DB_PROFILE.
+
+Each profile adds connection settings to DATABASES['default'] and lists
+the SQLite PRAGMAs that todo.signals applies to every new connection
+(TODO_SQLITE_PRAGMAS).
+
+default      Django's defaults: rollback journal, a connection per request.
+performance  WAL so readers and writers don't block each other, fewer
+             fsyncs, a larger page cache and memory map, and persistent,
+             health-checked connections. Writes take the lock up front
+             (BEGIN IMMEDIATE) and wait for it instead of failing with
+             "database is locked".
+"""
+
+DB_PROFILES = {
+    'default': {
+        'database': {},
+        'pragmas': {},
+    },
+    'performance': {
+        'database': {
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                # Seconds to wait for a lock, as busy_timeout below
+                'timeout': 5,
+            },
+        },
+        'pragmas': {
+            'journal_mode': 'WAL',
+            # Safe with WAL: a crash can lose the last commits, never corrupt
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,
+            # Negative sizes are KiB: 64 MiB of page cache per connection
+            'cache_size': -64000,
+            'mmap_size': 256 * 1024 * 1024,
+            'temp_store': 'MEMORY',
+        },
+    },
+}
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .db_profiles import DB_PROFILES
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,6 +45,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Serves collected static files, hashed ones with far-future headers
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Brotli or gzip for every response above; keep it above anything
+    # that reads or changes the body
+    'todo.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -56,13 +64,21 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Compile each template once per process. The development
+            # server's autoreloader clears this cache when a template
+            # changes, so DEBUG doesn't need a different setting.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -73,10 +89,16 @@ WSGI_APPLICATION = 'five.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# DJANGO_DB_PROFILE=performance tunes SQLite for concurrent use; see
+# five/db_profiles.py
+
+DB_PROFILE = os.environ.get('DJANGO_DB_PROFILE', 'default')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        **DB_PROFILES[DB_PROFILE]['database'],
     }
 }
 
@@ -117,7 +139,86 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic writes content-hashed copies of each file (todo.3f2a...css)
+# plus gzip and brotli versions, and templates link to the hashed names,
+# so browsers can cache them for a year. The development server and the
+# test runner serve the unhashed files straight from the apps.
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
+
+WHITENOISE_USE_FINDERS = DEBUG
+WHITENOISE_AUTOREFRESH = DEBUG
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Todo app
+# Rows per dashboard bucket and per page of search results
+
+TODO_PAGE_SIZE = 50
+
+# PRAGMAs run on every new SQLite connection, from the database profile
+
+TODO_SQLITE_PRAGMAS = DB_PROFILES[DB_PROFILE]['pragmas']
+
+# Cache for rendered dashboard sections; swap the backend for a shared
+# cache (e.g. Redis or Memcached) when running more than one process
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'todo',
+    },
+}
+
+TODO_FRAGMENT_CACHE_ALIAS = 'default'
+TODO_FRAGMENT_CACHE_TIMEOUT = 300
+
+# Broker for the dashboard's live update events (todo/events.py). The
+# in-process one only reaches clients of the same worker; with several
+# workers use 'todo.events.CacheBroker' and a shared cache
+
+TODO_EVENTS_BROKER = 'todo.events.InProcessBroker'
+TODO_EVENTS_CACHE_ALIAS = 'default'
+TODO_EVENTS_KEEPALIVE = 15
+
+# Username of the user migration todo 0012 gives every task that existed
+# before tasks had owners; unset, they stay unowned and are what
+# anonymous requests see
+
+TODO_DEFAULT_OWNER = os.environ.get('DJANGO_TODO_DEFAULT_OWNER')
+
+# Opt-in request instrumentation: Server-Timing headers and a JSON log
+# line per request; summarize the log with "manage.py request_timings"
+
+TODO_INSTRUMENTATION = os.environ.get('DJANGO_TODO_INSTRUMENTATION') == '1'
+
+# Only requests taking at least this long are logged; 0 logs them all
+
+TODO_INSTRUMENTATION_LOG_MS = int(os.environ.get('DJANGO_TODO_INSTRUMENTATION_LOG_MS', 0))
+
+if TODO_INSTRUMENTATION:
+    MIDDLEWARE.insert(0, 'todo.instrumentation.RequestTimingMiddleware')
+    TEMPLATES[0]['BACKEND'] = 'todo.instrumentation.TimedDjangoTemplates'
+    LOGGING = {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {'message': {'format': '%(asctime)s %(message)s'}},
+        'handlers': {'instrumentation': {'class': 'logging.StreamHandler', 'formatter': 'message'}},
+        'loggers': {'todo.instrumentation': {'handlers': ['instrumentation'], 'level': 'INFO'}},
+    }
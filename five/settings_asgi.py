@@ -0,0 +1,11 @@
+"""
+Settings for serving five through ASGI (five/asgi.py).
+
+The same as five.settings except that the todo app's async views are
+routed, so requests don't each hold a thread while they wait on the
+database.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+ROOT_URLCONF = 'five.urls_async'
@@ -0,0 +1,37 @@
+"""
+Lean settings for the JSON API and management commands.
+
+The same as five.settings without the apps and middleware only the HTML
+pages need: no admin, sessions, messages or static files, and no
+templates context processors. The auth models stay, as tasks belong to
+users, but without sessions or the authentication middleware every
+request is anonymous and sees the tasks nobody owns (see todo.owners).
+Setup imports less and each request runs through less middleware, which
+is most of the wall time of a short command such as import_todos or
+archive_todos:
+
+    DJANGO_SETTINGS_MODULE=five.settings_lean python manage.py archive_todos --older-than 30
+
+The URLconf serves only the API and the export (five/urls_lean.py).
+"""
+
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'todo',
+]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'todo.compression.CompressionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+if TODO_INSTRUMENTATION:  # noqa: F405
+    MIDDLEWARE.insert(0, 'todo.instrumentation.RequestTimingMiddleware')
+
+TEMPLATES = [{**TEMPLATES[0], 'OPTIONS': {**TEMPLATES[0]['OPTIONS'], 'context_processors': []}}]  # noqa: F405
+
+ROOT_URLCONF = 'five.urls_lean'
@@ -0,0 +1,11 @@
+"""
+URL configuration for the ASGI application: five.urls with the todo app's
+async views. See five/settings_asgi.py.
+"""
+from django.contrib import admin
+from django.urls import path, include
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('', include('todo.async_urls')),
+]
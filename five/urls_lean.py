@@ -0,0 +1,13 @@
+"""
+URL configuration for five.settings_lean: the JSON API and the export,
+which need none of the apps the lean settings leave out.
+"""
+from django.urls import path
+
+from todo import api, views
+
+urlpatterns = [
+    path('export/', views.todo_export, name='todo_export'),
+    path('api/todos/', api.todo_collection, name='api_todo_collection'),
+    path('api/todos/<int:pk>/', api.todo_detail, name='api_todo_detail'),
+]
@@ -1,11 +1,160 @@
 from django.contrib import admin
-from .models import ToDo
+from django.core.paginator import Paginator
+from django.template.defaultfilters import pluralize
+from django.utils.functional import cached_property
+
+from . import counters
+from .archive import restore_todos
+from .dashboard import FUTURE, NO_DATE, OVERDUE, TODAY, bucket_conditions
+from .dates import as_of
+from .models import ArchivedToDo, Recurrence, ToDo
+from .search import count_matches, search_todos
+
+
+class CappedCountPaginator(Paginator):
+    """A paginator that never counts the whole table
+
+    The unfiltered ToDo changelist takes its total from the
+    trigger-maintained counters; anything else is counted up to
+    ``count_cap`` rows, and ``capped`` tells the template the total is a
+    lower bound. Pages past the cap are out of range.
+    """
+    count_cap = 10_000
+
+    capped = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if queryset.model is ToDo and not queryset.query.where and counters.has_counters(queryset.db):
+            return counters.total(queryset.db)
+        count = queryset.order_by()[:self.count_cap + 1].count()
+        if count > self.count_cap:
+            self.capped = True
+            return self.count_cap
+        return count
+
+
+# A term matching this many tasks is common enough that walking the
+# ordering index and testing each name with LIKE fills a page sooner
+# than sorting every FTS match
+FTS_MATCH_LIMIT = 10_000
+
+
+class DueListFilter(admin.SimpleListFilter):
+    """The dashboard's buckets, each a range on the due_date indexes"""
+    title = 'due'
+    parameter_name = 'due'
+
+    def lookups(self, request, model_admin):
+        return [(OVERDUE, 'Overdue'), (TODAY, 'Today'), (FUTURE, 'Upcoming'), (NO_DATE, 'No date')]
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        return queryset.filter(bucket_conditions(as_of(request))[self.value()])
+
+
+class OwnedAdminMixin:
+    """Superusers see every owner's rows; other staff only their own"""
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if request.user.is_superuser:
+            return queryset
+        return queryset.owned_by(request.user)
+
+
+class RecurrenceInline(admin.StackedInline):
+    model = Recurrence
+    can_delete = True
+    max_num = 1
+
 
 # Register your models here.
 @admin.register(ToDo)
-class ToDoAdmin(admin.ModelAdmin):
-    list_display = ['name', 'status', 'due_date', 'created_at']
-    list_filter = ['status', 'due_date']
+class ToDoAdmin(OwnedAdminMixin, admin.ModelAdmin):
+    list_display = ['name', 'status', 'due_date', 'overdue', 'created_at', 'owner']
+    list_filter = ['status', DueListFilter]
     search_fields = ['name']
     list_editable = ['status']
-    date_hierarchy = 'due_date'
\ No newline at end of file
+    # The bounded drill-down is in templatetags/todo_admin.py
+    date_hierarchy = 'due_date'
+    # Meta.ordering with id ascending to break ties, so the due date index
+    # returns rows already sorted (the admin's default tie-breaker is -pk)
+    ordering = ['due_date', '-created_at', 'id']
+    paginator = CappedCountPaginator
+    show_full_result_count = False
+    actions = ['mark_done', 'mark_skipped', 'mark_pending']
+    inlines = [RecurrenceInline]
+    # A select of every user would not scale
+    raw_id_fields = ['owner']
+
+    def get_readonly_fields(self, request, obj=None):
+        return [] if request.user.is_superuser else ['owner']
+
+    def save_model(self, request, obj, form, change):
+        if not change and not request.user.is_superuser:
+            obj.owner = request.user
+        super().save_model(request, obj, form, change)
+
+    def get_queryset(self, request):
+        # Overdue is computed in SQL, once per page and against one date
+        return super().get_queryset(request).with_overdue(as_of(request))
+
+    def get_search_results(self, request, queryset, search_term):
+        # The FTS index for selective terms instead of a LIKE scan of the
+        # table. Either way each task matches once, so there are no
+        # duplicates to remove.
+        if not search_term:
+            return queryset, False
+        matches = count_matches(search_term, FTS_MATCH_LIMIT, using=queryset.db)
+        if matches is not None and matches < FTS_MATCH_LIMIT:
+            queryset, _ = search_todos(search_term, queryset, using=queryset.db)
+        else:
+            queryset = queryset.filter(name__icontains=search_term)
+        return queryset, False
+
+    @admin.display(boolean=True, description='Overdue', ordering='overdue')
+    def overdue(self, obj):
+        return obj.overdue
+
+    def update_status(self, request, queryset, status, text):
+        # One UPDATE however many rows were selected
+        updated = queryset.set_status(status)
+        self.message_user(request, f'{updated} task{pluralize(updated)} {text}')
+
+    @admin.action(description='Mark selected tasks as done')
+    def mark_done(self, request, queryset):
+        self.update_status(request, queryset, 'done', 'marked as done.')
+
+    @admin.action(description='Mark selected tasks as skipped')
+    def mark_skipped(self, request, queryset):
+        self.update_status(request, queryset, 'skipped', 'marked as skipped.')
+
+    @admin.action(description='Mark selected tasks as pending')
+    def mark_pending(self, request, queryset):
+        self.update_status(request, queryset, 'pending', 'marked as pending.')
+
+
+@admin.register(ArchivedToDo)
+class ArchivedToDoAdmin(OwnedAdminMixin, admin.ModelAdmin):
+    """Read-only: archived tasks change only by being restored"""
+    list_display = ['name', 'status', 'due_date', 'archived_at', 'owner']
+    list_filter = ['status']
+    search_fields = ['name']
+    ordering = ['due_date', '-created_at', 'id']
+    paginator = CappedCountPaginator
+    show_full_result_count = False
+    actions = ['restore']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description='Restore selected tasks')
+    def restore(self, request, queryset):
+        restored = restore_todos(queryset.values_list('pk', flat=True))
+        self.message_user(request, f'{restored} task{pluralize(restored)} restored.')
@@ -0,0 +1,287 @@
+"""A JSON API for tasks under /api/todos/
+
+    GET    /api/todos/             list; filters ?ids= ?status= ?priority=
+                                   ?due_from= ?due_to=, ?limit= and ?after=
+                                   for keyset pages, ?fields= for projection
+    POST   /api/todos/             create one task (object) or many (array)
+    DELETE /api/todos/?ids=1,2     delete many tasks
+    GET    /api/todos/<pk>/        one task
+    PATCH  /api/todos/<pk>/        partial update
+    DELETE /api/todos/<pk>/        delete one task
+
+Every request sees only the tasks of its owner (see todo.owners), and
+tasks it creates belong to that owner. Rows are serialized straight from
+``values()`` with only the requested columns selected. Writes are
+validated with the same form rules as the HTML views. The API is exempt
+from CSRF checks; requiring a JSON body on writes keeps plain cross-site
+form posts out instead.
+"""
+import json
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.db import transaction
+from django.forms.models import model_to_dict
+from django.http import Http404, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from . import events
+from .caching import invalidate
+from .dashboard import TODO_KEYSET
+from .forms import MAX_PK, ApiListForm, TodoImportForm
+from .models import ToDo
+from .owners import owner_of
+from .transfer import EXPORT_FIELDS
+
+API_FIELDS = EXPORT_FIELDS
+
+# Most tasks one batch create may carry
+MAX_BATCH_SIZE = 1000
+
+KEY_FIELDS = [name for name, _ in TODO_KEYSET.fields]
+
+
+class ApiError(Exception):
+    def __init__(self, errors, status=400):
+        super().__init__(errors)
+        self.errors = errors
+        self.status = status
+
+
+def error_response(errors, status=400):
+    return JsonResponse({'errors': errors}, status=status)
+
+
+def requested_fields(request):
+    """The columns named by ``?fields=``, or all of them"""
+    value = request.GET.get('fields')
+    if not value:
+        return API_FIELDS
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in API_FIELDS]
+    if unknown:
+        raise ApiError({'fields': [f'Unknown field: {name}' for name in unknown]})
+    return fields
+
+
+def project(rows, fields):
+    return [{name: row[name] for name in fields} for row in rows]
+
+
+def parse_json(request):
+    if request.content_type != 'application/json':
+        raise ApiError({'__all__': ['Expected an application/json body.']}, status=415)
+    try:
+        return json.loads(request.body)
+    except ValueError:
+        raise ApiError({'__all__': ['Invalid JSON.']})
+
+
+def validate(data, instance=None):
+    """Return an unsaved ToDo for ``data`` or raise ApiError with the form errors"""
+    if not isinstance(data, dict):
+        raise ApiError({'__all__': ['Expected a JSON object.']})
+    unknown = [name for name in data if name not in TodoImportForm.Meta.fields]
+    if unknown:
+        raise ApiError({name: ['This field cannot be written.'] for name in unknown})
+    if instance is None:
+        initial = {'status': ToDo._meta.get_field('status').default}
+    else:
+        initial = model_to_dict(instance, fields=TodoImportForm.Meta.fields)
+    form = TodoImportForm(data={**initial, **data}, instance=instance)
+    if not form.is_valid():
+        raise ApiError(form.errors)
+    return form.save(commit=False)
+
+
+def fetch_query(owner, pks, fields):
+    return ToDo.objects.owned_by(owner).filter(pk__in=pks).order_by('pk').values(*fields)
+
+
+def fetch(owner, pks, fields):
+    return list(fetch_query(owner, pks, fields))
+
+
+def not_found():
+    return ApiError({'__all__': ['Not found.']}, status=404)
+
+
+def task_id(pk):
+    """``pk`` from the URL, or a 404 if no task could have it
+
+    Larger ids overflow in the SQLite driver rather than matching nothing.
+    """
+    if pk < 1 or pk > MAX_PK:
+        raise not_found()
+    return pk
+
+
+def api_view(func):
+    """CSRF-exempt, with ApiError turned into a JSON error response"""
+    if iscoroutinefunction(func):
+        @csrf_exempt
+        @wraps(func)
+        async def view(request, *args, **kwargs):
+            try:
+                return await func(request, *args, **kwargs)
+            except ApiError as error:
+                return error_response(error.errors, error.status)
+        return view
+
+    @csrf_exempt
+    @wraps(func)
+    def view(request, *args, **kwargs):
+        try:
+            return func(request, *args, **kwargs)
+        except ApiError as error:
+            return error_response(error.errors, error.status)
+    return view
+
+
+@api_view
+@require_http_methods(['GET', 'POST', 'DELETE'])
+def todo_collection(request):
+    """List, create or batch delete tasks"""
+    if request.method == 'POST':
+        return create(request)
+    if request.method == 'DELETE':
+        return batch_delete(request)
+    return list_todos(request)
+
+
+def list_query(request):
+    """Validate a list request, returning ``(rows, fields, form)``
+
+    ``rows`` is a ``values()`` queryset of the requested fields plus the
+    sort key, which the next cursor is built from.
+    """
+    form = ApiListForm(request.GET)
+    if not form.is_valid():
+        raise ApiError(form.errors)
+    fields = requested_fields(request)
+    filters = form.cleaned_data
+    todos = ToDo.objects.owned_by(owner_of(request))
+    if filters['ids']:
+        todos = todos.filter(pk__in=filters['ids'])
+    if filters['status']:
+        todos = todos.filter(status=filters['status'])
+    if filters['priority']:
+        todos = todos.filter(priority=filters['priority'])
+    if filters['due_from']:
+        todos = todos.filter(due_date__gte=filters['due_from'])
+    if filters['due_to']:
+        todos = todos.filter(due_date__lte=filters['due_to'])
+    if filters['after']:
+        # Checked here so a bad cursor is a JSON 400 rather than the 404 page
+        try:
+            TODO_KEYSET.decode(filters['after'])
+        except Http404:
+            raise ApiError({'after': ['Invalid cursor.']})
+    return todos.values(*dict.fromkeys(fields + KEY_FIELDS)), fields, form
+
+
+def list_response(page, fields):
+    return JsonResponse({'results': project(page, fields), 'next': page.next_cursor})
+
+
+def list_todos(request):
+    rows, fields, form = list_query(request)
+    page = TODO_KEYSET.paginate(rows, form.cleaned_data['after'], form.cleaned_data['limit'])
+    return list_response(page, fields)
+
+
+def create_payload(request):
+    """Validate a create request, returning ``(todos, many)``
+
+    A JSON array is a batch create and must be valid as a whole. The
+    tasks belong to the request's owner.
+    """
+    owner = owner_of(request)
+    data = parse_json(request)
+    if not isinstance(data, list):
+        todo = validate(data)
+        todo.owner = owner
+        return [todo], False
+    if len(data) > MAX_BATCH_SIZE:
+        raise ApiError({'__all__': [f'At most {MAX_BATCH_SIZE} tasks per request.']})
+    todos, errors = [], {}
+    for index, item in enumerate(data):
+        try:
+            todo = validate(item)
+        except ApiError as error:
+            errors[index] = error.errors
+        else:
+            todo.owner = owner
+            todos.append(todo)
+    if errors:
+        # All or nothing: report every invalid item and create none
+        raise ApiError(errors)
+    return todos, True
+
+
+def bulk_create(todos):
+    with transaction.atomic():
+        created = ToDo.objects.bulk_create(todos)
+        # bulk_create sends no post_save signals
+        invalidate()
+        pks = [todo.pk for todo in created]
+        events.rows_changed.send(sender=ToDo, pks=pks if len(pks) <= events.MAX_ROW_EVENTS else None)
+    return created
+
+
+def create(request):
+    owner = owner_of(request)
+    fields = requested_fields(request)
+    todos, many = create_payload(request)
+    if not many:
+        todos[0].save()
+        return JsonResponse(fetch(owner, [todos[0].pk], fields)[0], status=201)
+    created = bulk_create(todos)
+    return JsonResponse({'results': fetch(owner, [todo.pk for todo in created], fields)}, status=201)
+
+
+def delete_ids(request):
+    form = ApiListForm(request.GET)
+    if not form.is_valid():
+        raise ApiError(form.errors)
+    ids = form.cleaned_data['ids']
+    if not ids:
+        raise ApiError({'ids': ['List the ids of the tasks to delete.']})
+    return ids
+
+
+def deleted_todos(result):
+    """How many tasks a ``delete()`` result removed, leaving out cascaded rows such as rules"""
+    _, per_model = result
+    return per_model.get(ToDo._meta.label, 0)
+
+
+def batch_delete(request):
+    result = ToDo.objects.owned_by(owner_of(request)).filter(pk__in=delete_ids(request)).delete()
+    return JsonResponse({'deleted': deleted_todos(result)})
+
+
+@api_view
+@require_http_methods(['GET', 'PATCH', 'DELETE'])
+def todo_detail(request, pk):
+    """Read, partially update or delete one task"""
+    pk = task_id(pk)
+    owner = owner_of(request)
+    fields = requested_fields(request)
+    if request.method == 'GET':
+        rows = fetch(owner, [pk], fields)
+        if not rows:
+            raise not_found()
+        return JsonResponse(rows[0])
+
+    todo = ToDo.objects.owned_by(owner).filter(pk=pk).first()
+    if todo is None:
+        raise not_found()
+    if request.method == 'DELETE':
+        todo.delete()
+        return JsonResponse({'deleted': 1})
+
+    todo = validate(parse_json(request), instance=todo)
+    todo.save()
+    return JsonResponse(fetch(owner, [pk], fields)[0])
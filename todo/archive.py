@@ -0,0 +1,108 @@
+"""Moving finished tasks out of ``todo_todo`` and back
+
+Done and skipped tasks stay in the today, future and no-date buckets
+indefinitely, so the table every dashboard query reads grows with
+history. ``archive_todos()`` moves those nobody has touched for a while
+into ``todo_archivedtodo``, which only search reads, and only when asked
+to include the archive; ``restore_todos()`` moves rows back.
+
+Rows move with ``INSERT ... SELECT`` and ``DELETE`` in batches, one
+transaction per batch, so the FTS and counter triggers on ``todo_todo``
+see ordinary inserts and deletes and an interrupted run loses nothing.
+Ids are kept, so a restored task keeps its URLs. Tasks that start a
+recurring series are never archived: their rule would be deleted with
+them.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import events
+from .caching import invalidate
+from .models import ArchivedToDo, ToDo, ToDoTombstone
+from .pagination import Keyset
+
+ARCHIVED_STATUSES = ['done', 'skipped']
+
+# The columns the two tables share
+COLUMNS = ['id', 'name', 'status', 'priority', 'due_date', 'created_at', 'updated_at', 'owner_id']
+
+ARCHIVE_KEYSET = Keyset(ArchivedToDo, 'due_date', '-created_at', 'id')
+
+
+def archivable(older_than, now=None):
+    """Done and skipped tasks last changed more than ``older_than`` (a timedelta) ago"""
+    cutoff = (now or timezone.now()) - older_than
+    return ToDo.objects.filter(status__in=ARCHIVED_STATUSES, updated_at__lt=cutoff, recurrence__isnull=True)
+
+
+def _move(pks, source, target, extra=None):
+    """Copy rows ``pks`` from table ``source`` to ``target``, then delete them from ``source``
+
+    ``extra`` maps further ``target`` columns to the value every row gets.
+    """
+    extra = extra or {}
+    columns = ', '.join([*COLUMNS, *extra])
+    values = ', '.join([*COLUMNS, *['%s'] * len(extra)])
+    ids = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {target} ({columns}) SELECT {values} FROM {source} WHERE id IN ({ids})',
+            [*extra.values(), *pks],
+        )
+        cursor.execute(f'DELETE FROM {source} WHERE id IN ({ids})', pks)
+
+
+def archive_todos(older_than, batch_size=1000, now=None):
+    """Move ``archivable()`` tasks to the archive and return how many moved
+
+    To an open dashboard the tasks were deleted: each batch counts as one
+    deletion for the HTTP validators and asks live pages to reload.
+    """
+    now = now or timezone.now()
+    # Unordered, so each batch is the first matches on the status index
+    # rather than all of them sorted by id; moved rows drop out of it
+    candidates = archivable(older_than, now).order_by().values_list('pk', flat=True)
+    archived_at = connection.ops.adapt_datetimefield_value(now)
+    archived = 0
+    while True:
+        with transaction.atomic():
+            pks = list(candidates[:batch_size])
+            if not pks:
+                return archived
+            _move(pks, ToDo._meta.db_table, ArchivedToDo._meta.db_table, {'archived_at': archived_at})
+            ToDoTombstone.record()
+            invalidate()
+            events.rows_changed.send(sender=ToDo, pks=None)
+        archived += len(pks)
+
+
+def restore_todos(pks, archived=None):
+    """Move the archived tasks ``pks`` back to ``todo_todo`` and return how many moved
+
+    Only tasks in ``archived``, a queryset such as one owner's, are moved.
+    """
+    if archived is None:
+        archived = ArchivedToDo.objects.all()
+    with transaction.atomic():
+        pks = list(archived.filter(pk__in=pks).values_list('pk', flat=True))
+        if not pks:
+            return 0
+        _move(pks, ArchivedToDo._meta.db_table, ToDo._meta.db_table)
+        # The rows come back with old ids and timestamps, which wouldn't
+        # change the validator; restoring also restarts the archive clock
+        ToDo.objects.filter(pk__in=pks).update(updated_at=timezone.now())
+        invalidate()
+        events.rows_changed.send(sender=ToDo, pks=pks if len(pks) <= events.MAX_ROW_EVENTS else None)
+    return len(pks)
+
+
+def search_archive(query='', owner=None):
+    """Archived tasks of ``owner`` whose name contains ``query``
+
+    The archive has no full-text index; it is searched only on request,
+    over the owner's rows on the owner index.
+    """
+    archived = ArchivedToDo.objects.owned_by(owner)
+    if query:
+        archived = archived.filter(name__icontains=query)
+    return archived
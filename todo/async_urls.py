@@ -0,0 +1,21 @@
+"""todo.urls with async views where there are any, for the ASGI application"""
+from django.urls import path
+from . import async_views, views
+
+urlpatterns = [
+    path('', async_views.todo_list, name='todo_list'),
+    path('create/', views.todo_create, name='todo_create'),
+    path('edit/<int:pk>/', views.todo_edit, name='todo_edit'),
+    path('delete/<int:pk>/', views.todo_delete, name='todo_delete'),
+    path('mark-done/<int:pk>/', async_views.todo_mark_done, name='todo_mark_done'),
+    path('mark-skipped/<int:pk>/', async_views.todo_mark_skipped, name='todo_mark_skipped'),
+    path('mark-pending/<int:pk>/', async_views.todo_mark_pending, name='todo_mark_pending'),
+    path('recurring/<int:pk>/<str:day>/<str:status>/', views.todo_occurrence_status, name='todo_occurrence_status'),
+    path('bulk-status/', views.todo_bulk_status, name='todo_bulk_status'),
+    path('restore/<int:pk>/', views.todo_restore, name='todo_restore'),
+    path('search/', async_views.todo_search, name='todo_search'),
+    path('export/', views.todo_export, name='todo_export'),
+    path('events/', async_views.todo_events, name='todo_events'),
+    path('api/todos/', async_views.api_todo_collection, name='api_todo_collection'),
+    path('api/todos/<int:pk>/', async_views.api_todo_detail, name='api_todo_detail'),
+]
@@ -0,0 +1,189 @@
+"""Async versions of the read-heavy views and the JSON API
+
+Served by the ASGI application (``five.asgi``), whose URLconf routes the
+list, search, status transitions and API here so requests don't each
+hold a thread through ``sync_to_async``. They behave exactly like their
+counterparts in ``views.py`` and ``api.py``; the ORM calls use the async
+query methods and the dashboard's bucket queries run concurrently where
+the database allows it.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect, render
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_http_methods
+
+from . import api, events
+from .archive import ARCHIVE_KEYSET, search_archive
+from .conditional import async_todo_table_condition
+from .counters import acached_summary
+from .dates import as_of
+from .dashboard import OVERDUE, TODAY, FUTURE, NO_DATE, TODO_KEYSET, arender_dashboard
+from .forms import QuickAddForm
+from .models import ToDo
+from .owners import aowner_of, owner_key
+from .search import search_owned
+from .views import STATUS_MESSAGES
+
+
+@async_todo_table_condition
+async def todo_list(request):
+    """Display all todos with quick add form"""
+    owner = await aowner_of(request)
+    if request.method == 'POST':
+        form = QuickAddForm(request.POST, instance=ToDo(owner=owner))
+        if form.is_valid():
+            await form.save(commit=False).asave()
+            messages.success(request, 'Task created successfully!')
+            return redirect('todo_list')
+    else:
+        form = QuickAddForm()
+
+    today = as_of(request)
+    fragments, buckets = await arender_dashboard(request, today)
+
+    context = {
+        'form': form,
+        'bucket_fragments': fragments,
+        'has_todos': any(fragment.strip() for fragment in fragments),
+        'summary': await acached_summary(today, owner),
+        'todos_today': buckets[TODAY],
+        'todos_overdue': buckets[OVERDUE],
+        'todos_future': buckets[FUTURE],
+        'todos_no_date': buckets[NO_DATE],
+        'today': today,
+        'events_url': reverse('todo_events'),
+    }
+    return await sync_to_async(render)(request, 'todo/todo_list.html', context)
+
+
+@require_GET
+async def todo_events(request):
+    """Stream the owner's dashboard changes as Server-Sent Events for ``todo/live.js``"""
+    owner_id = owner_key(await aowner_of(request))
+
+    async def stream():
+        # Browsers reconnect after this many ms if the stream drops
+        yield 'retry: 5000\n\n'
+        async for event in events.get_broker().subscribe(events.get_keepalive()):
+            if events.for_owner(event, owner_id):
+                yield events.format_event(event)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx and similar proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def mark_status(request, pk, status):
+    """Single-item status change, as ``views.mark_status``"""
+    todos = ToDo.objects.owned_by(await aowner_of(request)).filter(pk=pk)
+    expected = request.GET.get('expected')
+    if expected:
+        todos = todos.filter(status=expected)
+    if not await todos.aset_status(status):
+        raise Http404('No Todo matches the given query.')
+    notify, text = STATUS_MESSAGES[status]
+    notify(request, f'Task {text}')
+    return redirect('todo_list')
+
+
+async def todo_mark_done(request, pk):
+    """Mark a todo as done"""
+    return await mark_status(request, pk, 'done')
+
+
+async def todo_mark_skipped(request, pk):
+    """Mark a todo as skipped"""
+    return await mark_status(request, pk, 'skipped')
+
+
+async def todo_mark_pending(request, pk):
+    """Mark a todo as pending (undo done/skipped)"""
+    return await mark_status(request, pk, 'pending')
+
+
+@async_todo_table_condition
+async def todo_search(request):
+    """Search for todos by name, one page at a time"""
+    query = request.GET.get('q', '')
+    owner = await aowner_of(request)
+    if query:
+        # has_fts() may introspect the database the first time
+        matches, keyset = await sync_to_async(search_owned)(query, owner)
+    else:
+        matches, keyset = ToDo.objects.owned_by(owner), TODO_KEYSET
+    results = await keyset.apaginate(matches.with_overdue(as_of(request)), request.GET.get('after'), with_total=True)
+    include_archived = bool(request.GET.get('archived'))
+    archived = None
+    if include_archived:
+        archived = await ARCHIVE_KEYSET.apaginate(
+            search_archive(query, owner), request.GET.get('archived_after'), with_total=True,
+        )
+
+    context = {
+        'results': results,
+        'query': query,
+        'count': results.total,
+        'include_archived': include_archived,
+        'archived': archived,
+    }
+    return await sync_to_async(render)(request, 'todo/todo_search.html', context)
+
+
+# JSON API
+
+async def afetch(owner, pks, fields):
+    return [row async for row in api.fetch_query(owner, pks, fields)]
+
+
+@api.api_view
+@require_http_methods(['GET', 'POST', 'DELETE'])
+async def api_todo_collection(request):
+    """List, create or batch delete tasks"""
+    # Resolved here so the api helpers read it without a query
+    owner = await aowner_of(request)
+    if request.method == 'POST':
+        fields = api.requested_fields(request)
+        todos, many = api.create_payload(request)
+        if not many:
+            await todos[0].asave()
+            return JsonResponse((await afetch(owner, [todos[0].pk], fields))[0], status=201)
+        # Async code cannot open a transaction; the batch runs in a thread
+        created = await sync_to_async(api.bulk_create)(todos)
+        return JsonResponse({'results': await afetch(owner, [todo.pk for todo in created], fields)}, status=201)
+
+    if request.method == 'DELETE':
+        result = await ToDo.objects.owned_by(owner).filter(pk__in=api.delete_ids(request)).adelete()
+        return JsonResponse({'deleted': api.deleted_todos(result)})
+
+    rows, fields, form = api.list_query(request)
+    page = await TODO_KEYSET.apaginate(rows, form.cleaned_data['after'], form.cleaned_data['limit'])
+    return api.list_response(page, fields)
+
+
+@api.api_view
+@require_http_methods(['GET', 'PATCH', 'DELETE'])
+async def api_todo_detail(request, pk):
+    """Read, partially update or delete one task"""
+    pk = api.task_id(pk)
+    owner = await aowner_of(request)
+    fields = api.requested_fields(request)
+    if request.method == 'GET':
+        rows = await afetch(owner, [pk], fields)
+        if not rows:
+            raise api.not_found()
+        return JsonResponse(rows[0])
+
+    todo = await ToDo.objects.owned_by(owner).filter(pk=pk).afirst()
+    if todo is None:
+        raise api.not_found()
+    if request.method == 'DELETE':
+        await todo.adelete()
+        return JsonResponse({'deleted': 1})
+
+    todo = api.validate(api.parse_json(request), instance=todo)
+    await todo.asave()
+    return JsonResponse((await afetch(owner, [pk], fields))[0])
@@ -0,0 +1,769 @@
+"""Benchmark scenarios for the todo app.
+
+Scenarios run against a throwaway database seeded with synthetic ToDo
+rows. Run them with ``python manage.py benchmark``.
+
+Scenarios report text as they go. Those that ``record()`` measurements
+also end up in ``RESULTS``, which the command writes as JSON and checks
+against a stored baseline.
+"""
+import json
+import math
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from five.db_profiles import DB_PROFILES
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.db.models import F
+from django.templatetags.static import static
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import caching, conditional, counters, startup
+from .admin import ToDoAdmin
+from .archive import ARCHIVED_STATUSES, archive_todos, restore_todos
+from .caching import get_stats, reset_stats
+from .dashboard import TODO_KEYSET, dashboard_queryset, load_dashboard, render_sections
+from .models import ArchivedToDo, Recurrence, ToDo
+from .search import has_fts, search_owned, search_todos
+from .transfer import FORMATS, export_lines, import_rows, read_rows
+
+SCENARIOS = {}
+
+# {scenario: {rows: {measurement: {metric: value}}}}, filled by record()
+RESULTS = {}
+
+# Metrics compared against a baseline; query counts must not grow at all
+TIMING_METRICS = ['p50', 'p95']
+
+# Ceilings in ms that fail a run under --budget whatever the baseline,
+# as {scenario: {measurement: {metric: ms}}}; about 1.5x the p50s
+# measured on the development machine when each was set
+BUDGETS = {
+    'startup': {
+        'full_setup': {'p50': 200},
+        'lean_setup': {'p50': 150},
+        'full_first_response': {'p50': 40},
+        'lean_first_response': {'p50': 40},
+    },
+}
+
+
+def scenario(name):
+    """Register a benchmark scenario under ``name``"""
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+WORDS = [
+    'buy', 'groceries', 'write', 'report', 'call', 'mom', 'review', 'pull',
+    'request', 'pay', 'rent', 'book', 'flight', 'clean', 'kitchen', 'read',
+    'chapter', 'email', 'team', 'schedule', 'dentist', 'water', 'plants',
+]
+
+
+def seed_todos(count, batch_size=10_000, seed=0, using='default'):
+    """Insert ``count`` synthetic todos with a realistic spread of dates
+
+    Roughly 15% have no due date, the rest fall within two months either
+    side of today. Most tasks are pending, as on a real dashboard.
+    """
+    rng = random.Random(seed)
+    today = timezone.now().date()
+    statuses = ['pending', 'done', 'skipped']
+    priorities = ['low', 'medium', 'high']
+    batch = []
+    for i in range(count):
+        if rng.random() < 0.15:
+            due_date = None
+        else:
+            due_date = today + timedelta(days=rng.randint(-60, 60))
+        batch.append(ToDo(
+            name=f'Task {i} {rng.choice(WORDS)} {rng.choice(WORDS)}',
+            status=rng.choices(statuses, weights=[70, 20, 10])[0],
+            priority=rng.choices(priorities, weights=[30, 50, 20])[0],
+            due_date=due_date,
+        ))
+        if len(batch) >= batch_size:
+            ToDo.objects.using(using).bulk_create(batch)
+            batch = []
+    if batch:
+        ToDo.objects.using(using).bulk_create(batch)
+
+
+def measure(func, repeat):
+    """Call ``func`` ``repeat`` times and summarize the wall time in ms"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def summarize(samples):
+    """Return min/p50/p95/p99/mean for a list of millisecond samples"""
+    ordered = sorted(samples)
+    return {
+        'min': ordered[0],
+        'p50': statistics.median(ordered),
+        'p95': percentile(ordered, 0.95),
+        'p99': percentile(ordered, 0.99),
+        'mean': statistics.fmean(ordered),
+    }
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def record(scenario_name, rows, name, measurements):
+    RESULTS.setdefault(scenario_name, {}).setdefault(str(rows), {})[name] = measurements
+
+
+def compare(results, baseline, threshold):
+    """Return a description of every measurement that regressed past ``baseline``
+
+    Timings regress when they exceed the baseline by more than
+    ``threshold`` (0.25 is 25%); query counts regress on any increase.
+    Measurements missing from either side are skipped.
+    """
+    regressions = []
+    for scenario_name, sizes in results.items():
+        for rows, measurements in sizes.items():
+            for name, current in measurements.items():
+                previous = baseline.get(scenario_name, {}).get(rows, {}).get(name)
+                if not previous:
+                    continue
+                label = f'{scenario_name} rows={rows} {name}'
+                if current.get('queries', 0) > previous.get('queries', current.get('queries', 0)):
+                    regressions.append(f'{label}: {previous["queries"]} -> {current["queries"]} queries')
+                for metric in TIMING_METRICS:
+                    if metric in current and metric in previous and current[metric] > previous[metric] * (1 + threshold):
+                        regressions.append(
+                            f'{label}: {metric} {previous[metric]:.2f}ms -> {current[metric]:.2f}ms'
+                        )
+    return regressions
+
+
+def over_budget(results, budgets=BUDGETS):
+    """Return a description of every measurement past its ``budgets`` ceiling"""
+    failures = []
+    for scenario_name, sizes in results.items():
+        for rows, measurements in sizes.items():
+            for name, current in measurements.items():
+                for metric, limit in budgets.get(scenario_name, {}).get(name, {}).items():
+                    if current.get(metric, 0) > limit:
+                        failures.append(
+                            f'{scenario_name} rows={rows} {name}: {metric} {current[metric]:.2f}ms '
+                            f'over the {limit}ms budget'
+                        )
+    return failures
+
+
+def format_stats(stats):
+    return '  '.join(f'{key}={stats[key]:.2f}ms' for key in ('min', 'p50', 'p95', 'p99', 'mean') if key in stats)
+
+
+def explain(queryset):
+    """Return the backend's query plan for ``queryset`` on a single line"""
+    if connection.vendor == 'sqlite':
+        # QuerySet.explain() misplaces EXPLAIN when a window filter wraps
+        # the query in a subquery, so prefix the compiled SQL directly
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return ' | '.join(row[-1] for row in cursor.fetchall())
+    return ' | '.join(line.strip() for line in queryset.explain().splitlines())
+
+
+def bucket_querysets(today):
+    """The four per-bucket queries todo_list used to issue"""
+    return {
+        'today': ToDo.objects.filter(due_date=today),
+        'overdue': ToDo.objects.filter(due_date__lt=today, status='pending'),
+        'future': ToDo.objects.filter(due_date__gt=today),
+        'no_date': ToDo.objects.filter(due_date__isnull=True),
+    }
+
+
+def report_buckets(report, today, repeat):
+    querysets = bucket_querysets(today)
+
+    def first_pages():
+        for queryset in querysets.values():
+            list(queryset[:50])
+
+    def counts():
+        for queryset in querysets.values():
+            queryset.count()
+
+    for name, queryset in querysets.items():
+        report(f'  plan[{name}]: {explain(queryset)}')
+    report(f'  first 50 rows per bucket: {format_stats(measure(first_pages, repeat))}')
+    report(f'  count per bucket: {format_stats(measure(counts, repeat))}')
+
+
+@scenario('indexes')
+def bench_indexes(report, rows, repeat):
+    """Bucket query plans and latency with and without the bucket indexes"""
+    today = timezone.now().date()
+    indexes = ToDo._meta.indexes
+
+    report(f'with indexes ({rows} rows)')
+    report_buckets(report, today, repeat)
+
+    with connection.schema_editor() as editor:
+        for index in indexes:
+            editor.remove_index(ToDo, index)
+    try:
+        report(f'without indexes ({rows} rows)')
+        report_buckets(report, today, repeat)
+    finally:
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.add_index(ToDo, index)
+
+
+@scenario('dashboard')
+def bench_dashboard(report, rows, repeat):
+    """Four per-bucket queries versus the single dashboard query"""
+    today = timezone.now().date()
+
+    def per_bucket():
+        for queryset in bucket_querysets(today).values():
+            list(queryset)
+
+    report(f'  plan: {explain(dashboard_queryset(today))}')
+    report(f'  four queries: {format_stats(measure(per_bucket, repeat))}')
+    report(f'  one query: {format_stats(measure(lambda: load_dashboard(today), repeat))}')
+
+
+@scenario('search')
+def bench_search(report, rows, repeat):
+    """First page of search results: FTS index versus LIKE '%q%'"""
+    queries = {
+        'rare': f'Task {rows // 2} ',
+        'common': 'groceries',
+        'absent': 'zebra',
+    }
+    if not has_fts():
+        report('  FTS5 is not available on this database; only LIKE is measured')
+    for label, query in queries.items():
+        def like():
+            TODO_KEYSET.paginate(ToDo.objects.filter(name__icontains=query))
+
+        def fts():
+            matches, keyset = search_todos(query)
+            keyset.paginate(matches)
+
+        report(f'  {label} {query!r}')
+        report(f'    like: {format_stats(measure(like, repeat))}')
+        if has_fts():
+            report(f'    fts:  {format_stats(measure(fts, repeat))}')
+
+
+@scenario('transitions')
+def bench_transitions(report, rows, repeat):
+    """Status transitions per second: load-and-save versus one UPDATE"""
+    rng = random.Random(1)
+    pks = list(ToDo.objects.values_list('pk', flat=True)[:10_000])
+    count = max(repeat * 50, 500)
+    targets = [(rng.choice(pks), rng.choice(['done', 'skipped', 'pending'])) for _ in range(count)]
+
+    def save_each():
+        for pk, status in targets:
+            todo = ToDo.objects.get(pk=pk)
+            todo.status = status
+            todo.save()
+
+    def update_each():
+        for pk, status in targets:
+            ToDo.objects.filter(pk=pk).set_status(status)
+
+    def bulk():
+        for status in ['done', 'skipped', 'pending']:
+            ToDo.objects.filter(pk__in=[pk for pk, target in targets if target == status]).set_status(status)
+
+    for label, func in [('get + save()', save_each), ('UPDATE per item', update_each), ('bulk UPDATE', bulk)]:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        report(f'  {label}: {count / elapsed:,.0f} transitions/s')
+
+
+@scenario('fragment_cache')
+def bench_fragment_cache(report, rows, repeat):
+    """todo_list requests per second with and without the fragment cache"""
+    count = max(repeat * 10, 100)
+    url = reverse('todo_list')
+    caches = {
+        **settings.CACHES,
+        'benchmark-dummy': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    }
+    for label, alias in [('uncached', 'benchmark-dummy'), ('cached', settings.TODO_FRAGMENT_CACHE_ALIAS)]:
+        with override_settings(CACHES=caches, TODO_FRAGMENT_CACHE_ALIAS=alias, ALLOWED_HOSTS=['testserver']):
+            client = Client()
+            client.get(url)
+            reset_stats()
+            start = time.perf_counter()
+            for _ in range(count):
+                client.get(url)
+            elapsed = time.perf_counter() - start
+        stats = get_stats()
+        report(f'  {label}: {count / elapsed:,.0f} requests/s  (hits={stats["hits"]} misses={stats["misses"]})')
+
+
+@scenario('render')
+def bench_render(report, rows, repeat):
+    """Template time for a dashboard of up to 1,000 rows, queries excluded"""
+    today = timezone.now().date()
+    pages = load_dashboard(today, page_size=320)
+    shown = sum(len(page) for page in pages.values())
+    request = RequestFactory().get(reverse('todo_list'))
+    stats = measure(lambda: render_sections(request, pages), repeat)
+    record('render', rows, 'dashboard_sections', stats)
+    report(f'  {shown} rows: {format_stats(stats)}')
+
+
+@scenario('page_weight')
+def bench_page_weight(report, rows, repeat):
+    """Bytes sent per page view for each Accept-Encoding"""
+    todo = ToDo.objects.order_by('pk').first()
+    pages = [
+        ('todo_list', reverse('todo_list')),
+        ('todo_search', f'{reverse("todo_search")}?q=groceries'),
+        ('todo_create', reverse('todo_create')),
+        ('todo_delete', reverse('todo_delete', args=[todo.pk])),
+    ]
+    with override_settings(ALLOWED_HOSTS=['testserver']):
+        client = Client()
+        for name, url in pages:
+            sizes = {}
+            for encoding in ['identity', 'gzip', 'br']:
+                response = client.get(url, headers={'accept-encoding': encoding})
+                sizes[encoding] = len(response.content)
+            record('page_weight', rows, name, {f'{key}_bytes': value for key, value in sizes.items()})
+            report(f'  {name}: ' + '  '.join(f'{key}={value:,}B' for key, value in sizes.items()))
+        stylesheet = client.get(static('todo/todo.css'))
+        size = len(b''.join(stylesheet.streaming_content))
+        report(f'  todo.css: {size:,}B uncompressed, fetched once and then cached')
+
+
+@scenario('conditional_get')
+def bench_conditional_get(report, rows, repeat):
+    """todo_list requests per second: full responses versus 304s"""
+    count = max(repeat * 10, 100)
+    url = reverse('todo_list')
+    dummy = {**settings.CACHES, 'benchmark-dummy': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    with override_settings(CACHES=dummy, TODO_FRAGMENT_CACHE_ALIAS='benchmark-dummy', ALLOWED_HOSTS=['testserver']):
+        client = Client()
+        etag = client.get(url)['ETag']
+        for label, headers in [('200 (no validator)', {}), ('304 (If-None-Match)', {'if_none_match': etag})]:
+            start = time.perf_counter()
+            for _ in range(count):
+                client.get(url, headers=headers)
+            elapsed = time.perf_counter() - start
+            report(f'  {label}: {count / elapsed:,.0f} requests/s')
+
+
+@scenario('counters')
+def bench_counters(report, rows, repeat):
+    """Header badge counts: COUNT over todo_todo versus the counters table"""
+    today = timezone.now().date()
+    with mock.patch.object(counters, 'has_counters', return_value=False):
+        report(f'  COUNT(*):  {format_stats(measure(lambda: counters.summary(today), repeat))}')
+    report(f'  counters:  {format_stats(measure(lambda: counters.summary(today), repeat))}')
+    report(f'  counter rows: {counters.ToDoCounter.objects.count():,}')
+
+
+@scenario('recurring')
+def bench_recurring(report, rows, repeat, chores=50, days=365):
+    """Daily chores for a year: materialized rows versus lazily expanded rules"""
+    today = timezone.now().date()
+
+    def dashboard():
+        load_dashboard(today)
+
+    def tenth_future_page():
+        cursor = None
+        for _ in range(10):
+            cursor = load_dashboard(today, {'future': cursor}, buckets=['future'])['future'].next_cursor
+
+    def run(label):
+        for name, func in [('dashboard', dashboard), ('future_page_10', tenth_future_page)]:
+            stats = measure(func, repeat)
+            record('recurring', rows, f'{label}_{name}', stats)
+            report(f'  {label} {name}: {format_stats(stats)}')
+
+    ToDo.objects.bulk_create([
+        ToDo(name=f'Chore {chore}', due_date=today + timedelta(days=day))
+        for chore in range(chores) for day in range(days)
+    ], batch_size=10_000)
+    report(f'  materialized: {chores * days:,} rows')
+    run('materialized')
+    ToDo.objects.filter(name__startswith='Chore ').delete()
+
+    series = ToDo.objects.bulk_create([ToDo(name=f'Chore {chore}', due_date=today) for chore in range(chores)])
+    Recurrence.objects.bulk_create([Recurrence(todo=todo, until=today + timedelta(days=days - 1)) for todo in series])
+    caching.invalidate()
+    report(f'  rules: {chores} rows and {chores} rules')
+    run('rules')
+    ToDo.objects.filter(name__startswith='Chore ').delete()
+
+
+@scenario('archive')
+def bench_archive(report, rows, repeat, older_than=timedelta(days=30)):
+    """The dashboard before and after archiving every finished task, which are then restored"""
+    today = timezone.now().date()
+
+    def tenth_future_page():
+        cursor = None
+        for _ in range(10):
+            cursor = load_dashboard(today, {'future': cursor}, buckets=['future'])['future'].next_cursor
+
+    def search(query):
+        def first_page():
+            matches, keyset = search_todos(query) if query else (ToDo.objects.all(), TODO_KEYSET)
+            keyset.paginate(matches, with_total=True)
+        return first_page
+
+    def run(label):
+        for name, func in [
+            ('dashboard', lambda: load_dashboard(today)),
+            ('future_page_10', tenth_future_page),
+            ('search', search('groceries')),
+            ('search_all', search('')),
+        ]:
+            stats = measure(func, repeat)
+            record('archive', rows, f'{label}_{name}', stats)
+            report(f'  {label} {name}: {format_stats(stats)}')
+
+    ToDo.objects.filter(status__in=ARCHIVED_STATUSES).update(updated_at=timezone.now() - 2 * older_than)
+    run('before')
+    start = time.perf_counter()
+    archived = archive_todos(older_than)
+    elapsed = time.perf_counter() - start
+    report(f'  archived {archived:,} of {rows:,} rows in {elapsed * 1000:.0f}ms')
+    run('after')
+    pks = ArchivedToDo.objects.values_list('pk', flat=True)
+    while restore_todos(list(pks[:1000])):
+        pass
+
+
+@scenario('owners')
+def bench_owners(report, rows, repeat, users=10_000):
+    """One owner's dashboard, search, counts and validator, alone and as one of ``users`` owners
+
+    The seeded rows are dealt out to ``users`` new users, ``rows //
+    users`` each, then taken back; ``--rows 10000000`` gives 10,000 users
+    1,000 tasks each.
+    """
+    today = timezone.now().date()
+    User = get_user_model()
+
+    def search(query, owner):
+        def first_page():
+            matches, keyset = search_owned(query, owner) if query else (ToDo.objects.owned_by(owner), TODO_KEYSET)
+            keyset.paginate(matches, with_total=True)
+        return first_page
+
+    def run(label, owner):
+        for name, func in [
+            ('dashboard', lambda: load_dashboard(today, owner=owner)),
+            ('search', search('groceries', owner)),
+            ('search_rare', search('zebra', owner)),
+            ('search_all', search('', owner)),
+            ('summary', lambda: counters.summary(today, owner)),
+            ('validator', lambda: conditional.table_state(owner)),
+        ]:
+            stats = measure(func, repeat)
+            record('owners', rows, f'{label}_{name}', stats)
+            report(f'  {label} {name}: {format_stats(stats)}')
+
+    report(f'  one owner of {rows:,} rows')
+    run('single', None)
+
+    created = User.objects.bulk_create([User(username=f'benchmark-owner-{i}') for i in range(users)])
+    pks = sorted(user.pk for user in created)
+    if pks[-1] - pks[0] + 1 != users:
+        raise RuntimeError('The benchmark users need consecutive ids')
+    start = time.perf_counter()
+    ToDo.objects.update(owner_id=F('id') % users + pks[0])
+    caching.invalidate()
+    elapsed = time.perf_counter() - start
+    owner = pks[users // 2]
+    report(f'  dealt {rows:,} rows to {users:,} owners in {elapsed * 1000:.0f}ms')
+    report(f'  plan: {explain(dashboard_queryset(today, owner=owner))}')
+    report(f'  one owner of {users:,} with {ToDo.objects.owned_by(owner).count():,} rows')
+    run('per_owner', owner)
+
+    ToDo.objects.update(owner=None)
+    User.objects.filter(pk__in=pks).delete()
+    # Drop the owners' emptied counter rows, which later scenarios would sum
+    counters.rebuild()
+    caching.invalidate()
+
+
+def copy_database(path):
+    """Write the benchmark's in-memory SQLite database to the file ``path``"""
+    connection.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        connection.connection.backup(target)
+    finally:
+        target.close()
+
+
+@scenario('startup')
+def bench_startup(report, rows, repeat):
+    """django.setup() and the first API response in fresh processes, full and lean settings"""
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'startup.sqlite3')
+        copy_database(database)
+        for label, settings_module in startup.SETTINGS.items():
+            samples = []
+            for _ in range(repeat):
+                output = subprocess.run(
+                    [sys.executable, '-m', 'todo.startup', settings_module, '--database', database],
+                    cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+                ).stdout
+                samples.append(json.loads(output))
+            for name in ('setup', 'first_response'):
+                stats = summarize([sample[name] for sample in samples])
+                record('startup', rows, f'{label}_{name}', stats)
+                report(f'  {label} {name}: {format_stats(stats)}')
+
+
+def measure_request(send, repeat):
+    """Time ``send()`` ``repeat`` times, then count its queries and peak memory
+
+    The counted and traced passes run separately so neither skews the
+    timings.
+    """
+    stats = measure(send, repeat)
+    with CaptureQueriesContext(connection) as queries:
+        send()
+    return {**stats, 'queries': len(queries), 'peak_mib': peak_memory(send)}
+
+
+@scenario('views')
+def bench_views(report, rows, repeat):
+    """The main views through the test client: timings, queries and memory"""
+    user, _ = get_user_model().objects.get_or_create(
+        username='benchmark', defaults={'is_staff': True, 'is_superuser': True},
+    )
+    # The seeded rows belong to nobody, which is what anonymous requests see
+    client = Client()
+    staff = Client()
+    staff.force_login(user)
+    pks = list(ToDo.objects.values_list('pk', flat=True)[:1000])
+    targets = iter(pks * (repeat * 4 // len(pks) + 2)) if pks else iter(())
+    created = iter(range(10**9))
+
+    def get(url, params=None, client=client):
+        return lambda: client.get(url, params)
+
+    def mark(name):
+        return lambda: client.get(reverse(name, args=[next(targets)]))
+
+    def create():
+        client.post(reverse('todo_create'), {
+            'name': f'Benchmark task {next(created)}', 'due_date': '', 'status': 'pending',
+        })
+
+    dummy = {**settings.CACHES, 'benchmark-dummy': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    requests = [
+        ('todo_list', get(reverse('todo_list')), True),
+        ('todo_list_cached', get(reverse('todo_list')), False),
+        ('todo_search', get(reverse('todo_search'), {'q': 'groceries'}), True),
+        ('todo_search_all', get(reverse('todo_search')), True),
+        ('todo_create', create, True),
+        ('todo_mark_done', mark('todo_mark_done'), True),
+        ('todo_mark_pending', mark('todo_mark_pending'), True),
+        ('admin_changelist', get(reverse('admin:todo_todo_changelist'), client=staff), True),
+    ]
+    with override_settings(ALLOWED_HOSTS=['testserver'], CACHES=dummy):
+        for name, send, uncached in requests:
+            alias = 'benchmark-dummy' if uncached else settings.TODO_FRAGMENT_CACHE_ALIAS
+            with override_settings(TODO_FRAGMENT_CACHE_ALIAS=alias):
+                send()
+                measurements = measure_request(send, repeat)
+            record('views', rows, name, measurements)
+            report(
+                f'  {name}: {format_stats(measurements)}  queries={measurements["queries"]}  '
+                f'peak={measurements["peak_mib"]:.1f}MiB'
+            )
+
+
+@scenario('admin')
+def bench_admin(report, rows, repeat):
+    """The ToDo admin changelist: plain, filtered, searched and drilled down by date"""
+    user, _ = get_user_model().objects.get_or_create(
+        username='benchmark', defaults={'is_staff': True, 'is_superuser': True},
+    )
+    client = Client()
+    client.force_login(user)
+    today = timezone.now().date()
+    url = reverse('admin:todo_todo_changelist')
+    # Page 50, or the last page of a smaller table: past the last page
+    # the admin redirects instead of answering 200
+    last_page = min(50, max(1, math.ceil(rows / ToDoAdmin.list_per_page)))
+    requests = [
+        ('changelist', {}),
+        ('status_filter', {'status__exact': 'pending'}),
+        ('search', {'q': 'groceries'}),
+        ('search_rare', {'q': 'zebra'}),
+        ('last_page', {'p': str(last_page)}),
+        ('date_year', {'due_date__year': today.year}),
+        ('date_month', {'due_date__year': today.year, 'due_date__month': today.month}),
+    ]
+    with override_settings(ALLOWED_HOSTS=['testserver']):
+        for name, params in requests:
+            def send():
+                response = client.get(url, params)
+                assert response.status_code == 200, response.status_code
+            send()
+            measurements = measure_request(send, repeat)
+            record('admin', rows, name, measurements)
+            report(f'  {name}: {format_stats(measurements)}  queries={measurements["queries"]}')
+
+
+def peak_memory(func):
+    """Run ``func`` and return the peak traced Python memory in MiB"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+@scenario('transfer')
+def bench_transfer(report, rows, repeat):
+    """Export and import throughput, then peak Python memory in a traced run"""
+    with tempfile.TemporaryDirectory() as directory:
+        for fmt in FORMATS:
+            path = os.path.join(directory, f'todos.{fmt}')
+
+            def export():
+                with open(path, 'w', newline='', encoding='utf-8') as output:
+                    output.writelines(export_lines(fmt=fmt))
+
+            def load():
+                with open(path, newline='', encoding='utf-8') as stream:
+                    return import_rows(read_rows(stream, fmt)).created
+
+            # Earlier imports grow the table, so count what is exported
+            exported = ToDo.objects.count()
+            start = time.perf_counter()
+            export()
+            rate = exported / (time.perf_counter() - start)
+            report(f'  export {fmt}: {rate:,.0f} rows/s  peak {peak_memory(export):.1f} MiB')
+
+            start = time.perf_counter()
+            created = load()
+            rate = created / (time.perf_counter() - start)
+            report(f'  import {fmt}: {rate:,.0f} rows/s  peak {peak_memory(load):.1f} MiB')
+
+
+def add_sqlite_database(alias, path, profile):
+    """Register a file-backed SQLite database ``alias`` using ``profile``"""
+    settings_dict = {
+        **connections['default'].settings_dict,
+        'NAME': path,
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': False,
+        'OPTIONS': {},
+        'TEST': {},
+        **DB_PROFILES[profile]['database'],
+    }
+    connections.settings[alias] = settings_dict
+
+
+def mixed_load(alias, readers, writers, seconds):
+    """Run reader and writer threads against ``alias`` for ``seconds``
+
+    Writers insert one task per transaction, like the quick-add form;
+    readers fetch a page of today's and the undated tasks, like the
+    dashboard. Returns ``(reads, writes, lock_errors)``.
+    """
+    today = timezone.now().date()
+    counts = {'reads': 0, 'writes': 0, 'locked': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def run(operation, key):
+        done = locked = 0
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    operation()
+                    done += 1
+                except OperationalError as error:
+                    if 'locked' not in str(error):
+                        raise
+                    locked += 1
+        finally:
+            connections[alias].close()
+        with lock:
+            counts[key] += done
+            counts['locked'] += locked
+
+    def read():
+        todos = ToDo.objects.using(alias)
+        list(todos.filter(due_date=today)[:50])
+        list(todos.filter(due_date__isnull=True)[:50])
+
+    def write():
+        ToDo.objects.using(alias).create(name='Quick add', due_date=today)
+
+    threads = [threading.Thread(target=run, args=(read, 'reads')) for _ in range(readers)]
+    threads += [threading.Thread(target=run, args=(write, 'writes')) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts['reads'], counts['writes'], counts['locked']
+
+
+@scenario('sqlite_profile')
+def bench_sqlite_profile(report, rows, repeat):
+    """Concurrent reads and writes on a file database, per database profile"""
+    seconds = max(repeat / 4, 3)
+    for profile in DB_PROFILES:
+        alias = f'benchmark_{profile}'
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(TODO_SQLITE_PRAGMAS=DB_PROFILES[profile]['pragmas']):
+            add_sqlite_database(alias, os.path.join(directory, 'profile.sqlite3'), profile)
+            try:
+                call_command('migrate', database=alias, verbosity=0)
+                seed_todos(min(rows, 100_000), using=alias)
+                connections[alias].close()
+                reads, writes, locked = mixed_load(alias, readers=8, writers=4, seconds=seconds)
+            finally:
+                connections[alias].close()
+                del connections[alias]
+                del connections.settings[alias]
+        report(
+            f'  {profile}: {reads / seconds:,.0f} reads/s  {writes / seconds:,.0f} writes/s  '
+            f'"database is locked": {locked}'
+        )
@@ -0,0 +1,87 @@
+"""Fragment caching for the todo_list dashboard
+
+Each bucket's rendered section is cached under a key built from a
+dashboard version, the owner whose tasks it shows, today's date and the
+query string. Saving or deleting a ToDo bumps the version (see
+``signals.py``), as do the bulk paths that bypass signals, so every
+cached fragment goes stale at once; the date in the key retires
+yesterday's fragments when the day rolls over. Stale entries are never
+read again and simply expire.
+
+The cache alias and timeout come from ``TODO_FRAGMENT_CACHE_ALIAS`` and
+``TODO_FRAGMENT_CACHE_TIMEOUT``, so any configured backend can be used.
+"""
+import hashlib
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .owners import owner_key
+
+VERSION_KEY = 'todo:dashboard:version'
+
+# Fragment lookups since startup, per process: {'hits': n, 'misses': n}
+stats = Counter()
+
+
+def get_cache():
+    return caches[getattr(settings, 'TODO_FRAGMENT_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'TODO_FRAGMENT_CACHE_TIMEOUT', 300)
+
+
+def _initial_version():
+    # Never restart from a small number after an eviction or restart,
+    # or fragments cached under an old version could be served again
+    return time.time_ns()
+
+
+def get_version():
+    return get_cache().get_or_set(VERSION_KEY, _initial_version, timeout=None)
+
+
+async def aget_version():
+    return await get_cache().aget_or_set(VERSION_KEY, _initial_version, timeout=None)
+
+
+def bump_version(**kwargs):
+    """Invalidate every cached fragment; usable as a signal receiver"""
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _initial_version(), timeout=None)
+
+
+def invalidate():
+    """Bump the version now and again when the current transaction commits
+
+    Bumping now makes reads inside the transaction miss; bumping on commit
+    drops anything cached from the old rows in the meantime.
+    """
+    bump_version()
+    transaction.on_commit(bump_version)
+
+
+def fragment_key(version, today, bucket, query_string='', owner=None):
+    digest = hashlib.md5(query_string.encode(), usedforsecurity=False).hexdigest()
+    return f'todo:dashboard:{version}:{owner_key(owner)}:{today.isoformat()}:{bucket}:{digest}'
+
+
+def record(hits, misses):
+    stats['hits'] += hits
+    stats['misses'] += misses
+
+
+def get_stats():
+    """Return ``{'hits': n, 'misses': n}`` for this process"""
+    return {'hits': stats['hits'], 'misses': stats['misses']}
+
+
+def reset_stats():
+    stats.clear()
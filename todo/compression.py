@@ -0,0 +1,79 @@
+"""Response compression: brotli where the client accepts it, else gzip
+
+``CompressionMiddleware`` extends Django's ``GZipMiddleware``. When the
+optional ``brotli`` package is installed and the request's
+``Accept-Encoding`` lists ``br`` with a non-zero q-value, complete
+responses are brotli-encoded, which for the task list is about a fifth
+smaller than gzip. Streaming responses (exports) and clients without
+``br`` get gzip as before. Server-Sent Event streams are left alone:
+compressors buffer, and each event must reach the browser as soon as
+it's sent.
+
+Pages can hold secrets (the CSRF token, task names), and a page that
+also reflects attacker-chosen input lets its compressed size leak them
+(BREACH). Django's gzip pads its output with a random number of bytes
+against this; brotli has nowhere to put that padding. So brotli is
+used only for GET and HEAD requests without a query string, where
+nothing in the page comes from the request. Searches, cursor pages and
+form posts get Django's padded gzip.
+"""
+import re
+
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+# Quality 11 compresses best but is far too slow for pages rendered per
+# request; 5 is still smaller than gzip's best and costs about as much
+BROTLI_QUALITY = 5
+
+# Smaller responses grow when compressed, as in GZipMiddleware
+MIN_LENGTH = 200
+
+
+def accepts_brotli(request):
+    """Whether ``Accept-Encoding`` lists ``br`` without refusing it (``br;q=0``)"""
+    for coding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, *params = [part.strip() for part in coding.split(';')]
+        if name.lower() != 'br':
+            continue
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def reflects_input(request):
+    """Whether the response may echo request input: form posts and query strings"""
+    return request.method not in ('GET', 'HEAD') or bool(request.META.get('QUERY_STRING'))
+
+
+class CompressionMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').startswith('text/event-stream'):
+            return response
+        if brotli is None or response.streaming or reflects_input(request) or not accepts_brotli(request):
+            return super().process_response(request, response)
+        if len(response.content) < MIN_LENGTH or response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(response.content))
+        # The body's bytes differ from the uncompressed one's
+        if response.has_header('ETag'):
+            response.headers['ETag'] = re.sub(r'^"', 'W/"', response.headers['ETag'])
+        response.headers['Content-Encoding'] = 'br'
+        return response
@@ -0,0 +1,100 @@
+"""HTTP validators for pages rendered from an owner's ToDo rows
+
+``todo_list`` and ``todo_search`` answer ``If-None-Match`` and
+``If-Modified-Since`` through Django's ``condition`` decorator. Their
+validator comes from one query: the highest id and latest ``updated_at``
+of the requesting owner's rows in ``todo_todo`` plus the deletion count
+and time kept by ``ToDoTombstone``, so inserts, updates and deletes all
+change it. A task given to another owner counts as a deletion too. Today's
+date is part of it as well because the buckets move at midnight.
+Deletions are counted across owners, so anyone's delete changes
+everyone's validator; that costs a full response, never a stale one.
+
+Every part is an index lookup. Ids are never reused (SQLite tables use
+AUTOINCREMENT), so the highest id stands in for the row count, which
+would scan the table.
+"""
+import hashlib
+from functools import wraps
+from datetime import datetime, time, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.db.models import Max, Subquery, Value
+from django.views.decorators.http import condition
+
+from .dates import as_of
+from .models import ToDo, ToDoTombstone
+from .owners import owner_key, owner_of
+
+
+def table_state(owner=None):
+    """Return ``(last_id, last_updated, deletions, deleted_at)`` for ``owner`` in one query"""
+    todos = ToDo.objects.owned_by(owner).order_by().values(table=Value(1))
+    state = (
+        ToDoTombstone.objects.filter(pk=ToDoTombstone.SINGLETON_PK)
+        .annotate(
+            last_id=Subquery(todos.annotate(last_id=Max('pk')).values('last_id')),
+            last_updated=Subquery(todos.annotate(last_updated=Max('updated_at')).values('last_updated')),
+        )
+        .values_list('last_id', 'last_updated', 'deletions', 'deleted_at')
+        .first()
+    )
+    if state is None:
+        # No tombstone row yet, so nothing has been deleted through it
+        aggregate = ToDo.objects.owned_by(owner).aggregate(last_id=Max('pk'), last_updated=Max('updated_at'))
+        state = (aggregate['last_id'], aggregate['last_updated'], 0, None)
+    return state
+
+
+def _validator(request):
+    """The validator for ``request``, computed once, or None to skip it
+
+    Only GET and HEAD are validated. Requests with messages waiting get a
+    full response, or a 304 would swallow the message.
+    """
+    if not hasattr(request, '_todo_validator'):
+        request._todo_validator = None
+        if request.method in ('GET', 'HEAD') and not len(messages.get_messages(request)):
+            # The same "today" the views bucket by
+            today = as_of(request)
+            owner = owner_of(request)
+            last_id, last_updated, deletions, deleted_at = table_state(owner)
+            midnight = datetime.combine(today, time.min, tzinfo=dt_timezone.utc)
+            changed = [moment for moment in (last_updated, deleted_at, midnight) if moment]
+            key = (
+                f'{owner_key(owner)}:{last_id}:{last_updated and last_updated.isoformat()}:'
+                f'{deletions}:{today.isoformat()}'
+            )
+            request._todo_validator = (hashlib.md5(key.encode(), usedforsecurity=False).hexdigest(), max(changed))
+    return request._todo_validator
+
+
+def todo_etag(request, *args, **kwargs):
+    validator = _validator(request)
+    # Weak: the rendered page differs per response (the CSRF token)
+    return validator and f'W/"{validator[0]}"'
+
+
+def todo_last_modified(request, *args, **kwargs):
+    validator = _validator(request)
+    return validator and validator[1]
+
+
+todo_table_condition = condition(etag_func=todo_etag, last_modified_func=todo_last_modified)
+
+
+def async_todo_table_condition(view):
+    """``todo_table_condition`` for async views
+
+    ``condition()`` calls the validator functions synchronously, so the
+    validator query runs in a thread first and they read it from the
+    request.
+    """
+    conditional = todo_table_condition(view)
+
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        await sync_to_async(_validator)(request)
+        return await conditional(request, *args, **kwargs)
+    return inner
@@ -0,0 +1,192 @@
+"""Denormalized task counts for the todo_list header badges
+
+``todo_todocounter`` holds one row per (owner, status, priority,
+due_date) with the number of tasks that have those values. On SQLite,
+triggers on ``todo_todo`` keep it current inside the statement that
+changes a task, so saves, ``update()``, ``bulk_create()``, deletes and
+raw SQL are all counted in the same transaction. Summaries sum a handful
+of counter rows instead of counting the table.
+
+Counters are kept per due date rather than per dashboard bucket because
+the buckets move every midnight; ``summary()`` folds the dates into
+buckets for the day asked about. Other backends have no triggers and
+fall back to counting ``todo_todo``.
+
+As with the FTS triggers, a migration that remakes ``todo_todo`` must
+call ``install_counters()`` again. Migrations written before a change to
+``KEY_FIELDS`` pass the fields their schema had.
+"""
+from asgiref.sync import sync_to_async
+from django.db import connections, transaction
+from django.db.models import Count, Q, Sum
+
+from . import caching, recurrence
+from .dashboard import TODAY, bucket_conditions
+from .models import ToDo, ToDoCounter
+
+COUNTER_TABLE = ToDoCounter._meta.db_table
+
+KEY_FIELDS = ['owner_id', 'status', 'priority', 'due_date']
+
+_counter_tables = {}
+
+
+def _adjust(row, delta, key_fields):
+    """Trigger SQL adding ``delta`` to the counter of ``row`` (old or new)"""
+    match = ' AND '.join(f'{field} IS {row}.{field}' for field in key_fields)
+    columns = ', '.join(key_fields)
+    values = ', '.join(f'{row}.{field}' for field in key_fields)
+    return (
+        f"INSERT INTO {COUNTER_TABLE} ({columns}, count) SELECT {values}, 0 "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {COUNTER_TABLE} WHERE {match}); "
+        f"UPDATE {COUNTER_TABLE} SET count = count + ({delta}) WHERE {match}; "
+    )
+
+
+def install_counters(schema_editor, key_fields=KEY_FIELDS):
+    """Create the counter triggers, then recount every task"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    table = ToDo._meta.db_table
+    changed = ' OR '.join(f'old.{field} IS NOT new.{field}' for field in key_fields)
+    statements = [
+        f"DROP TRIGGER IF EXISTS {COUNTER_TABLE}_insert",
+        f"DROP TRIGGER IF EXISTS {COUNTER_TABLE}_delete",
+        f"DROP TRIGGER IF EXISTS {COUNTER_TABLE}_update",
+        f"CREATE TRIGGER {COUNTER_TABLE}_insert AFTER INSERT ON {table} BEGIN "
+        f"{_adjust('new', 1, key_fields)} END",
+        f"CREATE TRIGGER {COUNTER_TABLE}_delete AFTER DELETE ON {table} BEGIN "
+        f"{_adjust('old', -1, key_fields)} END",
+        f"CREATE TRIGGER {COUNTER_TABLE}_update AFTER UPDATE OF {', '.join(key_fields)} ON {table} "
+        f"WHEN {changed} BEGIN {_adjust('old', -1, key_fields)}{_adjust('new', 1, key_fields)} END",
+    ]
+    for statement in statements:
+        schema_editor.execute(statement)
+    rebuild(schema_editor.connection.alias, key_fields)
+
+
+def uninstall_counters(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for trigger in ('insert', 'delete', 'update'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {COUNTER_TABLE}_{trigger}')
+
+
+def has_counters(using='default'):
+    """Whether the counter triggers exist on the ``using`` database"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    key = (using, str(connection.settings_dict['NAME']))
+    if key not in _counter_tables:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name = %s",
+                [f'{COUNTER_TABLE}_insert'],
+            )
+            _counter_tables[key] = bool(cursor.fetchone()[0])
+    return _counter_tables[key]
+
+
+def actual_counts(using='default'):
+    """``{(owner_id, status, priority, due_date): count}`` counted from ``todo_todo``"""
+    rows = ToDo.objects.using(using).order_by().values(*KEY_FIELDS).annotate(count=Count('pk'))
+    return {tuple(row[field] for field in KEY_FIELDS): row['count'] for row in rows}
+
+
+def stored_counts(using='default'):
+    rows = ToDoCounter.objects.using(using).exclude(count=0).values_list(*KEY_FIELDS, 'count')
+    return {tuple(row[:-1]): row[-1] for row in rows}
+
+
+def rebuild(using='default', key_fields=KEY_FIELDS):
+    """Replace every counter with a fresh count of ``todo_todo``
+
+    Plain SQL, so migrations can call it whatever the model looks like later.
+    """
+    columns = ', '.join(key_fields)
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {COUNTER_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {COUNTER_TABLE} ({columns}, count) '
+            f'SELECT {columns}, COUNT(*) FROM {ToDo._meta.db_table} GROUP BY {columns}'
+        )
+        return cursor.rowcount
+
+
+def verify(using='default'):
+    """Return ``[(key, stored, actual)]`` for every counter that is wrong"""
+    stored, actual = stored_counts(using), actual_counts(using)
+    return [
+        (key, stored.get(key, 0), actual.get(key, 0))
+        for key in sorted(stored.keys() | actual.keys(), key=repr)
+        if stored.get(key, 0) != actual.get(key, 0)
+    ]
+
+
+def summary(today, owner=None, using='default'):
+    """``owner``'s badge counts for ``today`` in one query
+
+    ``overdue``, ``today``, ``future`` and ``no_date`` match the dashboard
+    buckets; ``pending`` and ``pending_high`` count pending tasks.
+    """
+    conditions = {
+        **bucket_conditions(today),
+        'pending': Q(status='pending'),
+        'pending_high': Q(status='pending', priority='high'),
+    }
+    if has_counters(using):
+        counts = ToDoCounter.objects.using(using).filter(owner=owner).aggregate(**{
+            name: Sum('count', filter=condition, default=0) for name, condition in conditions.items()
+        })
+    else:
+        counts = ToDo.objects.using(using).owned_by(owner).aggregate(**{
+            name: Count('pk', filter=condition) for name, condition in conditions.items()
+        })
+    return counts
+
+
+def badge_counts(today, owner=None):
+    """``summary()`` with today's occurrences of recurring tasks, which have no rows, in ``today``"""
+    counts = summary(today, owner)
+    counts[TODAY] += recurrence.count_on(today, recurrence.active_series(today, owner))
+    return counts
+
+
+def summary_key(today, version, owner=None):
+    return caching.fragment_key(version, today, 'summary', owner=owner)
+
+
+def cached_summary(today, owner=None):
+    """``badge_counts()`` through the dashboard cache, invalidated with it"""
+    cache = caching.get_cache()
+    key = summary_key(today, caching.get_version(), owner)
+    counts = cache.get(key)
+    if counts is None:
+        counts = badge_counts(today, owner)
+        cache.set(key, counts, caching.get_timeout())
+    return counts
+
+
+async def acached_summary(today, owner=None):
+    """``cached_summary`` for async views"""
+    cache = caching.get_cache()
+    key = summary_key(today, await caching.aget_version(), owner)
+    counts = await cache.aget(key)
+    if counts is None:
+        counts = await sync_to_async(badge_counts)(today, owner)
+        await cache.aset(key, counts, caching.get_timeout())
+    return counts
+
+
+def total(using='default'):
+    """The number of tasks, summed from the counters"""
+    return ToDoCounter.objects.using(using).aggregate(total=Sum('count', default=0))['total']
+
+
+def owned_total(owner, using='default'):
+    """The number of ``owner``'s tasks, from the counters where they exist"""
+    if not has_counters(using):
+        return ToDo.objects.using(using).owned_by(owner).count()
+    counts = ToDoCounter.objects.using(using).filter(owner=owner)
+    return counts.aggregate(total=Sum('count', default=0))['total']
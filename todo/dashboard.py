@@ -0,0 +1,268 @@
+"""Loading the todo_list dashboard in a single query"""
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import connection, connections
+from django.db.models import Case, CharField, Q, Value, When
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
+from django.utils.safestring import mark_safe
+
+from . import caching, recurrence
+from .models import ToDo, overdue_condition
+from .owners import aowner_of, owner_of
+from .pagination import Keyset, get_page_size
+
+OVERDUE = 'overdue'
+TODAY = 'today'
+FUTURE = 'future'
+NO_DATE = 'no_date'
+
+BUCKETS = [OVERDUE, TODAY, FUTURE, NO_DATE]
+
+# CSS class and heading of each bucket's section
+SECTIONS = {
+    OVERDUE: ('section overdue', '🚨 Overdue Tasks'),
+    TODAY: ('section today', "📅 Today's Tasks"),
+    FUTURE: ('section future', '🔮 Upcoming Tasks'),
+    NO_DATE: ('section', '📋 Tasks Without Due Date'),
+}
+
+# Views linked from every row, each taking the task's pk
+ROW_ACTIONS = ['todo_mark_done', 'todo_mark_skipped', 'todo_mark_pending', 'todo_edit', 'todo_delete']
+
+# Stands in for the pk when reversing a row URL; no real pk is this large
+URL_PK_PLACEHOLDER = 9_876_543_210_123
+
+# Meta.ordering with the primary key as a tie-breaker
+TODO_KEYSET = Keyset(ToDo, 'due_date', '-created_at', 'id')
+
+
+def bucket_conditions(today):
+    """Map each bucket to the filter that selects its rows"""
+    return {
+        OVERDUE: overdue_condition(today),
+        TODAY: Q(due_date=today),
+        FUTURE: Q(due_date__gt=today),
+        NO_DATE: Q(due_date__isnull=True),
+    }
+
+
+def dashboard_queryset(today, cursors=None, page_size=None, buckets=None, owner=None):
+    """One page of every bucket of ``owner``'s tasks, tagged with its bucket, in one query
+
+    ``cursors`` maps bucket names to the decoded ``Cursor`` each bucket
+    resumes after; ``buckets`` limits the query to some of the buckets.
+    Each bucket is a LIMITed index seek in its own subquery, so the cost
+    depends on the page size rather than the table size. At most
+    ``page_size + 1`` rows come back per bucket; the extra row only
+    signals that another page exists. The owner indexes keep each seek
+    within ``owner``'s rows however many other owners there are.
+    """
+    cursors = cursors or {}
+    page_size = page_size or get_page_size()
+    conditions = bucket_conditions(today)
+    ordering = TODO_KEYSET.order_by()
+    todos = ToDo.objects.owned_by(owner)
+    on_page = Q(pk__in=[])
+    for name, condition in conditions.items():
+        if buckets is not None and name not in buckets:
+            continue
+        if name in cursors:
+            condition &= TODO_KEYSET.after(cursors[name].values)
+        page = todos.filter(condition).order_by(*ordering).values('pk')[:page_size + 1]
+        on_page |= Q(pk__in=page)
+    return (
+        ToDo.objects.filter(on_page)
+        .annotate(
+            bucket=Case(
+                *[When(condition, then=Value(name)) for name, condition in conditions.items()],
+                output_field=CharField(),
+            ),
+        )
+        .order_by(*ordering)
+    )
+
+
+def load_dashboard(today, cursors=None, page_size=None, buckets=None, owner=None):
+    """Fetch and partition ``owner``'s dashboard, returning ``{bucket: Page}``
+
+    ``cursors`` maps bucket names to cursor strings from the query string.
+    Only ``buckets`` are fetched and returned when given. The today and
+    future pages include occurrences of recurring tasks (see
+    ``recurrence.py``).
+    """
+    buckets = BUCKETS if buckets is None else buckets
+    page_size = page_size or get_page_size()
+    cursors = {
+        name: TODO_KEYSET.decode(cursor)
+        for name, cursor in (cursors or {}).items() if cursor
+    }
+    rows = {name: [] for name in buckets}
+    # The ordering applies across the whole result, so each bucket
+    # receives its rows already sorted
+    if buckets:
+        for todo in dashboard_queryset(today, cursors, page_size, buckets, owner).iterator():
+            rows[todo.bucket].append(todo)
+    # Today and the future also list the occurrences of recurring tasks
+    windows = {TODAY: (today, today), FUTURE: (today + timedelta(days=1), None)}
+    if windows.keys() & rows.keys():
+        series = recurrence.active_series(today, owner)
+        for name, (start, end) in windows.items():
+            if name in rows and series:
+                rows[name] = recurrence.merge_occurrences(
+                    rows[name], series, start, end, cursors.get(name), page_size + 1,
+                )
+    return {
+        name: TODO_KEYSET.page(rows[name], page_size, cursors[name].seen if name in cursors else 0)
+        for name in buckets
+    }
+
+
+def bucket_cursors(request, buckets):
+    """The ``<bucket>_after`` cursor strings in the query string"""
+    return {name: request.GET.get(f'{name}_after') for name in buckets}
+
+
+def fragment_keys(request, today, version, owner=None):
+    query_string = request.GET.urlencode()
+    return {name: caching.fragment_key(version, today, name, query_string, owner) for name in BUCKETS}
+
+
+def row_url_prefixes():
+    """Map each row action to the URL before the pk, e.g. ``'mark_done': '/mark-done/'``
+
+    Rows build their links as prefix, pk and a trailing slash, so a
+    render reverses each action once instead of once per row.
+    """
+    prefixes = {}
+    for name in ROW_ACTIONS:
+        url = reverse(name, args=[URL_PK_PLACEHOLDER])
+        prefix, suffix = url.split(str(URL_PK_PLACEHOLDER))
+        if suffix != '/':
+            raise ValueError(f'{name} URLs must end with the pk and a slash, not {url!r}')
+        prefixes[name.removeprefix('todo_')] = prefix
+    return prefixes
+
+
+def render_sections(request, pages):
+    """Render the section of each bucket in ``pages``, returning ``{bucket: html}``"""
+    template = get_template('todo/_bucket_section.html')
+    row_urls = row_url_prefixes()
+    sections = {}
+    for name, page in pages.items():
+        load_more_url = None
+        if page.has_next:
+            params = request.GET.copy()
+            params[f'{name}_after'] = page.next_cursor
+            load_more_url = f'?{params.urlencode()}'
+        section_class, title = SECTIONS[name]
+        sections[name] = template.render({
+            'bucket': name,
+            'overdue': name == OVERDUE,
+            'section_class': section_class,
+            'title': title,
+            'todos': page,
+            'row_urls': row_urls,
+            'load_more_url': load_more_url,
+        }, request)
+    return sections
+
+
+def with_lazy_pages(request, today, pages, owner=None):
+    """Fill in the buckets missing from ``pages`` with pages loaded on first use"""
+    for name in BUCKETS:
+        if name not in pages:
+            pages[name] = SimpleLazyObject(
+                lambda name=name: load_dashboard(
+                    today, bucket_cursors(request, [name]), buckets=[name], owner=owner,
+                )[name]
+            )
+    return pages
+
+
+def render_dashboard(request, today):
+    """Render each bucket's section, from the fragment cache where possible
+
+    Returns ``(fragments, pages)``: the sections' HTML in ``BUCKETS``
+    order and ``{bucket: Page}``. Only the buckets missing from the cache
+    are queried, in one query; pages of cached buckets are lazy and only
+    hit the database if something reads them. Only the requesting
+    owner's tasks are shown, and cached under the owner's keys.
+    """
+    owner = owner_of(request)
+    cache = caching.get_cache()
+    keys = fragment_keys(request, today, caching.get_version(), owner)
+    fragments = cache.get_many(keys.values())
+    missing = [name for name in BUCKETS if keys[name] not in fragments]
+    caching.record(hits=len(BUCKETS) - len(missing), misses=len(missing))
+
+    pages = load_dashboard(today, bucket_cursors(request, missing), buckets=missing, owner=owner)
+    rendered = {keys[name]: html for name, html in render_sections(request, pages).items()}
+    if rendered:
+        cache.set_many(rendered, caching.get_timeout())
+    fragments.update(rendered)
+    return [mark_safe(fragments[keys[name]]) for name in BUCKETS], with_lazy_pages(request, today, pages, owner)
+
+
+# Async views
+
+def can_query_concurrently(using='default'):
+    """Whether the buckets are worth querying on separate connections
+
+    Not inside a transaction, whose writes other connections cannot see,
+    and not on SQLite: its queries here take a millisecond or two, less
+    than opening the extra connections, so one query is faster.
+    """
+    connection = connections[using]
+    return connection.vendor != 'sqlite' and not connection.in_atomic_block
+
+
+def load_bucket(today, cursors, page_size, name, owner=None):
+    """Load one bucket on this worker thread's connection
+
+    The connection is closed afterwards unless ``CONN_MAX_AGE`` keeps it.
+    """
+    try:
+        return load_dashboard(today, cursors, page_size, buckets=[name], owner=owner)[name]
+    finally:
+        connection.close_if_unusable_or_obsolete()
+
+
+async def aload_dashboard(today, cursors=None, page_size=None, buckets=None, owner=None):
+    """``load_dashboard`` for async views
+
+    Where the backend allows it, each bucket is a query of its own on its
+    own connection and the queries run concurrently in worker threads.
+    Otherwise every bucket comes from the usual single query.
+    """
+    buckets = BUCKETS if buckets is None else buckets
+    if not buckets:
+        return {}
+    if len(buckets) == 1 or not await sync_to_async(can_query_concurrently)():
+        return await sync_to_async(load_dashboard)(today, cursors, page_size, buckets, owner)
+    pages = await asyncio.gather(*[
+        sync_to_async(load_bucket, thread_sensitive=False)(today, cursors, page_size, name, owner)
+        for name in buckets
+    ])
+    return dict(zip(buckets, pages))
+
+
+async def arender_dashboard(request, today):
+    """``render_dashboard`` for async views"""
+    owner = await aowner_of(request)
+    cache = caching.get_cache()
+    keys = fragment_keys(request, today, await caching.aget_version(), owner)
+    fragments = await cache.aget_many(keys.values())
+    missing = [name for name in BUCKETS if keys[name] not in fragments]
+    caching.record(hits=len(BUCKETS) - len(missing), misses=len(missing))
+
+    pages = await aload_dashboard(today, bucket_cursors(request, missing), buckets=missing, owner=owner)
+    sections = await sync_to_async(render_sections)(request, pages)
+    rendered = {keys[name]: html for name, html in sections.items()}
+    if rendered:
+        await cache.aset_many(rendered, caching.get_timeout())
+    fragments.update(rendered)
+    return [mark_safe(fragments[keys[name]]) for name in BUCKETS], with_lazy_pages(request, today, pages, owner)
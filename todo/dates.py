@@ -0,0 +1,17 @@
+"""The date a request judges "today" and "overdue" by
+
+``as_of(request)`` reads the clock once per request and returns the same
+date for the rest of it. The dashboard buckets, header counts, overdue
+annotations and the conditional GET validator all use it, so a response
+rendered across midnight is consistent with itself and with its ETag.
+"""
+from django.utils import timezone
+
+
+def as_of(request=None):
+    """Today's date for ``request``, fixed on first use; the current date without one"""
+    if request is None:
+        return timezone.now().date()
+    if not hasattr(request, '_todo_as_of'):
+        request._todo_as_of = timezone.now().date()
+    return request._todo_as_of
@@ -0,0 +1,206 @@
+"""Row-level change events for live dashboards, sent as Server-Sent Events
+
+Saving, deleting or changing the status of a ToDo publishes a small
+event once the transaction commits (``signals.py`` wires them up and
+``live.py`` builds them):
+
+- ``created`` / ``updated``: the task's id and owner, the dashboard
+  bucket it now belongs in (null if none), its rendered row, the id of
+  the row it goes before (null for the end of the bucket) and the owner's
+  header counts
+- ``deleted``: the task's id and owner and the owner's header counts
+- ``reload``: a bulk change the page should reload for
+
+The async ``todo_events`` view streams them to each open dashboard, whose
+``todo/live.js`` patches the page in place. Each stream only passes on
+the events of its owner's tasks (see ``for_owner()``); reloads have no
+owner and reach every dashboard.
+
+Events go through a broker chosen by ``TODO_EVENTS_BROKER``.
+``InProcessBroker``, the default, only reaches clients connected to the
+same process; ``CacheBroker`` passes events through a shared cache
+(Redis, Memcached, database) so that several workers see each other's
+changes. Brokers implement ``publish()``, ``wants_events()`` and an
+async ``subscribe()``.
+"""
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils.module_loading import import_string
+
+# Sent by changes that bypass post_save, such as ``set_status()``, with
+# ``pks``: the ids changed, or None when there were too many to list
+rows_changed = Signal()
+
+# Changes to more rows than this reload open dashboards instead
+MAX_ROW_EVENTS = 50
+
+# Seconds without an event before a stream sends a comment, so proxies
+# and browsers don't drop an idle connection
+DEFAULT_KEEPALIVE = 15
+
+_brokers = {}
+
+
+class BaseBroker:
+    def wants_events(self):
+        """Whether anyone may be listening; publishers skip the work if not"""
+        return True
+
+    def publish(self, event):
+        raise NotImplementedError
+
+    async def subscribe(self, keepalive):
+        """Yield events as they're published, or None after ``keepalive`` idle seconds"""
+        raise NotImplementedError
+        yield
+
+
+class InProcessBroker(BaseBroker):
+    """Fan events out to the streams open in this process
+
+    ``publish()`` is called from request threads; each stream's queue
+    belongs to an event loop, so events are handed over with
+    ``call_soon_threadsafe``. A stream that falls ``max_queued`` events
+    behind is told to reload instead.
+    """
+
+    def __init__(self, max_queued=100):
+        self.max_queued = max_queued
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def wants_events(self):
+        return bool(self.subscribers)
+
+    def publish(self, event):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, event)
+            except RuntimeError:
+                # The loop closed after the stream subscribed
+                pass
+
+    def _offer(self, queue, event):
+        if queue.full():
+            while not queue.empty():
+                queue.get_nowait()
+            event = {'type': 'reload'}
+        queue.put_nowait(event)
+
+    async def subscribe(self, keepalive):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(self.max_queued))
+        with self.lock:
+            self.subscribers.add(subscriber)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscriber[1].get(), keepalive)
+                except TimeoutError:
+                    yield None
+        finally:
+            with self.lock:
+                self.subscribers.discard(subscriber)
+
+
+class CacheBroker(BaseBroker):
+    """Pass events between processes through a shared cache
+
+    Each event is stored under a sequence number from ``incr``; streams
+    poll the sequence every ``poll_interval`` seconds and read the events
+    they haven't seen. A stream that misses an expired event reloads.
+    Needs a cache every process shares, not the per-process locmem one.
+    """
+    SEQUENCE_KEY = 'todo:events:sequence'
+
+    def __init__(self, alias=None, poll_interval=1.0, timeout=60):
+        self.alias = alias or getattr(settings, 'TODO_EVENTS_CACHE_ALIAS', 'default')
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def event_key(self, number):
+        return f'todo:events:{number}'
+
+    def publish(self, event):
+        self.cache.add(self.SEQUENCE_KEY, 0, timeout=None)
+        number = self.cache.incr(self.SEQUENCE_KEY)
+        self.cache.set(self.event_key(number), event, self.timeout)
+
+    async def subscribe(self, keepalive):
+        seen = await self.cache.aget(self.SEQUENCE_KEY, 0)
+        idle = 0
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            latest = await self.cache.aget(self.SEQUENCE_KEY, 0)
+            if latest < seen:
+                # The sequence was evicted and started again
+                seen = 0
+                yield {'type': 'reload'}
+            if latest > seen:
+                keys = [self.event_key(number) for number in range(seen + 1, latest + 1)]
+                found = await self.cache.aget_many(keys)
+                if len(found) < len(keys):
+                    yield {'type': 'reload'}
+                else:
+                    for key in keys:
+                        yield found[key]
+                seen = latest
+                idle = 0
+                continue
+            idle += self.poll_interval
+            if idle >= keepalive:
+                idle = 0
+                yield None
+
+
+def get_broker():
+    path = getattr(settings, 'TODO_EVENTS_BROKER', 'todo.events.InProcessBroker')
+    if path not in _brokers:
+        _brokers[path] = import_string(path)()
+    return _brokers[path]
+
+
+def get_keepalive():
+    return getattr(settings, 'TODO_EVENTS_KEEPALIVE', DEFAULT_KEEPALIVE)
+
+
+def publish(build_events):
+    """Publish the events ``build_events()`` returns when the transaction commits
+
+    They're built then, not now, so that they reflect committed rows, and
+    not at all when nobody is listening.
+    """
+    def send():
+        broker = get_broker()
+        if broker.wants_events():
+            for event in build_events():
+                broker.publish(event)
+    transaction.on_commit(send)
+
+
+def publish_reload():
+    """Tell open dashboards to reload, after a change too big to patch"""
+    publish(lambda: [{'type': 'reload'}])
+
+
+def for_owner(event, owner_id):
+    """Whether ``event`` belongs on the dashboard of ``owner_id`` (None for unowned tasks)"""
+    return event is None or event.get('owner', owner_id) == owner_id
+
+
+def format_event(event):
+    """Encode ``event`` as an SSE message; None becomes a keepalive comment"""
+    if event is None:
+        return ': keepalive\n\n'
+    return f'event: {event["type"]}\ndata: {json.dumps(event)}\n\n'
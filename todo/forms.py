@@ -1,4 +1,5 @@
 from django import forms
+from django.core.exceptions import ValidationError
 from .models import ToDo
 
 class TodoForm(forms.ModelForm):
@@ -35,4 +36,58 @@ class QuickAddForm(forms.ModelForm):
                 'type': 'date'
             }),
         }
-        
\ No newline at end of file
+
+
+class TodoImportForm(TodoForm):
+    """TodoForm's rules plus priority, for validating imported rows"""
+    class Meta(TodoForm.Meta):
+        fields = TodoForm.Meta.fields + ['priority']
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Files written before priority existed leave it out
+        self.fields['priority'].required = False
+    
+    def clean_priority(self):
+        return self.cleaned_data['priority'] or ToDo._meta.get_field('priority').default
+
+
+# The largest id SQLite (a signed 64-bit integer) can store; larger ones
+# overflow in the driver instead of matching nothing
+MAX_PK = 2**63 - 1
+
+
+class PkListField(forms.Field):
+    """A list of primary keys as repeated values, each possibly comma-separated"""
+    widget = forms.MultipleHiddenInput
+    
+    def to_python(self, value):
+        if not value:
+            return []
+        try:
+            pks = [int(pk) for item in value for pk in str(item).split(',') if pk.strip()]
+        except (TypeError, ValueError):
+            raise ValidationError('Enter a list of task ids.', code='invalid')
+        if any(pk < 1 or pk > MAX_PK for pk in pks):
+            raise ValidationError('Enter a list of task ids.', code='invalid')
+        return pks
+
+
+class BulkStatusForm(forms.Form):
+    """Apply one status to many tasks at once"""
+    pk = PkListField()
+    status = forms.ChoiceField(choices=ToDo.STATUS_CHOICES)
+    # Only change tasks still in this status
+    expected = forms.ChoiceField(choices=ToDo.STATUS_CHOICES, required=False)
+
+
+class ApiListForm(forms.Form):
+    """Query string filters for listing tasks through the JSON API"""
+    ids = PkListField(required=False)
+    status = forms.ChoiceField(choices=ToDo.STATUS_CHOICES, required=False)
+    priority = forms.ChoiceField(choices=ToDo.PRIORITY_CHOICES, required=False)
+    # Inclusive due date range
+    due_from = forms.DateField(required=False)
+    due_to = forms.DateField(required=False)
+    limit = forms.IntegerField(min_value=1, max_value=500, required=False)
+    after = forms.CharField(required=False)
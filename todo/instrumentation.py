@@ -0,0 +1,210 @@
+"""Per-request timings: queries, SQL time, template time and total time
+
+``RequestTimingMiddleware`` is opt-in (``DJANGO_TODO_INSTRUMENTATION=1``
+in the environment adds it, see five/settings.py). For each request it
+sends a ``Server-Timing`` header, which browser dev tools show under the
+network tab, and logs one JSON line to the ``todo.instrumentation``
+logger. ``python manage.py request_timings`` turns those lines into
+per-view percentiles.
+
+Measurements for the current request live in a context variable, so they
+follow the request into ``sync_to_async`` threads. SQL is timed by an
+execute wrapper on every connection (``install()``, called when a
+connection opens); it does nothing outside an instrumented request.
+Template time comes from ``TimedDjangoTemplates``, a template backend
+that times each top-level render.
+"""
+import json
+import logging
+import statistics
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('todo_request_metrics', default=None)
+
+FIELDS = ['queries', 'sql_ms', 'slowest_sql_ms', 'template_ms', 'total_ms']
+
+
+def get_log_threshold():
+    """Requests faster than this many ms are not logged; 0 logs them all"""
+    return getattr(settings, 'TODO_INSTRUMENTATION_LOG_MS', 0)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.start = time.perf_counter()
+        # Appends are atomic, so concurrent bucket queries can share these
+        self.sql = []
+        self.templates = []
+        self.rendering = 0
+        self.total = None
+
+    def finish(self):
+        self.total = (time.perf_counter() - self.start) * 1000
+
+    def as_dict(self):
+        return {
+            'queries': len(self.sql),
+            'sql_ms': round(sum(self.sql), 3),
+            'slowest_sql_ms': round(max(self.sql, default=0), 3),
+            'template_ms': round(sum(self.templates), 3),
+            'total_ms': round(self.total, 3),
+        }
+
+    def server_timing(self):
+        values = self.as_dict()
+        return ', '.join([
+            f'db;dur={values["sql_ms"]};desc="{values["queries"]} queries"',
+            f'db-slowest;dur={values["slowest_sql_ms"]}',
+            f'template;dur={values["template_ms"]}',
+            f'total;dur={values["total_ms"]}',
+        ])
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.sql.append((time.perf_counter() - start) * 1000)
+
+
+def install(connection):
+    """Time ``connection``'s queries during instrumented requests"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return self.template.render(context, request)
+        # Only the outermost render counts, should a template render
+        # another through the backend
+        metrics.rendering += 1
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.rendering -= 1
+            if not metrics.rendering:
+                metrics.templates.append((time.perf_counter() - start) * 1000)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing renders for instrumented requests"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class RequestTimingMiddleware:
+    """Send ``Server-Timing`` headers and log timings for each request
+
+    List it first in ``MIDDLEWARE`` so the total covers the other
+    middleware (sessions, messages) as well as the view.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        metrics.finish()
+        timing = metrics.server_timing()
+        if response.has_header('Server-Timing'):
+            timing = f'{response["Server-Timing"]}, {timing}'
+        response['Server-Timing'] = timing
+        if metrics.total >= get_log_threshold():
+            match = request.resolver_match
+            logger.info(json.dumps({
+                'view': match.view_name if match else None,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                **metrics.as_dict(),
+            }))
+        return response
+
+
+def read_log(lines):
+    """Yield the records in ``lines`` of log output, skipping anything else
+
+    Each record is the JSON object at the end of a line, so log formats
+    that prefix a time or level still parse.
+    """
+    for line in lines:
+        start = line.find('{')
+        if start < 0:
+            continue
+        try:
+            data = json.loads(line[start:])
+        except ValueError:
+            continue
+        if isinstance(data, dict) and 'total_ms' in data:
+            yield data
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def aggregate(records):
+    """Summarize records per view: ``{view: {'count', field: {p50, p95, p99, max}}}``"""
+    by_view = {}
+    for data in records:
+        by_view.setdefault(data.get('view') or data.get('path'), []).append(data)
+    summary = {}
+    for view, rows in sorted(by_view.items()):
+        summary[view] = {'count': len(rows)}
+        for field in FIELDS:
+            ordered = sorted(row.get(field, 0) for row in rows)
+            summary[view][field] = {
+                'p50': statistics.median(ordered),
+                'p95': percentile(ordered, 0.95),
+                'p99': percentile(ordered, 0.99),
+                'max': ordered[-1],
+            }
+    return summary
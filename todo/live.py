@@ -0,0 +1,74 @@
+"""The events that keep open dashboards current (see ``events.py``)"""
+from django.template.loader import get_template
+
+from .counters import cached_summary
+from .dates import as_of
+from .dashboard import NO_DATE, OVERDUE, TODAY, FUTURE, TODO_KEYSET, bucket_conditions, row_url_prefixes
+from .models import ToDo
+
+
+def bucket_for(todo, today):
+    """The dashboard bucket ``todo`` is shown in, or None if it isn't shown"""
+    if todo.due_date is None:
+        return NO_DATE
+    if todo.due_date == today:
+        return TODAY
+    if todo.due_date > today:
+        return FUTURE
+    return OVERDUE if todo.status == 'pending' else None
+
+
+def render_row(todo, bucket):
+    """``todo``'s row as it appears in ``bucket``'s section"""
+    return get_template('todo/_bucket_section.html').render({
+        'rows_only': True,
+        'bucket': bucket,
+        'overdue': bucket == OVERDUE,
+        'todos': [todo],
+        'row_urls': row_url_prefixes(),
+    })
+
+
+def next_in_bucket(todo, bucket, today):
+    """The pk of the row after ``todo`` in ``bucket`` of its owner's dashboard, in dashboard order"""
+    return (
+        ToDo.objects.owned_by(todo.owner_id)
+        .filter(bucket_conditions(today)[bucket])
+        .filter(TODO_KEYSET.after(TODO_KEYSET.values(todo)))
+        .order_by(*TODO_KEYSET.order_by())
+        .values_list('pk', flat=True)
+        .first()
+    )
+
+
+def row_event(todo, event_type, today, summary):
+    bucket = bucket_for(todo, today)
+    event = {
+        'type': event_type, 'id': todo.pk, 'owner': todo.owner_id, 'bucket': bucket,
+        'html': None, 'before': None, 'summary': summary,
+    }
+    if bucket:
+        event['html'] = render_row(todo, bucket)
+        event['before'] = next_in_bucket(todo, bucket, today)
+    return event
+
+
+def saved_events(todo, created):
+    today = as_of()
+    return [row_event(todo, 'created' if created else 'updated', today, cached_summary(today, todo.owner_id))]
+
+
+def deleted_events(pk, owner_id):
+    return [{'type': 'deleted', 'id': pk, 'owner': owner_id, 'summary': cached_summary(as_of(), owner_id)}]
+
+
+def changed_events(pks):
+    """``updated`` events for the rows in ``pks`` that still exist, each with its owner's counts"""
+    today = as_of()
+    summaries = {}
+    changed = []
+    for todo in ToDo.objects.filter(pk__in=pks):
+        if todo.owner_id not in summaries:
+            summaries[todo.owner_id] = cached_summary(today, todo.owner_id)
+        changed.append(row_event(todo, 'updated', today, summaries[todo.owner_id]))
+    return changed
@@ -0,0 +1,109 @@
+"""Load testing the app under WSGI and ASGI
+
+``python manage.py loadtest`` seeds a throwaway database, starts each
+server in a subprocess of its own and drives it with concurrent httpx
+requests. The servers are started through this module:
+
+    python -m todo.loadtest {wsgi,asgi-sync,asgi} --port 8001 --database /tmp/db.sqlite3
+
+``wsgi`` is Django's threaded WSGI server, ``asgi-sync`` is uvicorn
+running the synchronous views (one thread per request through
+``sync_to_async``) and ``asgi`` is uvicorn running the async views. The
+load test needs ``uvicorn`` and ``httpx``, which the app itself does not.
+
+Nothing here imports models at module level: the server processes import
+it before Django is configured.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+SERVERS = {
+    'wsgi': 'five.settings',
+    'asgi-sync': 'five.settings',
+    'asgi': 'five.settings_asgi',
+}
+
+
+def configure(kind, database, cache):
+    """Point Django at ``database`` before anything connects to it"""
+    os.environ['DJANGO_SETTINGS_MODULE'] = SERVERS[kind]
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = database
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+    if not cache:
+        settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+def serve(kind, port, database, cache=True):
+    configure(kind, database, cache)
+    if kind == 'wsgi':
+        from django.core.servers.basehttp import run
+        from django.core.wsgi import get_wsgi_application
+        run('127.0.0.1', port, get_wsgi_application(), threading=True)
+    else:
+        import uvicorn
+        from django.core.asgi import get_asgi_application
+        uvicorn.run(get_asgi_application(), host='127.0.0.1', port=port, log_level='warning', access_log=False)
+
+
+async def wait_until_up(base_url, timeout=30):
+    import httpx
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while True:
+            try:
+                await client.get('/')
+                return
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.1)
+
+
+async def hammer(base_url, paths, requests, concurrency):
+    """Send ``requests`` GETs cycling through ``paths``, ``concurrency`` at a time
+
+    Returns ``(requests_per_second, latency_stats, errors)``.
+    """
+    import httpx
+
+    from .benchmarks import summarize
+    latencies, errors = [], 0
+    sent = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal sent, errors
+            while sent < requests:
+                path = paths[sent % len(paths)]
+                sent += 1
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+    return requests / elapsed, summarize(latencies), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the app for a load test')
+    parser.add_argument('kind', choices=sorted(SERVERS))
+    parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--database', required=True)
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args()
+    serve(args.kind, args.port, args.database, cache=not args.no_cache)
+
+
+if __name__ == '__main__':
+    main()
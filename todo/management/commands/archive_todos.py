@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from todo.archive import archive_todos, restore_todos
+
+
+class Command(BaseCommand):
+    help = 'Move done and skipped todos untouched for a while to the archive, or restore archived todos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, metavar='DAYS', help='Archive tasks last changed more than DAYS ago')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows moved per transaction')
+        parser.add_argument('--restore', type=int, nargs='+', metavar='ID', help='Move these archived todos back')
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            restored = restore_todos(options['restore'])
+            self.stdout.write(self.style.SUCCESS(f'Restored {restored} todo(s)'))
+            return
+        if options['older_than'] is None or options['older_than'] < 0:
+            raise CommandError('Give --older-than DAYS (0 or more), or --restore ID...')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        archived = archive_todos(timedelta(days=options['older_than']), options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} todo(s)'))
@@ -0,0 +1,83 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from todo.benchmarks import RESULTS, SCENARIOS, compare, over_budget, seed_todos
+
+
+class Command(BaseCommand):
+    help = 'Run todo benchmark scenarios against a throwaway seeded database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scenarios', nargs='*',
+            help=f'Scenarios to run (default: all). Available: {", ".join(sorted(SCENARIOS))}',
+        )
+        parser.add_argument(
+            '--rows', type=int, nargs='+', default=[10_000],
+            help='Table sizes to seed, e.g. --rows 1000 10000 100000 1000000',
+        )
+        parser.add_argument('--repeat', type=int, default=20, help='Timed iterations per measurement')
+        parser.add_argument('--json', metavar='PATH', help='Write recorded measurements to PATH as JSON')
+        parser.add_argument(
+            '--baseline', metavar='PATH',
+            help='Fail if a measurement regressed against this earlier --json output',
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help='Allowed slowdown against the baseline, as a fraction (default: 0.25)',
+        )
+        parser.add_argument(
+            '--budget', action='store_true',
+            help='Fail if a measurement is over its ceiling in BUDGETS (otherwise only warn)',
+        )
+
+    def handle(self, *args, **options):
+        names = options['scenarios'] or sorted(SCENARIOS)
+        unknown = [name for name in names if name not in SCENARIOS]
+        if unknown:
+            raise CommandError(f'Unknown scenario(s): {", ".join(unknown)}')
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as stream:
+                    baseline = json.load(stream)['results']
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f'Cannot read baseline {options["baseline"]}: {exc}')
+
+        # As under the test runner: DEBUG would keep every query's SQL in
+        # connection.queries and skew both timings and memory
+        settings.DEBUG = False
+        RESULTS.clear()
+        for rows in options['rows']:
+            # A fresh test database per size keeps the real db.sqlite3 untouched
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                seed_todos(rows)
+                for name in names:
+                    self.stdout.write(self.style.MIGRATE_HEADING(f'[{name}] rows={rows}'))
+                    SCENARIOS[name](self.stdout.write, rows, options['repeat'])
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options['json']:
+            with open(options['json'], 'w') as stream:
+                json.dump({'repeat': options['repeat'], 'results': RESULTS}, stream, indent=2, sort_keys=True)
+            self.stdout.write(f'Wrote {options["json"]}')
+        # The ceilings are wall-clock times on one machine, so only a run
+        # that asks for them fails on them
+        failures = over_budget(RESULTS)
+        style = self.style.ERROR if options['budget'] else self.style.WARNING
+        for failure in failures:
+            self.stderr.write(style(f'  {failure}'))
+        if baseline is not None:
+            regressions = compare(RESULTS, baseline, options['threshold'])
+            for regression in regressions:
+                self.stderr.write(self.style.ERROR(f'  {regression}'))
+            if regressions:
+                raise CommandError(f'{len(regressions)} measurement(s) regressed past the baseline')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+        if failures and options['budget']:
+            raise CommandError(f'{len(failures)} measurement(s) over budget')
@@ -0,0 +1,34 @@
+import sys
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+
+from todo.models import ToDo
+from todo.owners import owner_named
+from todo.transfer import FORMATS, export_lines, format_for_path
+
+
+class Command(BaseCommand):
+    help = "Stream every todo, or one user's, to a CSV or JSON Lines file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='Output file, or - for stdout')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension, else csv')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per database round-trip')
+        parser.add_argument('--owner', metavar='USERNAME', help="Only this user's todos (default: everyone's)")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or format_for_path(path)
+        todos = None
+        if options['owner']:
+            try:
+                todos = ToDo.objects.owned_by(owner_named(options['owner']))
+            except ObjectDoesNotExist:
+                raise CommandError(f'No user named {options["owner"]}')
+        lines = export_lines(todos, fmt=fmt, chunk_size=options['chunk_size'])
+        if path == '-':
+            sys.stdout.writelines(lines)
+            return
+        with open(path, 'w', newline='', encoding='utf-8') as output:
+            output.writelines(lines)
@@ -0,0 +1,45 @@
+import sys
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+
+from todo.owners import owner_named
+from todo.transfer import FORMATS, format_for_path, import_rows, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Import todos from a CSV or JSON Lines file, validated like TodoForm'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Input file, or - for stdin')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension, else csv')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk_create and transaction')
+        parser.add_argument('--owner', metavar='USERNAME', help='Give the todos to this user (default: nobody)')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        path = options['path']
+        fmt = options['format'] or format_for_path(path)
+        owner = None
+        if options['owner']:
+            try:
+                owner = owner_named(options['owner'])
+            except ObjectDoesNotExist:
+                raise CommandError(f'No user named {options["owner"]}')
+        if path == '-':
+            result = import_rows(read_rows(sys.stdin, fmt), options['batch_size'], owner)
+        else:
+            try:
+                stream = open(path, newline='', encoding='utf-8')
+            except OSError as exc:
+                raise CommandError(f'Cannot read {path}: {exc}')
+            with stream:
+                result = import_rows(read_rows(stream, fmt), options['batch_size'], owner)
+
+        for line_number, errors in result.errors:
+            details = '; '.join(f'{field}: {" ".join(messages)}' for field, messages in errors.items())
+            self.stderr.write(f'line {line_number}: {details}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created} todo(s), skipped {len(result.errors)} invalid row(s)'
+        ))
@@ -0,0 +1,87 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from todo.benchmarks import format_stats, seed_todos
+from todo.loadtest import SERVERS, hammer, wait_until_up
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = 'Compare requests/s and tail latency of the app under WSGI and ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'servers', nargs='*',
+            help=f'Servers to test (default: all). Available: {", ".join(SERVERS)}',
+        )
+        parser.add_argument('--rows', type=int, default=10_000, help='Tasks to seed')
+        parser.add_argument('--requests', type=int, default=2_000, help='Requests per server')
+        parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight at once')
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Path to request, repeatable (default: /, /search/?q=Task and /api/todos/)',
+        )
+        parser.add_argument(
+            '--no-cache', action='store_true',
+            help='Serve with a dummy cache, so every dashboard renders in full',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            import httpx  # noqa: F401
+            import uvicorn  # noqa: F401
+        except ImportError:
+            raise CommandError('The load test needs uvicorn and httpx: pip install uvicorn httpx')
+        servers = options['servers'] or list(SERVERS)
+        unknown = [name for name in servers if name not in SERVERS]
+        if unknown:
+            raise CommandError(f'Unknown server(s): {", ".join(unknown)}')
+        paths = options['paths'] or ['/', '/search/?q=Task', '/api/todos/']
+
+        with tempfile.TemporaryDirectory() as directory:
+            # A file-backed test database the server processes can open
+            database = os.path.join(directory, 'loadtest.sqlite3')
+            connection.settings_dict['TEST']['NAME'] = database
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                seed_todos(options['rows'])
+                connection.close()
+                for name in servers:
+                    self.run_server(name, database, paths, options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run_server(self, name, database, paths, options):
+        port = free_port()
+        command = [sys.executable, '-m', 'todo.loadtest', name, '--port', str(port), '--database', database]
+        if options['no_cache']:
+            command.append('--no-cache')
+        server = subprocess.Popen(
+            command, cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        base_url = f'http://127.0.0.1:{port}'
+        try:
+            asyncio.run(wait_until_up(base_url))
+            # Warm up connections, caches and the FTS check
+            asyncio.run(hammer(base_url, paths, len(paths) * 4, 4))
+            rate, stats, errors = asyncio.run(
+                hammer(base_url, paths, options['requests'], options['concurrency'])
+            )
+        finally:
+            server.terminate()
+            server.wait()
+        self.stdout.write(self.style.MIGRATE_HEADING(f'[{name}]'))
+        self.stdout.write(f'  {rate:,.0f} requests/s  {format_stats(stats)}  errors={errors}')
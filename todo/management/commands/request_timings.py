@@ -0,0 +1,43 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from todo.instrumentation import FIELDS, aggregate, read_log
+
+
+class Command(BaseCommand):
+    help = 'Summarize request instrumentation logs into per-view percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='Log files to read (default: standard input)')
+        parser.add_argument(
+            '--sort', choices=FIELDS, default='total_ms',
+            help='Order views by the p95 of this field, slowest first (default: total_ms)',
+        )
+
+    def handle(self, *args, **options):
+        records = []
+        for path in options['paths'] or ['-']:
+            if path == '-':
+                records.extend(read_log(sys.stdin))
+                continue
+            try:
+                with open(path) as stream:
+                    records.extend(read_log(stream))
+            except OSError as exc:
+                raise CommandError(f'Cannot read {path}: {exc}')
+        if not records:
+            raise CommandError('No instrumentation records found')
+
+        summary = aggregate(records)
+        field = options['sort']
+        for view, stats in sorted(summary.items(), key=lambda item: -item[1][field]['p95']):
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{view} ({stats["count"]} requests)'))
+            for name in FIELDS:
+                values = stats[name]
+                unit = '' if name == 'queries' else 'ms'
+                self.stdout.write(
+                    f'  {name:<15}' + '  '.join(
+                        f'{key}={values[key]:g}{unit}' for key in ('p50', 'p95', 'p99', 'max')
+                    )
+                )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from todo.counters import has_counters, rebuild, verify
+
+
+class Command(BaseCommand):
+    help = 'Check the denormalized task counters against todo_todo, or rebuild them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['verify', 'rebuild'])
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to use')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not has_counters(using):
+            self.stderr.write(self.style.WARNING(
+                'No counter triggers on this database; summaries count todo_todo directly'
+            ))
+        if options['action'] == 'rebuild':
+            rows = rebuild(using)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} counter row(s)'))
+            return
+
+        mismatches = verify(using)
+        for (owner_id, status, priority, due_date), stored, actual in mismatches:
+            self.stderr.write(
+                f'{owner_id or "unowned"}/{status}/{priority}/{due_date or "no date"}: stored {stored}, actual {actual}'
+            )
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} counter(s) out of date; run "todo_counters rebuild"')
+        self.stdout.write(self.style.SUCCESS('Counters match todo_todo'))
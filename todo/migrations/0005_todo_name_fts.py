@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from todo.search import install_fts, uninstall_fts
+
+
+def forwards(apps, schema_editor):
+    install_fts(schema_editor)
+
+
+def backwards(apps, schema_editor):
+    uninstall_fts(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0004_todo_bucket_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ToDoSearchIndex',
+            fields=[
+                ('todo', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='todo.todo')),
+                ('name', models.TextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'todo_todo_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:37
+
+from django.db import migrations, models
+
+
+def create_tombstone(apps, schema_editor):
+    ToDoTombstone = apps.get_model('todo', 'ToDoTombstone')
+    ToDoTombstone.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0005_todo_name_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ToDoTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('deletions', models.PositiveBigIntegerField(default=0)),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['updated_at'], name='todo_updated_idx'),
+        ),
+        migrations.RunPython(create_tombstone, migrations.RunPython.noop),
+    ]
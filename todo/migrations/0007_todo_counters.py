@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:53
+
+from django.db import migrations, models
+
+from todo.counters import install_counters, uninstall_counters
+
+
+# The counter key before tasks had owners (see 0011)
+KEY_FIELDS = ['status', 'priority', 'due_date']
+
+
+def forwards(apps, schema_editor):
+    install_counters(schema_editor, KEY_FIELDS)
+
+
+def backwards(apps, schema_editor):
+    uninstall_counters(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0006_todo_tombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ToDoCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=10)),
+                ('priority', models.CharField(max_length=10)),
+                ('due_date', models.DateField(blank=True, null=True)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'priority', 'due_date'], name='todo_counter_key_idx')],
+            },
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0009_recurrence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedToDo',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('skipped', 'Skipped')], max_length=10)),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], max_length=10)),
+                ('due_date', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Archived todo',
+                'verbose_name_plural': 'Archived todos',
+                'ordering': ['due_date', '-created_at'],
+                'indexes': [models.Index(fields=['due_date', '-created_at'], name='todo_archived_due_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from todo.counters import install_counters, uninstall_counters
+from todo.search import install_fts
+
+# The counter key before this migration (see 0007)
+OLD_KEY_FIELDS = ['status', 'priority', 'due_date']
+
+
+def forwards(apps, schema_editor):
+    # Count per owner from here on. Adding the nullable columns doesn't
+    # remake todo_todo, so the FTS triggers survive.
+    install_counters(schema_editor, ['owner_id', *OLD_KEY_FIELDS])
+
+
+def backwards(apps, schema_editor):
+    # The triggers name owner_id, which SQLite won't let the column be dropped under
+    uninstall_counters(schema_editor)
+
+
+def reinstall_triggers(apps, schema_editor):
+    # Dropping the owner column remakes todo_todo, which drops every
+    # trigger on it; this runs last when migrating backwards
+    install_fts(schema_editor)
+    install_counters(schema_editor, OLD_KEY_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0010_archivedtodo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_triggers),
+        migrations.RemoveIndex(
+            model_name='todo',
+            name='todo_no_due_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='todo',
+            name='todo_updated_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='todocounter',
+            name='todo_counter_key_idx',
+        ),
+        migrations.AddField(
+            model_name='archivedtodo',
+            name='owner',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_todos', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='todo',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='todos', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='todocounter',
+            name='owner',
+            field=models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtodo',
+            index=models.Index(fields=['owner', 'due_date', '-created_at'], name='todo_archived_owner_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['owner', 'due_date', '-created_at'], name='todo_owner_due_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['owner', 'status', 'due_date', '-created_at'], name='todo_owner_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['owner', 'updated_at'], name='todo_owner_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todocounter',
+            index=models.Index(fields=['owner', 'status', 'priority', 'due_date'], name='todo_counter_owner_key_idx'),
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:48
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.db import migrations
+from django.db.models import F
+from django.utils import timezone
+
+
+def assign_default_owner(apps, schema_editor):
+    """Give every unowned task and archived task to ``TODO_DEFAULT_OWNER``, if set"""
+    username = getattr(settings, 'TODO_DEFAULT_OWNER', None)
+    if not username:
+        return
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    owner = User.objects.filter(**{get_user_model().USERNAME_FIELD: username}).first()
+    if owner is None:
+        raise ImproperlyConfigured(f'TODO_DEFAULT_OWNER names {username!r}, but there is no such user')
+    # One UPDATE per table; the counter triggers move the counts to the owner
+    moved = 0
+    for name in ('ToDo', 'ArchivedToDo'):
+        moved += apps.get_model('todo', name).objects.filter(owner__isnull=True).update(owner=owner)
+    if moved:
+        # The tasks left the unowned pages, so change their validator as a deletion would
+        Tombstone = apps.get_model('todo', 'ToDoTombstone')
+        Tombstone.objects.get_or_create(pk=1)
+        Tombstone.objects.filter(pk=1).update(deletions=F('deletions') + 1, deleted_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0011_todo_owner'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Going back leaves the owners in place; 0011's reverse drops them
+        migrations.RunPython(assign_default_owner, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,80 @@
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
 
+from . import events
+from .caching import invalidate
+
+
+def overdue_condition(today):
+    """The filter for tasks that are overdue as of ``today``"""
+    return models.Q(due_date__lt=today, status='pending')
+
+
+class OwnedQuerySet(models.QuerySet):
+    def owned_by(self, owner):
+        """Only the rows of ``owner``: a user, a user's pk, or None for rows nobody owns
+
+        Every view, the API and the dashboard narrow their querysets with
+        this (see todo.owners), and the indexes all lead on the owner.
+        """
+        return self.filter(owner=owner)
+
+
+class ToDoQuerySet(OwnedQuerySet):
+    def with_overdue(self, today):
+        """Annotate each row with ``overdue``, judged in SQL as of ``today``
+
+        Every row of a result set is compared with the same date, and
+        ``is_overdue`` reads the annotation instead of the clock.
+        """
+        return self.annotate(overdue=models.Case(
+            models.When(overdue_condition(today), then=True),
+            default=False,
+            output_field=models.BooleanField(),
+        ))
+
+    def set_status(self, status):
+        """Move every todo in the queryset to ``status`` with one UPDATE
+
+        Returns the number of rows changed. ``updated_at`` is set
+        explicitly because ``update()`` bypasses ``auto_now``, and the
+        dashboard cache is invalidated because it sends no signals. When a
+        live dashboard is listening, the ids are read first so it can be
+        sent the changed rows.
+        """
+        pks = self._pks_for_events()
+        updated = self.update(status=status, updated_at=timezone.now())
+        if updated:
+            invalidate()
+            self._send_rows_changed(pks)
+        return updated
+    
+    async def aset_status(self, status):
+        """``set_status`` for async views"""
+        pks = await sync_to_async(self._pks_for_events)()
+        updated = await self.aupdate(status=status, updated_at=timezone.now())
+        if updated:
+            await sync_to_async(invalidate)()
+            await sync_to_async(self._send_rows_changed)(pks)
+        return updated
+
+    def _pks_for_events(self):
+        if not events.get_broker().wants_events():
+            return None
+        return list(self.values_list('pk', flat=True)[:events.MAX_ROW_EVENTS + 1])
+
+    def _send_rows_changed(self, pks):
+        if pks is None:
+            # Nobody was listening
+            return
+        events.rows_changed.send(sender=self.model, pks=pks if len(pks) <= events.MAX_ROW_EVENTS else None)
+
+
 class ToDo(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -20,17 +94,230 @@ class ToDo(models.Model):
     due_date = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # None for tasks nobody owns, which anonymous requests see. The
+    # single-column index also lets the conditional GET validator read
+    # MAX(id) per owner.
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='todos',
+    )
+    
+    objects = ToDoQuerySet.as_manager()
+
+    # Dashboard rows can also be generated recurrence Occurrences
+    is_occurrence = False
     
     class Meta:
         ordering = ['due_date', '-created_at']
         verbose_name = 'Todo'
         verbose_name_plural = 'Todos'
+        indexes = [
+            # Serves one owner's today/future/no-date buckets and Meta.ordering
+            models.Index(fields=['owner', 'due_date', '-created_at'], name='todo_owner_due_created_idx'),
+            # Serves one owner's overdue bucket (status='pending' AND
+            # due_date < today) and status filters, already in Meta.ordering
+            models.Index(
+                fields=['owner', 'status', 'due_date', '-created_at'],
+                name='todo_owner_status_due_idx',
+            ),
+            # Lets the conditional GET validator read MAX(updated_at) per owner
+            models.Index(fields=['owner', 'updated_at'], name='todo_owner_updated_idx'),
+            # The same orderings across every owner, for the admin and archiving
+            models.Index(fields=['due_date', '-created_at'], name='todo_due_created_idx'),
+            models.Index(fields=['status', 'due_date', '-created_at'], name='todo_status_due_created_idx'),
+        ]
     
     def __str__(self):
         return self.name
     
+    def is_overdue_on(self, today):
+        return bool(self.due_date and self.status == 'pending' and self.due_date < today)
+
     @property
     def is_overdue(self):
-        if self.due_date and self.status == 'pending':
-            return self.due_date < timezone.now().date()
-        return False
\ No newline at end of file
+        """Whether the task is overdue: from ``with_overdue()`` if the row
+        was loaded with it, otherwise as of now"""
+        if 'overdue' in self.__dict__:
+            return self.overdue
+        return self.is_overdue_on(timezone.now().date())
+
+
+class ToDoSearchIndex(models.Model):
+    """The SQLite FTS5 index over ToDo.name, maintained by triggers (see todo.search)"""
+    todo = models.OneToOneField(
+        ToDo,
+        primary_key=True,
+        db_column='rowid',
+        on_delete=models.DO_NOTHING,
+        related_name='search_index',
+    )
+    name = models.TextField()
+    rank = models.FloatField()
+    
+    class Meta:
+        managed = False
+        db_table = 'todo_todo_fts'
+
+class ToDoTombstone(models.Model):
+    """A single row counting deletions, so HTTP validators change on deletes"""
+    deletions = models.PositiveBigIntegerField(default=0)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    
+    SINGLETON_PK = 1
+    
+    @classmethod
+    def record(cls):
+        """Count one deletion, creating the row if it is missing"""
+        now = timezone.now()
+        updated = cls.objects.filter(pk=cls.SINGLETON_PK).update(
+            deletions=models.F('deletions') + 1, deleted_at=now,
+        )
+        if not updated:
+            cls.objects.get_or_create(pk=cls.SINGLETON_PK, defaults={'deletions': 1, 'deleted_at': now})
+
+
+class ToDoCounter(models.Model):
+    """How many tasks have each (owner, status, priority, due_date), kept by triggers (see todo.counters)"""
+    # No constraint: triggers write these rows, and a user's counters go
+    # to zero with their tasks
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='+',
+    )
+    status = models.CharField(max_length=10)
+    priority = models.CharField(max_length=10)
+    due_date = models.DateField(null=True, blank=True)
+    count = models.BigIntegerField(default=0)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'status', 'priority', 'due_date'], name='todo_counter_owner_key_idx'),
+        ]
+
+
+class Recurrence(models.Model):
+    """Repeats a ToDo every ``interval`` days or weeks, optionally ``until`` a date
+
+    The ToDo is the first occurrence, on its own due date. Later
+    occurrences are not stored: ``todo.recurrence`` generates them for
+    whatever dates are being shown. Marking one done or skipped stores a
+    ``RecurrenceException`` for that date and nothing else.
+    """
+    FREQUENCY_CHOICES = [
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+    ]
+
+    todo = models.OneToOneField(ToDo, primary_key=True, on_delete=models.CASCADE, related_name='recurrence')
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='daily')
+    interval = models.PositiveSmallIntegerField(default=1)
+    until = models.DateField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.todo} ({self.get_frequency_display().lower()})'
+
+    def clean(self):
+        if self.interval < 1:
+            raise ValidationError({'interval': 'Repeat at least every 1 day or week.'})
+        try:
+            start = self.todo.due_date
+        except ToDo.DoesNotExist:
+            start = None
+        if start is None:
+            raise ValidationError('Only tasks with a due date can repeat.')
+        if self.until and self.until < start:
+            raise ValidationError({'until': 'The last date cannot be before the first.'})
+
+    @property
+    def step(self):
+        return timedelta(days=self.interval * (7 if self.frequency == 'weekly' else 1))
+
+    def occurs_on(self, day):
+        """Whether ``day`` is a generated occurrence (the ToDo itself is not)"""
+        start = self.todo.due_date
+        return (
+            start is not None and day > start
+            and (self.until is None or day <= self.until)
+            and (day - start).days % self.step.days == 0
+        )
+
+    def dates(self, start, end=None):
+        """Yield the generated occurrence dates from ``start`` to ``end`` (or forever)"""
+        first = self.todo.due_date
+        if first is None:
+            return
+        step = self.step.days
+        # The first occurrence on or after ``start``, never the ToDo's own date
+        skip = max(1, -(-(start - first).days // step))
+        day = first + timedelta(days=skip * step)
+        last = min(filter(None, [end, self.until]), default=None)
+        while last is None or day <= last:
+            yield day
+            day += self.step
+
+    def set_status(self, day, status):
+        """Record ``status`` for the occurrence on ``day``; pending removes the exception"""
+        if status == 'pending':
+            for exception in self.exceptions.filter(date=day):
+                exception.delete()
+        else:
+            self.exceptions.update_or_create(date=day, defaults={'status': status})
+
+
+class RecurrenceException(models.Model):
+    """The status of one generated occurrence, when it isn't pending"""
+    recurrence = models.ForeignKey(Recurrence, on_delete=models.CASCADE, related_name='exceptions')
+    date = models.DateField()
+    status = models.CharField(max_length=10, choices=ToDo.STATUS_CHOICES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recurrence', 'date'], name='todo_recurrence_exception_unique'),
+        ]
+
+
+class ArchivedToDo(models.Model):
+    """A done or skipped ToDo moved out of ``todo_todo`` (see todo.archive)
+
+    The same columns and id as the ToDo it was, plus when it was archived.
+    Only search with the archive included and restoring read it.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    name = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=ToDo.STATUS_CHOICES)
+    priority = models.CharField(max_length=10, choices=ToDo.PRIORITY_CHOICES)
+    due_date = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='archived_todos',
+    )
+
+    objects = OwnedQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['due_date', '-created_at']
+        verbose_name = 'Archived todo'
+        verbose_name_plural = 'Archived todos'
+        indexes = [
+            # Serves one owner's archive search pages
+            models.Index(fields=['owner', 'due_date', '-created_at'], name='todo_archived_owner_due_idx'),
+            # Serves Meta.ordering across owners, for the admin
+            models.Index(fields=['due_date', '-created_at'], name='todo_archived_due_created_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
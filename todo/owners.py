@@ -0,0 +1,45 @@
+"""Whose tasks a request sees
+
+Every ToDo has an optional owner. A signed-in user sees and changes only
+their own tasks; anonymous requests see the tasks nobody owns, as they
+did before tasks had owners, and so does everything served under the
+lean settings, which have no authentication middleware. Views, the API,
+the dashboard buckets, the counters, search and the archive all narrow
+their querysets with ``owned_by(owner_of(request))``.
+"""
+
+
+def _authenticated(user):
+    return user if user is not None and user.is_authenticated else None
+
+
+def owner_of(request):
+    """The user whose tasks ``request`` sees, or None for unowned tasks, fixed on first use"""
+    if not hasattr(request, '_todo_owner'):
+        request._todo_owner = _authenticated(getattr(request, 'user', None))
+    return request._todo_owner
+
+
+async def aowner_of(request):
+    """``owner_of`` for async views, which cannot load ``request.user`` synchronously
+
+    Later calls to ``owner_of`` return the same owner without a query.
+    """
+    if not hasattr(request, '_todo_owner'):
+        auser = getattr(request, 'auser', None)
+        request._todo_owner = _authenticated(await auser() if auser else None)
+    return request._todo_owner
+
+
+def owner_key(owner):
+    """The pk of ``owner`` (a user, a pk or None) as it appears in ``owner_id``"""
+    return getattr(owner, 'pk', owner)
+
+
+def owner_named(username):
+    """The user called ``username``, for the management commands' ``--owner``
+
+    Raises ``ObjectDoesNotExist`` if there is none.
+    """
+    from django.contrib.auth import get_user_model
+    return get_user_model()._default_manager.get_by_natural_key(username)
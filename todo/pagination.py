@@ -0,0 +1,186 @@
+"""Keyset (cursor) pagination
+
+Pages are addressed by the sort key of the last row shown rather than by
+an offset, so a page costs an index seek regardless of how deep it is and
+rows inserted before the cursor never shift what the next page contains.
+"""
+import base64
+import json
+from collections import namedtuple
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Count, F, Q, Window
+from django.http import Http404
+
+
+def get_page_size():
+    return getattr(settings, 'TODO_PAGE_SIZE', 50)
+
+
+# ``values`` is the sort key of the last row shown; ``seen`` counts the
+# rows on earlier pages so totals can be computed from the rows remaining
+Cursor = namedtuple('Cursor', ['values', 'seen'])
+
+
+class Page(list):
+    """One page of rows plus the cursor for the page after it
+
+    ``count()`` without an argument returns the number of rows on the
+    page, so code written against querysets keeps working. ``total`` is
+    the number of rows across all pages when it was requested.
+    """
+
+    def __init__(self, rows=(), next_cursor=None, total=None):
+        super().__init__(rows)
+        self.next_cursor = next_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def count(self, *args):
+        if args:
+            return super().count(*args)
+        return len(self)
+
+
+class Keyset:
+    """A total ordering over ``fields`` that pages can be cut from
+
+    Fields use ``order_by`` syntax (``'-created_at'``). The last field
+    must be unique (normally ``id``) so every row has a distinct key.
+    NULLs sort first ascending and last descending on every backend.
+    """
+
+    def __init__(self, model, *fields):
+        self.model = model
+        self.fields = [(field.lstrip('-'), field.startswith('-')) for field in fields]
+
+    def _nullable(self, name):
+        try:
+            return self.model._meta.get_field(name).null
+        except FieldDoesNotExist:
+            return False
+
+    def order_by(self):
+        ordering = []
+        for name, descending in self.fields:
+            if not self._nullable(name):
+                ordering.append(F(name).desc() if descending else F(name).asc())
+            elif descending:
+                ordering.append(F(name).desc(nulls_last=True))
+            else:
+                ordering.append(F(name).asc(nulls_first=True))
+        return ordering
+
+    def values(self, row):
+        """The sort key of ``row``, a model instance or a ``values()`` dict"""
+        if isinstance(row, dict):
+            return [row[name] for name, _ in self.fields]
+        return [getattr(row, name) for name, _ in self.fields]
+
+    def after(self, values):
+        """A filter matching rows that sort strictly after ``values``"""
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (name, descending), value in zip(self.fields, values):
+            beyond = self._beyond(name, descending, value)
+            if beyond is not None:
+                condition |= equal & beyond
+            equal &= Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value})
+        return condition
+
+    def _beyond(self, name, descending, value):
+        if value is None:
+            # NULLs are the smallest key: everything non-NULL follows them
+            # ascending, nothing follows them descending
+            return None if descending else Q(**{f'{name}__isnull': False})
+        if descending:
+            beyond = Q(**{f'{name}__lt': value})
+            if self._nullable(name):
+                beyond |= Q(**{f'{name}__isnull': True})
+            return beyond
+        return Q(**{f'{name}__gt': value})
+
+    def encode(self, row, seen=0):
+        values = [
+            value.isoformat() if isinstance(value, (date, datetime)) else value
+            for value in self.values(row)
+        ]
+        payload = json.dumps({'key': values, 'seen': seen})
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode(self, cursor):
+        """Parse a ``Cursor`` from a query string, raising Http404 if malformed"""
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            values, seen = payload['key'], int(payload['seen'])
+        except (ValueError, UnicodeError, TypeError, KeyError):
+            raise Http404('Invalid cursor')
+        if not isinstance(values, list) or len(values) != len(self.fields) or seen < 0:
+            raise Http404('Invalid cursor')
+        try:
+            values = [self._to_python(name, value) for (name, _), value in zip(self.fields, values)]
+        except (ValidationError, TypeError, ValueError):
+            raise Http404('Invalid cursor')
+        return Cursor(values, seen)
+
+    def _to_python(self, name, value):
+        """``value`` from a cursor as ``name``'s type, raising ValidationError if it can't be"""
+        try:
+            field = self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # An annotation, such as the search rank: a number
+            if value is None or (isinstance(value, (int, float)) and not isinstance(value, bool)):
+                return value
+            raise ValidationError('Invalid cursor value')
+        if value is None:
+            if not field.null:
+                raise ValidationError('Invalid cursor value')
+            return None
+        if not isinstance(value, (str, int)) or isinstance(value, bool):
+            raise ValidationError('Invalid cursor value')
+        return field.to_python(value)
+
+    def paginate(self, queryset, cursor=None, page_size=None, with_total=False):
+        """Return the ``Page`` of ``queryset`` that follows ``cursor``
+
+        With ``with_total``, a ``COUNT(*) OVER ()`` window counts the rows
+        remaining from this page on in the same query, and ``Page.total``
+        adds the rows seen on earlier pages.
+        """
+        queryset, page_size, seen = self._slice(queryset, cursor, page_size, with_total)
+        return self._page(list(queryset), page_size, seen, with_total)
+
+    async def apaginate(self, queryset, cursor=None, page_size=None, with_total=False):
+        """``paginate`` for async views"""
+        queryset, page_size, seen = self._slice(queryset, cursor, page_size, with_total)
+        return self._page([row async for row in queryset], page_size, seen, with_total)
+
+    def _slice(self, queryset, cursor, page_size, with_total):
+        page_size = page_size or get_page_size()
+        queryset = queryset.order_by(*self.order_by())
+        seen = 0
+        if cursor:
+            cursor = self.decode(cursor)
+            queryset = queryset.filter(self.after(cursor.values))
+            seen = cursor.seen
+        if with_total:
+            queryset = queryset.annotate(remaining=Window(Count('pk')))
+        return queryset[:page_size + 1], page_size, seen
+
+    def _page(self, rows, page_size, seen, with_total):
+        page = self.page(rows, page_size, seen)
+        if with_total:
+            page.total = seen + (rows[0].remaining if rows else 0)
+        return page
+
+    def page(self, rows, page_size, seen=0):
+        """Trim ``page_size + 1`` fetched rows to a ``Page``"""
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            return Page(rows, next_cursor=self.encode(rows[-1], seen + page_size))
+        return Page(rows)
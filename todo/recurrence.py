@@ -0,0 +1,129 @@
+"""Recurring tasks, expanded into occurrences only for the dates shown
+
+A ``Recurrence`` repeats its ToDo daily or weekly. Nothing is stored per
+occurrence: the today and future buckets of the dashboard merge their
+page of real rows with occurrences generated from the rules, in the same
+keyset order, so a daily chore costs one rule however far ahead the
+dashboard is paged. Completing or skipping an occurrence stores a
+``RecurrenceException`` for that date; undoing it deletes the exception.
+
+Occurrences are never overdue: a missed day of a chore is not carried
+forward, only the ToDo that starts the series can be.
+"""
+import heapq
+from itertools import islice
+
+from django.db.models import Prefetch, Q
+from django.http import Http404
+
+from . import caching
+from .models import Recurrence, RecurrenceException, ToDo
+
+STATUS_LABELS = dict(ToDo.STATUS_CHOICES)
+
+
+class Occurrence:
+    """One generated date of a recurring ToDo
+
+    Stands in for a ToDo row on the dashboard: ``pk``, ``id``, ``name``
+    and ``created_at`` are the series', so occurrences sort and page with
+    the same keyset as real rows.
+    """
+    is_occurrence = True
+
+    def __init__(self, todo, due_date, status='pending'):
+        self.todo = todo
+        self.due_date = due_date
+        self.status = status
+        self.pk = self.id = todo.pk
+        self.name = todo.name
+        self.priority = todo.priority
+        self.created_at = todo.created_at
+
+    def __repr__(self):
+        return f'<Occurrence: {self.name} on {self.due_date}>'
+
+    @property
+    def day(self):
+        return self.due_date.isoformat()
+
+    def get_status_display(self):
+        return STATUS_LABELS[self.status]
+
+
+def sort_key(row):
+    """Dashboard order, ``TODO_KEYSET``'s, for real rows and occurrences alike"""
+    return (row.due_date, -row.created_at.timestamp(), row.pk)
+
+
+def cursor_key(cursor):
+    """``sort_key`` of the row a decoded dashboard cursor points at
+
+    The values come converted from ``Keyset.decode``. Only the dated
+    buckets merge occurrences, so an undated cursor can't be one of theirs.
+    """
+    due_date, created_at, pk = cursor.values
+    if due_date is None:
+        raise Http404('Invalid cursor')
+    return (due_date, -created_at.timestamp(), pk)
+
+
+def load_series(today, owner=None):
+    """Every rule of ``owner``'s with occurrences from ``today`` on, with their exceptions from then"""
+    return list(
+        Recurrence.objects.filter(Q(until__isnull=True) | Q(until__gte=today), todo__owner=owner)
+        .select_related('todo')
+        .prefetch_related(Prefetch(
+            'exceptions', queryset=RecurrenceException.objects.filter(date__gte=today), to_attr='upcoming',
+        ))
+    )
+
+
+def active_series(today, owner=None):
+    """``load_series()`` through the dashboard cache, invalidated with it
+
+    Rules and exceptions change the dashboard version (see
+    ``signals.py``), so the list is read from the database once per
+    version, owner and day, not on every page view.
+    """
+    cache = caching.get_cache()
+    key = caching.fragment_key(caching.get_version(), today, 'recurrences', owner=owner)
+    series = cache.get(key)
+    if series is None:
+        series = load_series(today, owner)
+        cache.set(key, series, caching.get_timeout())
+    return series
+
+
+def occurrences(recurrence, start, end=None, after=None):
+    """Yield ``recurrence``'s occurrences from ``start`` to ``end`` in dashboard order
+
+    ``after`` is a ``sort_key``; occurrences at or before it are left out.
+    """
+    statuses = {exception.date: exception.status for exception in getattr(recurrence, 'upcoming', [])}
+    for day in recurrence.dates(start, end):
+        occurrence = Occurrence(recurrence.todo, day, statuses.get(day, 'pending'))
+        if after is None or sort_key(occurrence) > after:
+            yield occurrence
+
+
+def merge_occurrences(rows, series, start, end=None, cursor=None, limit=None):
+    """Merge real ``rows`` with the occurrences of ``series`` between ``start`` and ``end``
+
+    ``rows`` are already in dashboard order and start after ``cursor``.
+    Both sides are generated lazily and merged on the sort key, and no
+    more than ``limit`` rows are taken, so an open-ended rule is only
+    expanded as far as the page reaches.
+    """
+    after = cursor_key(cursor) if cursor else None
+    if after is not None:
+        start = max(start, after[0])
+    generated = [occurrences(recurrence, start, end, after) for recurrence in series]
+    if not generated:
+        return rows
+    return list(islice(heapq.merge(rows, *generated, key=sort_key), limit))
+
+
+def count_on(day, series):
+    """How many of ``series`` have an occurrence on ``day``"""
+    return sum(1 for recurrence in series if recurrence.occurs_on(day))
@@ -0,0 +1,170 @@
+"""Full-text search over ToDo.name
+
+On SQLite builds with FTS5, an external-content ``todo_todo_fts`` table
+indexes every task name as trigrams and is kept in sync by triggers on
+``todo_todo``. A trigram index answers the same case-insensitive
+substring queries as ``name__icontains`` without scanning the table, and
+ranks matches with bm25. Other backends, SQLite builds without FTS5 and
+queries shorter than a trigram fall back to ``icontains``.
+
+The index covers every owner's tasks. ``search_owned()`` searches one
+owner's, and for owners with few tasks and common terms scans those
+tasks instead of sifting through everybody's matches.
+
+Django rebuilds SQLite tables for most ALTER operations, which drops the
+triggers, so any later migration that remakes ``todo_todo`` must call
+``install_fts()`` again.
+"""
+from django.db import DatabaseError, connections
+from django.db.models import F, Lookup
+
+from . import counters
+from .dashboard import TODO_KEYSET
+from .models import ToDo, ToDoSearchIndex
+from .pagination import Keyset
+
+FTS_TABLE = ToDoSearchIndex._meta.db_table
+
+# Trigrams cannot match anything shorter
+MIN_FTS_QUERY_LENGTH = 3
+
+RANKED_KEYSET = Keyset(ToDo, 'rank', 'id')
+
+# Owners with fewer tasks than this may be searched by scanning them
+OWNER_SCAN_LIMIT = 10_000
+
+_fts_tables = {}
+
+
+@ToDoSearchIndex._meta.get_field('name').register_lookup
+class Match(Lookup):
+    """``search_index__name__match=``: an FTS5 MATCH against the index"""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', (*lhs_params, *rhs_params)
+
+
+def _supports_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if cursor.fetchone()[0]:
+            return True
+        # Some builds load FTS5 without advertising the compile option
+        try:
+            cursor.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)')
+        except DatabaseError:
+            return False
+        cursor.execute('DROP TABLE temp.fts5_probe')
+        return True
+
+
+def install_fts(schema_editor):
+    """Create the FTS table and its sync triggers, then (re)index all rows"""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite' or not _supports_fts5(connection):
+        return
+    table = ToDo._meta.db_table
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"name, content='{table}', content_rowid='id', tokenize='trigram')",
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+        f"CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name); END",
+        f"CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name); END",
+        f"CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE OF name ON {table} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name); "
+        f"INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name); END",
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+    ]
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def uninstall_fts(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for trigger in ('insert', 'delete', 'update'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{trigger}')
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def has_fts(using='default'):
+    """Whether the FTS table exists on the ``using`` database"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    key = (using, str(connection.settings_dict['NAME']))
+    if key not in _fts_tables:
+        _fts_tables[key] = FTS_TABLE in connection.introspection.table_names()
+    return _fts_tables[key]
+
+
+def fts_phrase(query):
+    """Quote ``query`` as a single FTS5 phrase so it matches as a substring"""
+    return '"{}"'.format(query.replace('"', '""'))
+
+
+def count_matches(query, limit, using='default'):
+    """How many names the FTS index matches for ``query``, up to ``limit``
+
+    Stops reading the index at ``limit``, so it's cheap for common terms
+    too. Returns None when the index can't answer ``query``.
+    """
+    if len(query) < MIN_FTS_QUERY_LENGTH or not has_fts(using):
+        return None
+    return ToDoSearchIndex.objects.using(using).filter(name__match=fts_phrase(query))[:limit].count()
+
+
+def search_todos(query, queryset=None, using='default'):
+    """Filter ``queryset`` to tasks whose name contains ``query``
+
+    Returns ``(queryset, keyset)``: FTS matches are annotated with their
+    bm25 ``rank`` and paginate best match first; the ``icontains``
+    fallback paginates in the usual dashboard order.
+    """
+    if queryset is None:
+        queryset = ToDo.objects.all()
+    if len(query) < MIN_FTS_QUERY_LENGTH or not has_fts(using):
+        return queryset.filter(name__icontains=query), TODO_KEYSET
+    # Joining the index lets MATCH drive the query and computes each
+    # row's bm25 rank once. Trigrams fold case beyond ASCII while LIKE
+    # does not; re-checking the matches with icontains keeps results
+    # identical to the fallback.
+    matches = queryset.filter(
+        search_index__name__match=fts_phrase(query),
+        name__icontains=query,
+    )
+    return matches.annotate(rank=F('search_index__rank')), RANKED_KEYSET
+
+
+def search_owned(query, owner, using='default'):
+    """``search_todos()`` over the tasks of ``owner`` (None for unowned tasks)
+
+    SQLite joins an owner's rows to the index by looking each one up in
+    the term's matches, which costs more the more names match across all
+    owners. So when a user has fewer than ``OWNER_SCAN_LIMIT`` tasks and
+    the term matches at least as many names, LIKE over the user's rows on
+    the owner indexes is used instead; those results come in dashboard
+    order rather than by rank. Unowned tasks are the whole table of a
+    single-user install and are always searched through the index.
+
+    Choosing costs a user's search up to two small queries before the
+    page: the user's total from the counters and, under the limit, the
+    capped count of matches. Both read indexes only. The page and its
+    total still come from one query.
+    """
+    queryset = ToDo.objects.using(using).owned_by(owner)
+    if owner is None:
+        return search_todos(query, queryset, using)
+    owned = counters.owned_total(owner, using)
+    if owned < OWNER_SCAN_LIMIT:
+        matches = count_matches(query, owned, using)
+        if matches is not None and matches >= owned:
+            return queryset.filter(name__icontains=query), TODO_KEYSET
+    return search_todos(query, queryset, using)
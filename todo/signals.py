@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import events, instrumentation, live
+from .caching import invalidate
+from .models import Recurrence, RecurrenceException, ToDo, ToDoTombstone
+
+
+@receiver(post_save, sender=ToDo, dispatch_uid='todo_dashboard_save')
+@receiver(post_delete, sender=ToDo, dispatch_uid='todo_dashboard_delete')
+def invalidate_dashboard(sender, **kwargs):
+    invalidate()
+
+
+@receiver(post_delete, sender=ToDo, dispatch_uid='todo_tombstone')
+def record_deletion(sender, **kwargs):
+    ToDoTombstone.record()
+
+
+@receiver(pre_save, sender=ToDo, dispatch_uid='todo_tombstone_owner')
+def record_owner_change(sender, instance, update_fields=None, **kwargs):
+    """A task given to another owner is gone from the old owner's pages
+
+    Their validator only sees their own rows, so count it as a deletion.
+    """
+    if instance._state.adding or (update_fields is not None and 'owner' not in update_fields):
+        return
+    if ToDo.objects.filter(pk=instance.pk).exclude(owner=instance.owner_id).exists():
+        ToDoTombstone.record()
+
+
+@receiver(post_save, sender=ToDo, dispatch_uid='todo_events_save')
+def publish_saved(sender, instance, created, **kwargs):
+    events.publish(lambda: live.saved_events(instance, created))
+
+
+@receiver(post_delete, sender=ToDo, dispatch_uid='todo_events_delete')
+def publish_deleted(sender, instance, **kwargs):
+    pk, owner_id = instance.pk, instance.owner_id
+    events.publish(lambda: live.deleted_events(pk, owner_id))
+
+
+@receiver(events.rows_changed, sender=ToDo, dispatch_uid='todo_events_changed')
+def publish_changed(sender, pks, **kwargs):
+    if pks is None:
+        events.publish_reload()
+    else:
+        events.publish(lambda: live.changed_events(pks))
+
+
+@receiver(post_save, sender=Recurrence, dispatch_uid='todo_recurrence_save')
+@receiver(post_delete, sender=Recurrence, dispatch_uid='todo_recurrence_delete')
+@receiver(post_save, sender=RecurrenceException, dispatch_uid='todo_recurrence_exception_save')
+@receiver(post_delete, sender=RecurrenceException, dispatch_uid='todo_recurrence_exception_delete')
+def recurrence_changed(sender, instance, **kwargs):
+    """Occurrences aren't rows, so touch the ToDo that starts the series
+
+    Its ``updated_at`` changes the conditional GET validator; the version
+    bump drops cached sections and the cached rules; open dashboards
+    reload because the occurrences have no rows to patch.
+    """
+    series_pk = instance.pk if sender is Recurrence else instance.recurrence_id
+    ToDo.objects.filter(pk=series_pk).update(updated_at=timezone.now())
+    invalidate()
+    events.publish_reload()
+
+
+@receiver(connection_created, dispatch_uid='todo_sqlite_pragmas')
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Run ``TODO_SQLITE_PRAGMAS`` on every new SQLite connection"""
+    pragmas = getattr(settings, 'TODO_SQLITE_PRAGMAS', {})
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created, dispatch_uid='todo_instrumentation')
+def instrument_connection(sender, connection, **kwargs):
+    instrumentation.install(connection)
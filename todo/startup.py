@@ -0,0 +1,81 @@
+"""Timing how long a fresh process takes to start serving
+
+``python manage.py benchmark startup`` runs this module in new
+interpreters, once per settings module and iteration:
+
+    python -m todo.startup five.settings_lean --database /tmp/db.sqlite3
+
+It prints one JSON object with two timings in ms: ``setup`` covers
+importing Django and ``django.setup()``, and ``first_response`` covers
+loading the middleware and URLconf and answering one
+``GET /api/todos/?limit=1`` through the WSGI handler.
+
+Nothing here imports Django at module level; importing it is what is
+being timed.
+"""
+import argparse
+import io
+import json
+import os
+import time
+
+# Settings modules timed by the benchmark, by label
+SETTINGS = {
+    'full': 'five.settings',
+    'lean': 'five.settings_lean',
+}
+
+
+def configure(settings_module, database):
+    """Point Django at ``database`` before anything connects to it"""
+    os.environ['DJANGO_SETTINGS_MODULE'] = settings_module
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = database
+    settings.ALLOWED_HOSTS = ['localhost']
+
+
+def first_request(handler):
+    """Send ``handler`` one API request and return its status line"""
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': '/api/todos/',
+        'QUERY_STRING': 'limit=1',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.url_scheme': 'http',
+    }
+    status = []
+    response = handler(environ, lambda line, headers, exc_info=None: status.append(line))
+    try:
+        b''.join(response)
+    finally:
+        response.close()
+    return status[0]
+
+
+def measure(settings_module, database):
+    start = time.perf_counter()
+    configure(settings_module, database)
+    import django
+    django.setup()
+    setup = time.perf_counter()
+    from django.core.handlers.wsgi import WSGIHandler
+    status = first_request(WSGIHandler())
+    done = time.perf_counter()
+    if not status.startswith('200'):
+        raise SystemExit(f'GET /api/todos/ under {settings_module}: {status}')
+    return {'setup': (setup - start) * 1000, 'first_response': (done - setup) * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time django.setup() and the first response')
+    parser.add_argument('settings', choices=sorted(SETTINGS.values()))
+    parser.add_argument('--database', required=True)
+    args = parser.parse_args()
+    print(json.dumps(measure(args.settings, args.database)))
+
+
+if __name__ == '__main__':
+    main()
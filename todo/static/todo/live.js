@@ -0,0 +1,92 @@
+// Keeps the task list current without reloading: listens to the
+// Server-Sent Events from todo_events (see todo/events.py) and patches
+// the changed rows and the header counts in place.
+(function () {
+    'use strict';
+
+    var script = document.currentScript;
+    if (!script || !window.EventSource) {
+        return;
+    }
+
+    function findRow(id) {
+        var checkbox = document.querySelector('.todo-select[value="' + id + '"]');
+        return checkbox ? checkbox.closest('.todo-item') : null;
+    }
+
+    function removeRow(id) {
+        var row = findRow(id);
+        if (!row) {
+            return;
+        }
+        var section = row.closest('[data-bucket]');
+        row.remove();
+        if (section && !section.querySelector('.todo-item') && !section.querySelector('.load-more')) {
+            section.remove();
+        }
+    }
+
+    function placeRow(event) {
+        removeRow(event.id);
+        if (!event.bucket) {
+            return;
+        }
+        var section = document.querySelector('[data-bucket="' + event.bucket + '"]');
+        if (!section) {
+            // The section wasn't rendered because it was empty
+            window.location.reload();
+            return;
+        }
+        var template = document.createElement('template');
+        template.innerHTML = event.html.trim();
+        var row = template.content.firstElementChild;
+        var next = event.before && findRow(event.before);
+        if (next) {
+            next.before(row);
+        } else if (!section.querySelector('.load-more')) {
+            section.querySelector('.todo-rows').append(row);
+        }
+        // Otherwise the row belongs on a page that hasn't been loaded
+    }
+
+    function updateSummary(summary) {
+        if (!summary) {
+            return;
+        }
+        document.querySelectorAll('[data-summary]').forEach(function (badge) {
+            var count = summary[badge.dataset.summary];
+            if (count !== undefined) {
+                badge.textContent = count;
+            }
+        });
+    }
+
+    var source = new EventSource(script.dataset.eventsUrl);
+    var disconnected = false;
+
+    source.addEventListener('error', function () {
+        disconnected = true;
+    });
+    source.addEventListener('open', function () {
+        // Changes made while disconnected were missed
+        if (disconnected) {
+            window.location.reload();
+        }
+    });
+
+    ['created', 'updated'].forEach(function (type) {
+        source.addEventListener(type, function (message) {
+            var event = JSON.parse(message.data);
+            placeRow(event);
+            updateSummary(event.summary);
+        });
+    });
+    source.addEventListener('deleted', function (message) {
+        var event = JSON.parse(message.data);
+        removeRow(event.id);
+        updateSummary(event.summary);
+    });
+    source.addEventListener('reload', function () {
+        window.location.reload();
+    });
+}());
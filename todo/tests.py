@@ -1,9 +1,32 @@
-from django.test import TestCase, Client
+import asyncio
+import base64
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
-from .models import ToDo
+from unittest import mock
+from five.db_profiles import DB_PROFILES
+from .caching import get_stats, get_version, reset_stats
+from . import dashboard
+from .dashboard import BUCKETS, aload_dashboard, can_query_concurrently, load_bucket, load_dashboard
+from . import benchmarks, counters, events, instrumentation, live
+from .archive import archive_todos
+from .models import ArchivedToDo, Recurrence, RecurrenceException, ToDo, ToDoCounter, ToDoQuerySet
 from .forms import TodoForm, QuickAddForm
+from . import search
+from .search import FTS_TABLE, has_fts, search_owned, search_todos
+from .transfer import export_lines, import_rows, read_rows
 
 
 class ToDoModelTests(TestCase):
@@ -186,6 +209,7 @@ class TodoViewTests(TestCase):
     
     def setUp(self):
         """Set up test client and data"""
+        cache.clear()
         self.client = Client()
         self.today = timezone.now().date()
         self.yesterday = self.today - timedelta(days=1)
@@ -336,6 +360,7 @@ class TodoIntegrationTests(TestCase):
     
     def setUp(self):
         """Set up test client"""
+        cache.clear()
         self.client = Client()
         self.today = timezone.now().date()
     
@@ -505,4 +530,1944 @@ class TaskSearchTests(TestCase):
         """Test search shows result count"""
         response = self.client.get(reverse('todo_search'), {'q': 'Buy'})
         # Should show "2 results found" or similar
-        self.assertIn('results', response.context)
\ No newline at end of file
+        self.assertIn('results', response.context)
+
+# PERFORMANCE
+
+class BucketIndexTests(TestCase):
+    """The todo_list bucket queries are served by indexes"""
+
+    def setUp(self):
+        self.today = timezone.now().date()
+
+    def assertUsesIndex(self, queryset, index_name):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Query plan assertions are written for SQLite')
+        self.assertIn(index_name, queryset.explain())
+
+    def test_today_bucket_uses_due_date_index(self):
+        queryset = ToDo.objects.filter(due_date=self.today)
+        self.assertUsesIndex(queryset, 'todo_due_created_idx')
+
+    def test_future_bucket_uses_due_date_index(self):
+        queryset = ToDo.objects.filter(due_date__gt=self.today)
+        self.assertUsesIndex(queryset, 'todo_due_created_idx')
+
+    def test_overdue_bucket_uses_status_index(self):
+        queryset = ToDo.objects.filter(due_date__lt=self.today, status='pending')
+        self.assertUsesIndex(queryset, 'todo_status_due_created_idx')
+
+
+class DashboardQueryTests(TestCase):
+    """todo_list fetches every bucket in a single query"""
+
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.now().date()
+        self.yesterday = self.today - timedelta(days=1)
+        self.tomorrow = self.today + timedelta(days=1)
+
+    def test_todo_list_reads_every_bucket_in_one_query(self):
+        ToDo.objects.create(name="Overdue", due_date=self.yesterday)
+        ToDo.objects.create(name="Today", due_date=self.today)
+        ToDo.objects.create(name="Future", due_date=self.tomorrow)
+        ToDo.objects.create(name="No Date")
+        # Checked once per process, not per request
+        counters.has_counters()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('todo_list'))
+        sql = [query['sql'] for query in queries.captured_queries]
+        # The conditional GET validator
+        self.assertIn('todo_todotombstone', sql[0])
+        # Every bucket's page, in one query
+        self.assertIn('CASE WHEN', sql[1])
+        # The recurring series, cached after this
+        self.assertIn('todo_recurrence', sql[2])
+        # The badge counts, summed from the counters
+        self.assertIn('todo_todocounter', sql[3])
+        self.assertEqual(len(sql), 4)
+        self.assertContains(response, "Overdue")
+        self.assertContains(response, "No Date")
+
+    def test_buckets_keep_meta_ordering(self):
+        first = ToDo.objects.create(name="First", due_date=self.tomorrow)
+        later = ToDo.objects.create(name="Later", due_date=self.tomorrow + timedelta(days=3))
+        newest = ToDo.objects.create(name="Newest", due_date=self.tomorrow)
+        response = self.client.get(reverse('todo_list'))
+        self.assertEqual(list(response.context['todos_future']), [newest, first, later])
+
+    def test_completed_past_tasks_are_not_shown(self):
+        ToDo.objects.create(name="Old and done", due_date=self.yesterday, status='done')
+        response = self.client.get(reverse('todo_list'))
+        self.assertNotContains(response, "Old and done")
+
+
+class FragmentCacheTests(TestCase):
+    """Rendered dashboard sections are cached until a todo changes"""
+
+    def setUp(self):
+        cache.clear()
+        reset_stats()
+        self.today = timezone.now().date()
+        self.todo = ToDo.objects.create(name="Cached task", due_date=self.today)
+
+    def test_second_request_is_served_from_cache(self):
+        self.client.get(reverse('todo_list'))
+        # Only the conditional GET validator
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('todo_list'))
+        self.assertContains(response, "Cached task")
+        self.assertEqual(get_stats(), {'hits': 4, 'misses': 4})
+
+    def test_save_invalidates(self):
+        self.client.get(reverse('todo_list'))
+        self.todo.name = "Renamed task"
+        self.todo.save()
+        response = self.client.get(reverse('todo_list'))
+        self.assertContains(response, "Renamed task")
+        self.assertNotContains(response, "Cached task")
+
+    def test_delete_invalidates(self):
+        self.client.get(reverse('todo_list'))
+        self.todo.delete()
+        response = self.client.get(reverse('todo_list'))
+        self.assertNotContains(response, "Cached task")
+        self.assertContains(response, "All caught up!")
+
+    def test_set_status_invalidates(self):
+        self.client.get(reverse('todo_list'))
+        version = get_version()
+        ToDo.objects.filter(pk=self.todo.pk).set_status('done')
+        self.assertNotEqual(get_version(), version)
+        response = self.client.get(reverse('todo_list'))
+        self.assertContains(response, "status-done")
+
+    def test_import_invalidates(self):
+        self.client.get(reverse('todo_list'))
+        import_rows([(1, {'name': "Imported task", 'status': 'pending'})])
+        response = self.client.get(reverse('todo_list'))
+        self.assertContains(response, "Imported task")
+
+    def test_date_rollover_misses(self):
+        self.client.get(reverse('todo_list'))
+        tomorrow = timezone.now() + timedelta(days=1)
+        with mock.patch('todo.dates.timezone.now', return_value=tomorrow):
+            response = self.client.get(reverse('todo_list'))
+        self.assertEqual(get_stats()['hits'], 0)
+        self.assertContains(response, "Overdue Tasks")
+
+    def test_query_string_is_part_of_the_key(self):
+        self.client.get(reverse('todo_list'))
+        self.client.get(reverse('todo_list'), {'other': '1'})
+        self.assertEqual(get_stats(), {'hits': 0, 'misses': 8})
+
+    def test_cached_buckets_still_load_in_context(self):
+        self.client.get(reverse('todo_list'))
+        response = self.client.get(reverse('todo_list'))
+        self.assertEqual(list(response.context['todos_today']), [self.todo])
+
+
+class ConditionalGetTests(TestCase):
+    """Unchanged pages are answered with 304 from one aggregate query"""
+
+    def setUp(self):
+        cache.clear()
+        self.todo = ToDo.objects.create(name="Validated task")
+
+    def get(self, url=None, **headers):
+        return self.client.get(url or reverse('todo_list'), headers=headers)
+
+    def test_etag_returns_304_after_one_query(self):
+        etag = self.get()['ETag']
+        with self.assertNumQueries(1):
+            response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_if_modified_since_returns_304(self):
+        last_modified = self.get()['Last-Modified']
+        response = self.get(if_modified_since=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_search_is_validated(self):
+        url = reverse('todo_search') + '?q=Validated'
+        etag = self.get(url)['ETag']
+        self.assertEqual(self.get(url, if_none_match=etag).status_code, 304)
+
+    def test_update_changes_validator(self):
+        etag = self.get()['ETag']
+        ToDo.objects.filter(pk=self.todo.pk).set_status('done')
+        self.assertEqual(self.get(if_none_match=etag).status_code, 200)
+
+    def test_create_changes_validator(self):
+        etag = self.get()['ETag']
+        ToDo.objects.create(name="Another task")
+        self.assertEqual(self.get(if_none_match=etag).status_code, 200)
+
+    def test_delete_changes_validator(self):
+        # Neither the highest id nor the latest updated_at moves
+        other = ToDo.objects.create(name="Other task")
+        ToDo.objects.create(name="Newest task")
+        response = self.get()
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        # Last-Modified has one-second resolution
+        with mock.patch('todo.models.timezone.now', return_value=timezone.now() + timedelta(minutes=1)):
+            other.delete()
+        self.assertEqual(self.get(if_none_match=etag).status_code, 200)
+        self.assertEqual(self.get(if_modified_since=last_modified).status_code, 200)
+
+    def test_date_rollover_changes_validator(self):
+        etag = self.get()['ETag']
+        tomorrow = timezone.now() + timedelta(days=1)
+        with mock.patch('todo.dates.timezone.now', return_value=tomorrow):
+            self.assertEqual(self.get(if_none_match=etag).status_code, 200)
+
+    def test_pending_messages_get_full_response(self):
+        self.client.get(reverse('todo_mark_done', args=[self.todo.pk]))
+        etag = Client().get(reverse('todo_list'))['ETag']
+        response = self.get(if_none_match=etag)
+        self.assertContains(response, "Task marked as done!")
+
+    def test_post_is_not_validated(self):
+        etag = self.get()['ETag']
+        response = self.client.post(reverse('todo_list'), {'name': "Quick task"}, headers={'if_none_match': etag})
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(TODO_PAGE_SIZE=2)
+class KeysetPaginationTests(TestCase):
+    """Buckets and search results are served a page at a time"""
+
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.todos = [
+            ToDo.objects.create(name=f"Task {i}", due_date=self.today + timedelta(days=i))
+            for i in range(1, 6)
+        ]
+
+    def follow_pages(self, url, param, context_key, params=None):
+        params = dict(params or {})
+        seen = []
+        while True:
+            response = self.client.get(url, params)
+            page = response.context[context_key]
+            seen.extend(page)
+            if not page.has_next:
+                return seen
+            params[param] = page.next_cursor
+
+    def test_bucket_is_limited_to_page_size(self):
+        response = self.client.get(reverse('todo_list'))
+        self.assertEqual(list(response.context['todos_future']), self.todos[:2])
+        self.assertContains(response, "Load more")
+
+    def test_load_more_walks_every_row_once(self):
+        seen = self.follow_pages(reverse('todo_list'), 'future_after', 'todos_future')
+        self.assertEqual(seen, self.todos)
+
+    def test_each_page_is_one_query(self):
+        response = self.client.get(reverse('todo_list'))
+        cursor = response.context['todos_future'].next_cursor
+        with self.assertNumQueries(2):
+            self.client.get(reverse('todo_list'), {'future_after': cursor})
+
+    def test_cursor_is_stable_under_inserts(self):
+        response = self.client.get(reverse('todo_list'))
+        cursor = response.context['todos_future'].next_cursor
+        ToDo.objects.create(name="Inserted before cursor", due_date=self.today + timedelta(days=1))
+        response = self.client.get(reverse('todo_list'), {'future_after': cursor})
+        self.assertEqual(list(response.context['todos_future']), self.todos[2:4])
+
+    def test_cursor_keeps_other_buckets(self):
+        ToDo.objects.create(name="No Date")
+        response = self.client.get(reverse('todo_list'))
+        cursor = response.context['todos_future'].next_cursor
+        response = self.client.get(reverse('todo_list'), {'future_after': cursor})
+        self.assertEqual(response.context['todos_no_date'].count(), 1)
+
+    def test_search_results_are_paginated(self):
+        ToDo.objects.create(name="Task without date")
+        seen = self.follow_pages(reverse('todo_search'), 'after', 'results', {'q': 'Task'})
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(todo.pk for todo in seen)), 6)
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse('todo_list'), {'future_after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_with_bad_values_returns_404(self):
+        def cursor(*key):
+            return base64.urlsafe_b64encode(json.dumps({'key': key, 'seen': 0}).encode()).decode()
+
+        bad = [cursor('not-a-date', 'x', 1), cursor(None, None, None), cursor([], {}, True)]
+        for param in ('future_after', 'today_after', 'overdue_after'):
+            for value in bad:
+                response = self.client.get(reverse('todo_list'), {param: value})
+                self.assertEqual(response.status_code, 404, (param, value))
+        for value in [*bad, cursor('x', 1)]:
+            response = self.client.get(reverse('todo_search'), {'q': 'Task', 'after': value})
+            self.assertEqual(response.status_code, 404, value)
+
+
+class FullTextSearchTests(TestCase):
+    """todo_search is served by the FTS index where available"""
+
+    def setUp(self):
+        if not has_fts():
+            self.skipTest('SQLite FTS5 is not available')
+
+    def search(self, query):
+        return list(self.client.get(reverse('todo_search'), {'q': query}).context['results'])
+
+    def test_search_uses_fts_index(self):
+        ToDo.objects.create(name="Write report")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('todo_search'), {'q': 'report'})
+        self.assertTrue(any(FTS_TABLE in query['sql'] for query in queries))
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        todo = ToDo.objects.create(name="Water plants")
+        self.assertEqual(self.search('plants'), [todo])
+        todo.name = "Water garden"
+        todo.save()
+        self.assertEqual(self.search('plants'), [])
+        self.assertEqual(self.search('garden'), [todo])
+        todo.delete()
+        self.assertEqual(self.search('garden'), [])
+
+    def test_best_match_first(self):
+        weak = ToDo.objects.create(name="Email the whole team about the offsite schedule")
+        strong = ToDo.objects.create(name="Email team")
+        self.assertEqual(self.search('team'), [strong, weak])
+
+    def test_matches_substrings_like_icontains(self):
+        todo = ToDo.objects.create(name="Write report")
+        self.assertEqual(self.search('PORT'), [todo])
+
+    def test_short_query_falls_back_to_icontains(self):
+        todo = ToDo.objects.create(name="Go to gym")
+        matches, keyset = search_todos('go')
+        self.assertNotIn(FTS_TABLE, str(matches.query))
+        self.assertEqual(list(matches), [todo])
+
+    def test_falls_back_without_fts(self):
+        todo = ToDo.objects.create(name="Write report")
+        with mock.patch('todo.search.has_fts', return_value=False):
+            matches, keyset = search_todos('report')
+        self.assertNotIn(FTS_TABLE, str(matches.query))
+        self.assertEqual(list(matches), [todo])
+
+
+class SearchSinglePassTests(TestCase):
+    """todo_search fetches its rows and total in one query
+
+    The other query counted is the conditional GET validator.
+    """
+
+    def setUp(self):
+        for i in range(5):
+            ToDo.objects.create(name=f"Buy item {i}")
+        ToDo.objects.create(name="Write report")
+
+    def test_search_fetches_rows_and_total_together(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('todo_search'), {'q': 'Buy'})
+        self.assertEqual(response.context['count'], 5)
+        self.assertContains(response, "Found 5 results")
+
+    def test_empty_search_fetches_rows_and_total_together(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('todo_search'))
+        self.assertEqual(response.context['count'], 6)
+
+    def test_owner_search_picks_its_plan_first(self):
+        from django.contrib.auth import get_user_model
+        user = get_user_model().objects.create_user('owner')
+        ToDo.objects.update(owner=user)
+        self.client.force_login(user)
+        # Checked once per process, not per request
+        counters.has_counters()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('todo_search'), {'q': 'Buy'})
+        self.assertEqual(response.context['count'], 5)
+        sql = [query['sql'] for query in queries.captured_queries]
+        # The session and the user, then the validator
+        self.assertIn('django_session', sql[0])
+        self.assertIn('auth_user', sql[1])
+        self.assertIn('todo_todotombstone', sql[2])
+        # The owner's total from the counters and the capped count of
+        # matches, which choose the plan (see search_owned)
+        self.assertIn('todo_todocounter', sql[3])
+        self.assertIn(FTS_TABLE, sql[4])
+        # The page and its total
+        self.assertIn('OVER ()', sql[5])
+        self.assertEqual(len(sql), 6)
+
+    def test_no_results_count_is_zero(self):
+        response = self.client.get(reverse('todo_search'), {'q': 'xyz123'})
+        self.assertEqual(response.context['count'], 0)
+
+    @override_settings(TODO_PAGE_SIZE=2)
+    def test_total_is_stable_across_pages(self):
+        params = {'q': 'Buy'}
+        totals = []
+        while True:
+            with self.assertNumQueries(2):
+                response = self.client.get(reverse('todo_search'), params)
+            totals.append(response.context['count'])
+            results = response.context['results']
+            if not results.has_next:
+                break
+            params['after'] = results.next_cursor
+        self.assertEqual(totals, [5, 5, 5])
+
+
+class BulkStatusTests(TestCase):
+    """Many todos change status with one UPDATE"""
+
+    def setUp(self):
+        self.todos = [ToDo.objects.create(name=f"Task {i}") for i in range(3)]
+        self.pks = [todo.pk for todo in self.todos]
+
+    def test_bulk_status_runs_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('todo_bulk_status'), {'pk': self.pks, 'status': 'done'})
+        writes = [query['sql'] for query in queries if not query['sql'].startswith('SELECT')]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('UPDATE'))
+        self.assertEqual(ToDo.objects.filter(status='done').count(), 3)
+
+    def test_bulk_status_returns_count_as_json(self):
+        response = self.client.post(
+            reverse('todo_bulk_status'),
+            {'pk': self.pks[:2] + [9999], 'status': 'skipped'},
+            HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.json(), {'status': 'skipped', 'updated': 2})
+
+    def test_bulk_status_redirects_browsers_with_message(self):
+        response = self.client.post(
+            reverse('todo_bulk_status'), {'pk': self.pks, 'status': 'done'}, follow=True,
+            HTTP_ACCEPT='text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        )
+        self.assertRedirects(response, reverse('todo_list'))
+        self.assertContains(response, "3 tasks marked as done!")
+
+    def test_bulk_status_answers_scripted_clients_with_json(self):
+        for headers in ({}, {'HTTP_ACCEPT': '*/*'}):
+            response = self.client.post(reverse('todo_bulk_status'), {'pk': self.pks, 'status': 'done'}, **headers)
+            self.assertEqual(response.json(), {'status': 'done', 'updated': 3})
+
+    def test_bulk_status_bumps_updated_at(self):
+        before = self.todos[0].updated_at
+        self.client.post(reverse('todo_bulk_status'), {'pk': self.pks, 'status': 'done'})
+        self.todos[0].refresh_from_db()
+        self.assertGreater(self.todos[0].updated_at, before)
+
+    def test_bulk_status_rejects_invalid_input(self):
+        response = self.client.post(reverse('todo_bulk_status'), {'pk': ['x'], 'status': 'done'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('todo_bulk_status'), {'pk': self.pks, 'status': 'bogus'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_status_rejects_out_of_range_ids(self):
+        for pk in ('1' + '0' * 24, str(2**63), '0', '-1'):
+            response = self.client.post(reverse('todo_bulk_status'), {'pk': [pk], 'status': 'done'})
+            self.assertEqual(response.status_code, 400, pk)
+
+    def test_bulk_status_requires_post(self):
+        response = self.client.get(reverse('todo_bulk_status'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_mark_views_return_404_for_missing_todo(self):
+        for name in ['todo_mark_done', 'todo_mark_skipped', 'todo_mark_pending']:
+            response = self.client.get(reverse(name, args=[9999]))
+            self.assertEqual(response.status_code, 404)
+
+
+class StatusTransitionUpdateTests(TestCase):
+    """Status transitions write only status and updated_at"""
+
+    def setUp(self):
+        self.todo = ToDo.objects.create(name="Original", priority="high", status="pending")
+
+    def test_transition_is_a_single_field_limited_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('todo_mark_done', args=[self.todo.pk]))
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql']
+        self.assertTrue(sql.startswith('UPDATE'))
+        set_clause = sql.split(' SET ')[1].split(' WHERE ')[0]
+        self.assertIn('"status"', set_clause)
+        self.assertIn('"updated_at"', set_clause)
+        self.assertNotIn('"name"', set_clause)
+        self.assertNotIn('"priority"', set_clause)
+
+    def test_concurrent_edit_is_not_lost(self):
+        """An edit landing while the transition runs survives it"""
+        set_status = ToDoQuerySet.set_status
+
+        def edit_then_set_status(queryset, status):
+            # Another request renames the task just before our write
+            ToDo.objects.filter(pk=self.todo.pk).update(name="Edited elsewhere")
+            return set_status(queryset, status)
+
+        with mock.patch.object(ToDoQuerySet, 'set_status', edit_then_set_status):
+            self.client.get(reverse('todo_mark_done', args=[self.todo.pk]))
+        self.todo.refresh_from_db()
+        self.assertEqual(self.todo.name, "Edited elsewhere")
+        self.assertEqual(self.todo.status, "done")
+
+    def test_expected_status_guards_the_transition(self):
+        ToDo.objects.filter(pk=self.todo.pk).update(status="skipped")
+        url = reverse('todo_mark_done', args=[self.todo.pk])
+        response = self.client.get(url, {'expected': 'pending'})
+        self.assertEqual(response.status_code, 404)
+        self.todo.refresh_from_db()
+        self.assertEqual(self.todo.status, "skipped")
+        response = self.client.get(url, {'expected': 'skipped'})
+        self.assertEqual(response.status_code, 302)
+        self.todo.refresh_from_db()
+        self.assertEqual(self.todo.status, "done")
+
+    def test_bulk_expected_status_skips_changed_rows(self):
+        other = ToDo.objects.create(name="Already done", status="done")
+        response = self.client.post(
+            reverse('todo_bulk_status'),
+            {'pk': [self.todo.pk, other.pk], 'status': 'skipped', 'expected': 'pending'},
+            HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.json()['updated'], 1)
+        other.refresh_from_db()
+        self.assertEqual(other.status, "done")
+
+
+class TodoTransferTests(TestCase):
+    """Streaming CSV / JSON Lines import and export"""
+
+    def setUp(self):
+        self.today = timezone.now().date()
+
+    def test_export_round_trips_through_import(self):
+        ToDo.objects.create(name="Buy milk", priority="high", due_date=self.today)
+        ToDo.objects.create(name="Call mom, later", status="done")
+        exports = {fmt: ''.join(export_lines(fmt=fmt)) for fmt in ['csv', 'jsonl']}
+        for fmt, exported in exports.items():
+            result = import_rows(read_rows(io.StringIO(exported), fmt))
+            self.assertEqual(result.created, 2)
+            self.assertEqual(result.errors, [])
+        self.assertEqual(ToDo.objects.filter(name="Buy milk", priority="high", due_date=self.today).count(), 3)
+        self.assertEqual(ToDo.objects.filter(name="Call mom, later", status="done").count(), 3)
+
+    def test_import_validates_like_todo_form(self):
+        data = io.StringIO(
+            'name,status,priority,due_date\n'
+            'Valid,pending,low,\n'
+            ',pending,low,\n'
+            'Bad status,bogus,low,\n'
+            'Bad date,pending,low,not-a-date\n'
+            'No priority,pending,,\n'
+        )
+        result = import_rows(read_rows(data, 'csv'))
+        self.assertEqual(result.created, 2)
+        self.assertEqual([line for line, errors in result.errors], [3, 4, 5])
+        self.assertEqual(ToDo.objects.get(name="No priority").priority, "medium")
+
+    def test_import_inserts_in_batches(self):
+        rows = ((i, {'name': f'Task {i}', 'status': 'pending'}) for i in range(25))
+        with CaptureQueriesContext(connection) as queries:
+            result = import_rows(rows, batch_size=10)
+        self.assertEqual(result.created, 25)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 3)
+
+    def test_import_reports_malformed_json_lines(self):
+        data = io.StringIO('{"name": "Fine", "status": "pending"}\nnot json\n')
+        result = import_rows(read_rows(data, 'jsonl'))
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors[0][0], 2)
+
+    def test_commands_round_trip(self):
+        ToDo.objects.create(name="Backed up")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'todos.jsonl')
+            call_command('export_todos', path)
+            ToDo.objects.all().delete()
+            call_command('import_todos', path, stdout=io.StringIO())
+        self.assertTrue(ToDo.objects.filter(name="Backed up").exists())
+
+    def test_import_command_rejects_batch_sizes_below_one(self):
+        for size in ('0', '-5'):
+            with self.assertRaisesMessage(CommandError, '--batch-size must be at least 1'):
+                call_command('import_todos', '-', '--batch-size', size, stdout=io.StringIO())
+
+    def test_export_view_streams(self):
+        ToDo.objects.create(name="Streamed")
+        response = self.client.get(reverse('todo_export'), {'format': 'jsonl'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(json.loads(body)['name'], "Streamed")
+
+    def test_export_view_rejects_unknown_format(self):
+        response = self.client.get(reverse('todo_export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+
+class TodoApiTests(TestCase):
+    """The JSON API under /api/todos/"""
+
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.todos = [
+            ToDo.objects.create(name=f"Task {i}", due_date=self.today + timedelta(days=i), priority=priority)
+            for i, priority in enumerate(['low', 'medium', 'high'])
+        ]
+        self.url = reverse('api_todo_collection')
+
+    def detail_url(self, todo):
+        return reverse('api_todo_detail', args=[todo.pk])
+
+    def send(self, method, url, data):
+        return getattr(self.client, method)(url, json.dumps(data), content_type='application/json')
+
+    def test_list_returns_every_field(self):
+        results = self.client.get(self.url).json()['results']
+        self.assertEqual([row['name'] for row in results], ["Task 0", "Task 1", "Task 2"])
+        self.assertEqual(set(results[0]), {'id', 'name', 'status', 'priority', 'due_date', 'created_at', 'updated_at'})
+
+    def test_list_filters(self):
+        response = self.client.get(self.url, {'priority': 'high'})
+        self.assertEqual([row['name'] for row in response.json()['results']], ["Task 2"])
+        response = self.client.get(self.url, {
+            'due_from': self.today + timedelta(days=1), 'due_to': self.today + timedelta(days=2),
+        })
+        self.assertEqual(len(response.json()['results']), 2)
+        self.todos[0].status = 'done'
+        self.todos[0].save()
+        response = self.client.get(self.url, {'status': 'done'})
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.todos[0].pk])
+
+    def test_list_rejects_bad_filters(self):
+        self.assertEqual(self.client.get(self.url, {'status': 'bogus'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'fields': 'name,secret'}).status_code, 400)
+
+    def test_list_is_keyset_paginated(self):
+        seen, params = [], {'limit': 2}
+        while True:
+            body = self.client.get(self.url, params).json()
+            seen.extend(row['id'] for row in body['results'])
+            if not body['next']:
+                break
+            params['after'] = body['next']
+        self.assertEqual(seen, [todo.pk for todo in self.todos])
+
+    def test_fields_projection_selects_only_those_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'fields': 'id,name'})
+        self.assertEqual(response.json()['results'][0], {'id': self.todos[0].pk, 'name': "Task 0"})
+        self.assertNotIn('"priority"', queries[0]['sql'])
+
+    def test_batch_get_by_ids(self):
+        ids = f'{self.todos[0].pk},{self.todos[2].pk}'
+        response = self.client.get(self.url, {'ids': ids, 'fields': 'id'})
+        self.assertEqual(response.json()['results'], [{'id': self.todos[0].pk}, {'id': self.todos[2].pk}])
+
+    def test_create(self):
+        response = self.send('post', self.url, {'name': "From API", 'due_date': '2030-01-01'})
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['name'], body['status'], body['priority']), ("From API", 'pending', 'medium'))
+        self.assertTrue(ToDo.objects.filter(pk=body['id'], due_date='2030-01-01').exists())
+
+    def test_create_validates(self):
+        response = self.send('post', self.url, {'name': "", 'priority': 'urgent'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'name', 'priority'})
+
+    def test_batch_create_is_all_or_nothing(self):
+        response = self.send('post', self.url, [{'name': "Good"}, {'name': "Bad", 'status': 'bogus'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()['errors']), ['1'])
+        self.assertFalse(ToDo.objects.filter(name="Good").exists())
+
+    def test_batch_create(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.send('post', self.url, [{'name': "One"}, {'name': "Two", 'priority': 'high'}])
+        self.assertEqual(response.status_code, 201)
+        inserts = [query['sql'] for query in queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual([row['name'] for row in response.json()['results']], ["One", "Two"])
+
+    def test_writes_require_json(self):
+        response = self.client.post(self.url, {'name': "Form post"})
+        self.assertEqual(response.status_code, 415)
+
+    def test_partial_update(self):
+        todo = self.todos[1]
+        response = self.send('patch', self.detail_url(todo), {'status': 'done'})
+        self.assertEqual(response.json()['status'], 'done')
+        todo.refresh_from_db()
+        self.assertEqual((todo.status, todo.name, todo.priority), ('done', "Task 1", 'medium'))
+
+    def test_partial_update_rejects_read_only_fields(self):
+        response = self.send('patch', self.detail_url(self.todos[0]), {'created_at': '2000-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_detail_and_missing(self):
+        response = self.client.get(self.detail_url(self.todos[0]), {'fields': 'name'})
+        self.assertEqual(response.json(), {'name': "Task 0"})
+        response = self.client.get(reverse('api_todo_detail', args=[9999]))
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('errors', response.json())
+
+    def test_batch_delete(self):
+        ids = f'{self.todos[0].pk},{self.todos[1].pk}'
+        response = self.client.delete(f'{self.url}?ids={ids}')
+        self.assertEqual(response.json(), {'deleted': 2})
+        self.assertEqual(list(ToDo.objects.values_list('name', flat=True)), ["Task 2"])
+
+    def test_batch_delete_counts_only_tasks(self):
+        Recurrence.objects.create(todo=self.todos[1])
+        response = self.client.delete(f'{self.url}?ids={self.todos[1].pk}')
+        self.assertEqual(response.json(), {'deleted': 1})
+        self.assertFalse(Recurrence.objects.exists())
+
+    def test_out_of_range_ids(self):
+        huge = '1' + '0' * 24
+        for method in ('get', 'delete'):
+            response = getattr(self.client, method)(f'{self.url}?ids={huge}')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('ids', response.json()['errors'])
+        response = self.client.get(f'{self.url}{huge}/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'errors': {'__all__': ['Not found.']}})
+        self.assertEqual(ToDo.objects.count(), 3)
+
+    def test_list_rejects_bad_cursors_as_json(self):
+        bad = base64.urlsafe_b64encode(json.dumps({'key': ['not-a-date', 'x', 1], 'seen': 0}).encode()).decode()
+        for after in ('not-a-cursor', bad):
+            response = self.client.get(self.url, {'after': after})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'errors': {'after': ['Invalid cursor.']}})
+
+    def test_batch_delete_needs_ids(self):
+        self.assertEqual(self.client.delete(self.url).status_code, 400)
+        self.assertEqual(ToDo.objects.count(), 3)
+
+    def test_writes_invalidate_the_dashboard(self):
+        cache.clear()
+        self.client.get(reverse('todo_list'))
+        self.send('post', self.url, [{'name': "Batch created"}])
+        self.assertContains(self.client.get(reverse('todo_list')), "Batch created")
+
+
+@override_settings(ROOT_URLCONF='five.urls_async')
+class AsyncViewTests(TestCase):
+    """The async views served under ASGI"""
+
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.now().date()
+        self.overdue = ToDo.objects.create(name="Async overdue", due_date=self.today - timedelta(days=1))
+        self.future = ToDo.objects.create(name="Async future", due_date=self.today + timedelta(days=1))
+        self.no_date = ToDo.objects.create(name="Async no date")
+
+    async def test_todo_list(self):
+        response = await self.async_client.get(reverse('todo_list'))
+        self.assertContains(response, "Async overdue")
+        self.assertContains(response, "Async no date")
+        self.assertEqual(list(response.context['todos_future']), [self.future])
+
+    async def test_todo_list_quick_add(self):
+        response = await self.async_client.post(reverse('todo_list'), {'name': "Added async"})
+        self.assertRedirects(response, reverse('todo_list'), fetch_redirect_response=False)
+        self.assertTrue(await ToDo.objects.filter(name="Added async").aexists())
+
+    async def test_todo_list_answers_conditional_get(self):
+        response = await self.async_client.get(reverse('todo_list'))
+        response = await self.async_client.get(reverse('todo_list'), headers={'if_none_match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_todo_search(self):
+        response = await self.async_client.get(reverse('todo_search'), {'q': 'future'})
+        self.assertEqual(response.context['count'], 1)
+        self.assertEqual(list(response.context['results']), [self.future])
+
+    async def test_mark_done(self):
+        response = await self.async_client.get(reverse('todo_mark_done', args=[self.overdue.pk]))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual((await ToDo.objects.aget(pk=self.overdue.pk)).status, 'done')
+        response = await self.async_client.get(reverse('todo_mark_done', args=[9999]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_api_round_trip(self):
+        url = reverse('api_todo_collection')
+        response = await self.async_client.post(
+            url, json.dumps([{'name': "Async one"}, {'name': "Async two"}]), content_type='application/json',
+        )
+        created = response.json()['results']
+        self.assertEqual([row['name'] for row in created], ["Async one", "Async two"])
+        detail = reverse('api_todo_detail', args=[created[0]['id']])
+        response = await self.async_client.patch(detail, json.dumps({'status': 'done'}), content_type='application/json')
+        self.assertEqual(response.json()['status'], 'done')
+        response = await self.async_client.get(url, {'status': 'done', 'fields': 'name'})
+        self.assertEqual(response.json(), {'results': [{'name': "Async one"}], 'next': None})
+        response = await self.async_client.delete(f"{url}?ids={created[0]['id']},{created[1]['id']}")
+        self.assertEqual(response.json(), {'deleted': 2})
+
+    async def test_api_out_of_range_ids(self):
+        url = reverse('api_todo_collection')
+        huge = '1' + '0' * 24
+        response = await self.async_client.get(f'{url}{huge}/')
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.delete(f'{url}?ids={huge}')
+        self.assertEqual(response.status_code, 400)
+
+    async def test_api_batch_delete_counts_only_tasks(self):
+        await Recurrence.objects.acreate(todo=self.future)
+        response = await self.async_client.delete(f"{reverse('api_todo_collection')}?ids={self.future.pk}")
+        self.assertEqual(response.json(), {'deleted': 1})
+        response = await self.async_client.get(reverse('api_todo_collection'), {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ConcurrentBucketTests(TransactionTestCase):
+    """Async dashboards load their buckets concurrently where they can"""
+
+    def test_concurrent_buckets_match_single_query(self):
+        today = timezone.now().date()
+        ToDo.objects.create(name="Overdue", due_date=today - timedelta(days=1))
+        ToDo.objects.create(name="Today", due_date=today)
+        ToDo.objects.create(name="No date")
+        expected = load_dashboard(today)
+        # The in-memory test database is visible to every connection in
+        # this process once committed
+        with mock.patch('todo.dashboard.can_query_concurrently', return_value=True):
+            with mock.patch('todo.dashboard.load_bucket', wraps=load_bucket) as loader:
+                pages = async_to_sync(aload_dashboard)(today)
+        self.assertEqual(loader.call_count, len(BUCKETS))
+        self.assertEqual(pages, expected)
+
+    def test_sqlite_loads_in_one_query(self):
+        self.assertFalse(can_query_concurrently())
+
+
+class SqliteProfileTests(TestCase):
+    """Database profiles tune SQLite through a connection_created hook"""
+
+    def connect(self, name):
+        default = connections['default']
+        wrapper = type(default)({**default.settings_dict, 'NAME': name}, alias='profile_test')
+        self.addCleanup(wrapper.close)
+        return wrapper.cursor()
+
+    def test_pragmas_run_on_new_connections(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(TODO_SQLITE_PRAGMAS=DB_PROFILES['performance']['pragmas']):
+            cursor = self.connect(os.path.join(directory, 'profile.sqlite3'))
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.close()
+
+    def test_default_profile_leaves_sqlite_alone(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(TODO_SQLITE_PRAGMAS={}):
+            cursor = self.connect(os.path.join(directory, 'plain.sqlite3'))
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'delete')
+            cursor.close()
+
+    def test_performance_profile_keeps_connections(self):
+        database = DB_PROFILES['performance']['database']
+        self.assertEqual(database['CONN_MAX_AGE'], 600)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertEqual(database['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+
+
+class ToDoCounterTests(TestCase):
+    """Badge counts come from counters kept by triggers on todo_todo"""
+
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.now().date()
+        self.yesterday = self.today - timedelta(days=1)
+
+    def assertCountersMatch(self):
+        self.assertEqual(counters.verify(), [])
+
+    def test_counters_are_installed(self):
+        self.assertTrue(counters.has_counters())
+
+    def test_create_update_delete_keep_counters(self):
+        todo = ToDo.objects.create(name="Counted", due_date=self.yesterday, priority='high')
+        self.assertEqual(counters.summary(self.today)['overdue'], 1)
+        todo.status = 'done'
+        todo.save()
+        self.assertEqual(counters.summary(self.today)['overdue'], 0)
+        todo.delete()
+        self.assertCountersMatch()
+        self.assertFalse(any(counters.stored_counts().values()))
+
+    def test_bulk_operations_keep_counters(self):
+        ToDo.objects.bulk_create([ToDo(name=f"Bulk {i}", due_date=self.today) for i in range(5)])
+        ToDo.objects.filter(name__in=["Bulk 0", "Bulk 1"]).set_status('done')
+        ToDo.objects.filter(name="Bulk 2").update(due_date=None, priority='high')
+        ToDo.objects.filter(name="Bulk 3").delete()
+        self.assertCountersMatch()
+        counts = counters.summary(self.today)
+        self.assertEqual((counts['today'], counts['no_date'], counts['pending']), (3, 1, 2))
+
+    def test_counters_roll_back_with_the_transaction(self):
+        try:
+            with transaction.atomic():
+                ToDo.objects.create(name="Rolled back", due_date=self.today)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(counters.summary(self.today)['today'], 0)
+
+    def test_summary_matches_counting_the_table(self):
+        ToDo.objects.create(name="Overdue high", due_date=self.yesterday, priority='high')
+        ToDo.objects.create(name="Today", due_date=self.today, status='skipped')
+        ToDo.objects.create(name="Later", due_date=self.today + timedelta(days=3))
+        ToDo.objects.create(name="Someday", priority='high')
+        with mock.patch('todo.counters.has_counters', return_value=False):
+            counted = counters.summary(self.today)
+        self.assertEqual(counters.summary(self.today), counted)
+        self.assertEqual(counted, {
+            'overdue': 1, 'today': 1, 'future': 1, 'no_date': 1, 'pending': 3, 'pending_high': 2,
+        })
+
+    def test_summary_is_one_query(self):
+        ToDo.objects.create(name="Task", due_date=self.today)
+        with self.assertNumQueries(1):
+            counters.summary(self.today)
+
+    def test_badges_are_shown(self):
+        ToDo.objects.create(name="Overdue high", due_date=self.yesterday, priority='high')
+        response = self.client.get(reverse('todo_list'))
+        self.assertContains(response, '<span data-summary="overdue">1</span> overdue', html=True)
+        self.assertContains(response, '<span data-summary="today">0</span> today', html=True)
+        self.assertContains(response, '<span data-summary="pending_high">1</span> pending high-priority', html=True)
+
+    def test_rebuild_and_verify_command(self):
+        ToDo.objects.create(name="Task", due_date=self.today)
+        ToDoCounter.objects.update(count=42)
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('todo_counters', 'verify', stdout=out, stderr=io.StringIO())
+        call_command('todo_counters', 'rebuild', stdout=out)
+        call_command('todo_counters', 'verify', stdout=out)
+        self.assertIn("Counters match", out.getvalue())
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        benchmarks.RESULTS.clear()
+        self.addCleanup(benchmarks.RESULTS.clear)
+
+    def test_summarize_reports_percentiles(self):
+        stats = benchmarks.summarize([float(n) for n in range(1, 101)])
+        self.assertEqual(stats['min'], 1)
+        self.assertEqual(stats['p50'], 50.5)
+        self.assertEqual(stats['p95'], 96)
+        self.assertEqual(stats['p99'], 100)
+
+    def test_compare_flags_slow_timings_and_extra_queries(self):
+        baseline = {'views': {'1000': {
+            'todo_list': {'p50': 10.0, 'p95': 20.0, 'queries': 3},
+            'todo_search': {'p50': 10.0, 'p95': 20.0, 'queries': 2},
+        }}}
+        results = {'views': {'1000': {
+            'todo_list': {'p50': 12.0, 'p95': 30.0, 'queries': 3},
+            'todo_search': {'p50': 10.0, 'p95': 20.0, 'queries': 3},
+            'todo_create': {'p50': 99.0, 'p95': 99.0, 'queries': 9},
+        }}}
+        regressions = benchmarks.compare(results, baseline, threshold=0.25)
+        self.assertEqual(len(regressions), 2)
+        self.assertIn('todo_list: p95 20.00ms -> 30.00ms', regressions[0])
+        self.assertIn('todo_search: 2 -> 3 queries', regressions[1])
+
+    def test_over_budget_flags_measurements_past_their_ceiling(self):
+        budgets = {'startup': {'lean_setup': {'p50': 100}, 'full_setup': {'p50': 200}}}
+        results = {'startup': {'1000': {
+            'lean_setup': {'p50': 120.0, 'p95': 300.0},
+            'full_setup': {'p50': 150.0},
+            'lean_first_response': {'p50': 999.0},
+        }}}
+        failures = benchmarks.over_budget(results, budgets)
+        self.assertEqual(failures, ['startup rows=1000 lean_setup: p50 120.00ms over the 100ms budget'])
+
+    def test_budgets_fail_the_command_only_when_asked(self):
+        from .management.commands import benchmark as command
+
+        def slow(report, rows, repeat):
+            benchmarks.record('startup', rows, 'lean_setup', {'p50': 10_000.0})
+
+        with mock.patch.dict(command.SCENARIOS, {'slow': slow}, clear=True), \
+                mock.patch.object(command, 'seed_todos'), \
+                mock.patch.object(connection.creation, 'create_test_db'), \
+                mock.patch.object(connection.creation, 'destroy_test_db'), \
+                mock.patch.object(command.settings, 'DEBUG', False):
+            stderr = io.StringIO()
+            call_command('benchmark', 'slow', '--rows', '10', stdout=io.StringIO(), stderr=stderr)
+            self.assertIn('over the 150ms budget', stderr.getvalue())
+            with self.assertRaises(CommandError):
+                call_command('benchmark', 'slow', '--rows', '10', '--budget', stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_startup_serves_the_api_under_each_settings_module(self):
+        import subprocess
+        import sys
+        from django.conf import settings
+        from . import startup
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, 'startup.sqlite3')
+            benchmarks.copy_database(database)
+            for settings_module in startup.SETTINGS.values():
+                output = subprocess.run(
+                    [sys.executable, '-m', 'todo.startup', settings_module, '--database', database],
+                    cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+                ).stdout
+                timings = json.loads(output)
+                self.assertEqual(sorted(timings), ['first_response', 'setup'])
+                self.assertGreater(timings['setup'], 0)
+
+    def test_views_scenario_records_each_view(self):
+        benchmarks.seed_todos(30)
+        benchmarks.bench_views(lambda line: None, 30, repeat=2)
+        measurements = benchmarks.RESULTS['views']['30']
+        self.assertIn('admin_changelist', measurements)
+        self.assertIn('todo_mark_done', measurements)
+        for stats in measurements.values():
+            self.assertGreater(stats['queries'], 0)
+            self.assertIn('p95', stats)
+            self.assertIn('peak_mib', stats)
+
+
+def instrumented_settings():
+    from django.conf import settings
+    templates = [{**settings.TEMPLATES[0], 'BACKEND': 'todo.instrumentation.TimedDjangoTemplates'}]
+    middleware = ['todo.instrumentation.RequestTimingMiddleware', *settings.MIDDLEWARE]
+    return override_settings(MIDDLEWARE=middleware, TEMPLATES=templates, TODO_INSTRUMENTATION_LOG_MS=0)
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ToDo.objects.create(name='Timed task')
+
+    def timings(self, response):
+        entries = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            entries[name] = dict(param.split('=', 1) for param in params)
+        return entries
+
+    def test_server_timing_header(self):
+        with instrumented_settings(), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('todo_list'))
+        timings = self.timings(response)
+        self.assertEqual(timings['db']['desc'], f'"{len(queries)} queries"')
+        self.assertGreater(float(timings['template']['dur']), 0)
+        self.assertGreaterEqual(float(timings['total']['dur']), float(timings['db']['dur']))
+        self.assertLessEqual(float(timings['db-slowest']['dur']), float(timings['db']['dur']))
+
+    def test_logs_one_json_line_per_request(self):
+        with instrumented_settings(), self.assertLogs('todo.instrumentation') as logs:
+            self.client.get(reverse('todo_search'), {'q': 'Timed'})
+        data = json.loads(logs.records[0].getMessage())
+        self.assertEqual(data['view'], 'todo_search')
+        self.assertEqual(data['status'], 200)
+        self.assertGreater(data['queries'], 0)
+
+    def test_fast_requests_below_threshold_are_not_logged(self):
+        with instrumented_settings(), override_settings(TODO_INSTRUMENTATION_LOG_MS=60_000):
+            with self.assertNoLogs('todo.instrumentation'):
+                response = self.client.get(reverse('todo_list'))
+        self.assertIn('Server-Timing', response)
+
+    @override_settings(ROOT_URLCONF='five.urls_async')
+    def test_async_views_count_queries(self):
+        with instrumented_settings():
+            response = async_to_sync(self.async_client.get)(reverse('todo_list'))
+        self.assertNotEqual(self.timings(response)['db']['desc'], '"0 queries"')
+
+    def test_uninstrumented_requests_have_no_header(self):
+        response = self.client.get(reverse('todo_list'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_request_timings_command_aggregates_per_view(self):
+        lines = [
+            'junk line',
+            *(f'2025-01-01 12:00:00 {{"view": "todo_list", "queries": 3, "sql_ms": {n}, '
+              f'"slowest_sql_ms": 1, "template_ms": 2, "total_ms": {n * 10}}}' for n in range(1, 101)),
+            '{"view": "todo_search", "queries": 2, "sql_ms": 1, "slowest_sql_ms": 1, '
+            '"template_ms": 1, "total_ms": 5}',
+        ]
+        summary = instrumentation.aggregate(instrumentation.read_log(lines))
+        self.assertEqual(summary['todo_list']['count'], 100)
+        self.assertEqual(summary['todo_list']['total_ms']['p95'], 960)
+        self.assertEqual(summary['todo_search']['queries']['max'], 2)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.log', delete=False) as stream:
+            stream.write('\n'.join(lines))
+        self.addCleanup(os.remove, stream.name)
+        out = io.StringIO()
+        call_command('request_timings', stream.name, stdout=out)
+        self.assertLess(out.getvalue().index('todo_list'), out.getvalue().index('todo_search'))
+        self.assertIn('p95=960ms', out.getvalue())
+
+
+class RowRenderingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        today = timezone.now().date()
+        self.pending = ToDo.objects.create(name='Late', due_date=today - timedelta(days=1))
+        self.done = ToDo.objects.create(name='Finished', status='done')
+
+    def test_row_links_match_reversed_urls(self):
+        response = self.client.get(reverse('todo_list'))
+        for name in ['todo_mark_done', 'todo_mark_skipped', 'todo_edit', 'todo_delete']:
+            self.assertContains(response, f'href="{reverse(name, args=[self.pending.pk])}"')
+        self.assertContains(response, f'href="{reverse("todo_mark_pending", args=[self.done.pk])}"')
+
+    def test_actions_are_reversed_once_per_render(self):
+        ToDo.objects.bulk_create(ToDo(name=f'Task {i}') for i in range(20))
+        with mock.patch.object(dashboard, 'reverse', wraps=reverse) as reversed_urls:
+            self.client.get(reverse('todo_list'))
+        self.assertEqual(reversed_urls.call_count, len(dashboard.ROW_ACTIONS))
+
+    def test_prefixes_follow_the_script_prefix(self):
+        from django.urls import set_script_prefix
+        self.addCleanup(set_script_prefix, '/')
+        set_script_prefix('/todos/')
+        self.assertEqual(dashboard.row_url_prefixes()['mark_done'], '/todos/mark-done/')
+
+
+class StaticAssetTests(TestCase):
+    def test_pages_link_the_shared_stylesheet(self):
+        todo = ToDo.objects.create(name='Styled')
+        for url in [reverse('todo_list'), reverse('todo_search'), reverse('todo_create'),
+                    reverse('todo_delete', args=[todo.pk])]:
+            response = self.client.get(url)
+            self.assertContains(response, 'href="/static/todo/todo.css"')
+            self.assertNotContains(response, '<style>')
+
+    def test_collectstatic_writes_hashed_compressed_files_served_with_long_cache(self):
+        from django.templatetags.static import static
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        storages = {
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+        }
+        with override_settings(STATIC_ROOT=root, STORAGES=storages,
+                               WHITENOISE_USE_FINDERS=False, WHITENOISE_AUTOREFRESH=False):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            url = static('todo/todo.css')
+            self.assertRegex(url, r'^/static/todo/todo\.[0-9a-f]{12}\.css$')
+            path = os.path.join(root, url.removeprefix('/static/'))
+            self.assertTrue(os.path.exists(f'{path}.gz'))
+            self.assertTrue(os.path.exists(f'{path}.br'))
+            response = Client().get(url, headers={'accept-encoding': 'br'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn('immutable', response['Cache-Control'])
+
+
+class CompressionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ToDo.objects.bulk_create(ToDo(name=f'Task {i}') for i in range(20))
+
+    def test_brotli_when_accepted(self):
+        import brotli
+        response = self.client.get(reverse('todo_list'), headers={'accept-encoding': 'gzip, deflate, br'})
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        html = brotli.decompress(response.content)
+        self.assertIn(b'Task 19', html)
+        self.assertLess(len(response.content), len(html) / 4)
+
+    def test_gzip_without_brotli(self):
+        import gzip
+        response = self.client.get(reverse('todo_search'), headers={'accept-encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'Search Tasks', gzip.decompress(response.content))
+
+    def test_brotli_refused_with_zero_quality(self):
+        response = self.client.get(reverse('todo_list'), headers={'accept-encoding': 'gzip, br;q=0'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        response = self.client.get(reverse('todo_list'), headers={'accept-encoding': 'br;q=0'})
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_pages_reflecting_input_get_padded_gzip(self):
+        import gzip
+        for query in ({'q': 'Task'}, {'future_after': ''}):
+            response = self.client.get(reverse('todo_list'), query, headers={'accept-encoding': 'gzip, br'})
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+        response = self.client.post(reverse('todo_create'), {'name': ''}, headers={'accept-encoding': 'gzip, br'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'<form', gzip.decompress(response.content))
+
+    def test_identity_and_not_modified_responses_are_untouched(self):
+        response = self.client.get(reverse('todo_list'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        not_modified = self.client.get(
+            reverse('todo_list'), headers={'if-none-match': response['ETag'], 'accept-encoding': 'br'},
+        )
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertFalse(not_modified.has_header('Content-Encoding'))
+
+
+class RecordingBroker(events.BaseBroker):
+    def __init__(self):
+        self.events = []
+
+    def publish(self, event):
+        self.events.append(event)
+
+
+@override_settings(TODO_EVENTS_BROKER='todo.tests.RecordingBroker')
+class LiveEventTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.broker = events.get_broker()
+        self.broker.events.clear()
+        self.today = timezone.now().date()
+
+    def test_bucket_for(self):
+        yesterday = self.today - timedelta(days=1)
+        self.assertEqual(live.bucket_for(ToDo(due_date=None), self.today), 'no_date')
+        self.assertEqual(live.bucket_for(ToDo(due_date=self.today), self.today), 'today')
+        self.assertEqual(live.bucket_for(ToDo(due_date=self.today + timedelta(days=1)), self.today), 'future')
+        self.assertEqual(live.bucket_for(ToDo(due_date=yesterday), self.today), 'overdue')
+        self.assertIsNone(live.bucket_for(ToDo(due_date=yesterday, status='done'), self.today))
+
+    def test_created_event_carries_row_position_and_counts(self):
+        later = ToDo.objects.create(name='Later', due_date=self.today + timedelta(days=5))
+        with self.captureOnCommitCallbacks(execute=True):
+            todo = ToDo.objects.create(name='Sooner', due_date=self.today + timedelta(days=1))
+        [event] = self.broker.events
+        self.assertEqual(event['type'], 'created')
+        self.assertEqual(event['id'], todo.pk)
+        self.assertEqual(event['bucket'], 'future')
+        self.assertEqual(event['before'], later.pk)
+        self.assertIn(f'value="{todo.pk}"', event['html'])
+        self.assertIn(reverse('todo_mark_done', args=[todo.pk]), event['html'])
+        self.assertNotIn('<h3>', event['html'])
+        self.assertEqual(event['summary']['today'], 0)
+
+    def test_nothing_is_built_before_commit(self):
+        ToDo.objects.create(name='Uncommitted')
+        self.assertEqual(self.broker.events, [])
+
+    def test_deleted_event(self):
+        todo = ToDo.objects.create(name='Gone', due_date=self.today)
+        pk = todo.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            todo.delete()
+        [event] = self.broker.events
+        self.assertEqual(event['type'], 'deleted')
+        self.assertEqual(event['id'], pk)
+        self.assertEqual(event['summary']['today'], 0)
+
+    def test_status_change_sends_updated_rows(self):
+        todo = ToDo.objects.create(name='Overdue', due_date=self.today - timedelta(days=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('todo_mark_done', args=[todo.pk]))
+        [event] = self.broker.events
+        self.assertEqual(event['type'], 'updated')
+        # Done tasks past their date leave the dashboard
+        self.assertIsNone(event['bucket'])
+        self.assertIsNone(event['html'])
+
+    def test_large_bulk_changes_reload(self):
+        ToDo.objects.bulk_create(ToDo(name=f'Task {i}') for i in range(events.MAX_ROW_EVENTS + 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            ToDo.objects.all().set_status('done')
+        self.assertEqual(self.broker.events, [{'type': 'reload'}])
+
+    def test_sse_message_format(self):
+        self.assertEqual(events.format_event(None), ': keepalive\n\n')
+        self.assertEqual(
+            events.format_event({'type': 'deleted', 'id': 3}),
+            'event: deleted\ndata: {"type": "deleted", "id": 3}\n\n',
+        )
+
+
+class BrokerTests(TestCase):
+    def test_in_process_broker_delivers_across_threads(self):
+        broker = events.InProcessBroker()
+
+        async def listen():
+            stream = broker.subscribe(keepalive=5)
+            first = asyncio.ensure_future(anext(stream))
+            while not broker.wants_events():
+                await asyncio.sleep(0)
+            publisher = threading.Thread(target=broker.publish, args=[{'type': 'deleted', 'id': 1}])
+            publisher.start()
+            event = await first
+            publisher.join()
+            await stream.aclose()
+            return event
+
+        self.assertEqual(async_to_sync(listen)(), {'type': 'deleted', 'id': 1})
+        self.assertFalse(broker.wants_events())
+
+    def test_in_process_broker_sends_keepalives_and_reloads_when_behind(self):
+        broker = events.InProcessBroker(max_queued=2)
+
+        async def listen():
+            stream = broker.subscribe(keepalive=0.01)
+            self.assertIsNone(await anext(stream))
+            for pk in range(3):
+                broker.publish({'type': 'deleted', 'id': pk})
+            event = await anext(stream)
+            await stream.aclose()
+            return event
+
+        self.assertEqual(async_to_sync(listen)(), {'type': 'reload'})
+
+    def test_cache_broker_reads_events_published_elsewhere(self):
+        cache.clear()
+        broker = events.CacheBroker(poll_interval=0.01)
+
+        async def listen():
+            stream = broker.subscribe(keepalive=5)
+            first = asyncio.ensure_future(anext(stream))
+            await asyncio.sleep(0.02)
+            await sync_to_async(events.CacheBroker().publish)({'type': 'deleted', 'id': 1})
+            await sync_to_async(events.CacheBroker().publish)({'type': 'deleted', 'id': 2})
+            received = [await first, await anext(stream)]
+            await stream.aclose()
+            return received
+
+        self.assertEqual(async_to_sync(listen)(), [{'type': 'deleted', 'id': 1}, {'type': 'deleted', 'id': 2}])
+
+
+@override_settings(ROOT_URLCONF='five.urls_async')
+class EventStreamViewTests(TestCase):
+    def test_list_loads_the_live_script_under_asgi(self):
+        response = async_to_sync(self.async_client.get)(reverse('todo_list'))
+        self.assertContains(response, 'todo/live.js')
+        self.assertContains(response, f'data-events-url="{reverse("todo_events")}"')
+
+    def test_stream_sends_published_events(self):
+        broker = events.get_broker()
+
+        async def listen():
+            response = await self.async_client.get(reverse('todo_events'), headers={'accept-encoding': 'gzip, br'})
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            self.assertFalse(response.has_header('Content-Encoding'))
+            stream = aiter(response.streaming_content)
+            self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+            message = asyncio.ensure_future(anext(stream))
+            while not broker.wants_events():
+                await asyncio.sleep(0)
+            broker.publish({'type': 'reload'})
+            return await message
+
+        self.assertEqual(async_to_sync(listen)(), b'event: reload\ndata: {"type": "reload"}\n\n')
+
+    def test_sync_list_has_no_live_updates(self):
+        with override_settings(ROOT_URLCONF='five.urls'):
+            response = self.client.get(reverse('todo_list'))
+        self.assertNotContains(response, 'live.js')
+
+
+class AsOfDateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.now().date()
+        self.yesterday = self.today - timedelta(days=1)
+        self.late = ToDo.objects.create(name='Late', due_date=self.yesterday)
+        ToDo.objects.create(name='Late but done', due_date=self.yesterday, status='done')
+        ToDo.objects.create(name='Due today', due_date=self.today)
+        ToDo.objects.create(name='No date')
+
+    def test_with_overdue_annotates_in_sql(self):
+        overdue = dict(ToDo.objects.with_overdue(self.today).values_list('name', 'overdue'))
+        self.assertEqual(overdue, {'Late': True, 'Late but done': False, 'Due today': False, 'No date': False})
+        tomorrow = self.today + timedelta(days=1)
+        self.assertTrue(ToDo.objects.with_overdue(tomorrow).get(name='Due today').overdue)
+
+    def test_is_overdue_reads_the_annotation_without_the_clock(self):
+        todos = list(ToDo.objects.with_overdue(self.today).order_by('pk'))
+        with mock.patch.object(ToDo, 'is_overdue_on') as is_overdue_on:
+            self.assertEqual([todo.is_overdue for todo in todos], [True, False, False, False])
+        is_overdue_on.assert_not_called()
+
+    def test_as_of_is_fixed_for_the_request(self):
+        from .dates import as_of
+        request = RequestFactory().get('/')
+        first = as_of(request)
+        with mock.patch('todo.dates.timezone.now', return_value=timezone.now() + timedelta(days=1)):
+            self.assertEqual(as_of(request), first)
+            self.assertEqual(as_of(RequestFactory().get('/')), first + timedelta(days=1))
+
+    def test_page_rendered_across_midnight_uses_one_date(self):
+        before, after = timezone.now(), timezone.now() + timedelta(days=1)
+        with mock.patch('todo.dates.timezone.now', side_effect=[before, after, after]):
+            response = self.client.get(reverse('todo_list'))
+        self.assertEqual(response.context['today'], before.date())
+        self.assertContains(response, "Today&#x27;s Tasks")
+
+    def test_search_marks_overdue_rows(self):
+        response = self.client.get(reverse('todo_search'), {'q': 'Late'})
+        results = {todo.name: todo.overdue for todo in response.context['results']}
+        self.assertEqual(results, {'Late': True, 'Late but done': False})
+        self.assertContains(response, '(overdue)', count=1)
+
+    def test_admin_changelist_shows_overdue_column(self):
+        from django.contrib.auth import get_user_model
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        with mock.patch.object(ToDo, 'is_overdue_on') as is_overdue_on:
+            response = self.client.get(reverse('admin:todo_todo_changelist'))
+        is_overdue_on.assert_not_called()
+        self.assertContains(response, 'column-overdue')
+        self.assertContains(response, 'icon-yes.svg', count=1)
+
+
+class AdminChangelistTests(TestCase):
+    """The ToDo changelist stays cheap however large the table grows"""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        cache.clear()
+        self.today = timezone.now().date()
+        self.url = reverse('admin:todo_todo_changelist')
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+
+    def create_todos(self, count, **fields):
+        ToDo.objects.bulk_create([ToDo(name=f'Task {i}', **fields) for i in range(count)])
+
+    def test_unfiltered_count_comes_from_the_counters(self):
+        self.create_todos(3)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['cl'].result_count, 3)
+        counts = [query['sql'] for query in queries.captured_queries if 'COUNT(' in query['sql']]
+        self.assertFalse([sql for sql in counts if 'FROM "todo_todo"' in sql])
+
+    def test_filtered_count_is_capped(self):
+        from .admin import CappedCountPaginator
+        self.create_todos(5, status='done')
+        with mock.patch.object(CappedCountPaginator, 'count_cap', 3):
+            response = self.client.get(self.url, {'status__exact': 'done'})
+        cl = response.context['cl']
+        self.assertEqual(cl.result_count, 3)
+        self.assertIsNone(cl.full_result_count)
+        self.assertContains(response, '3+ Todos')
+
+    def test_due_filter_uses_the_dashboard_buckets(self):
+        yesterday = self.today - timedelta(days=1)
+        ToDo.objects.create(name='Late', due_date=yesterday)
+        ToDo.objects.create(name='Late but done', due_date=yesterday, status='done')
+        ToDo.objects.create(name='Due today', due_date=self.today)
+        ToDo.objects.create(name='Someday')
+        names = {}
+        for bucket in BUCKETS:
+            response = self.client.get(self.url, {'due': bucket})
+            names[bucket] = {todo.name for todo in response.context['cl'].result_list}
+        self.assertEqual(names, {
+            'overdue': {'Late'}, 'today': {'Due today'}, 'future': set(), 'no_date': {'Someday'},
+        })
+
+    def test_search_uses_the_fts_index(self):
+        ToDo.objects.create(name='Buy groceries')
+        ToDo.objects.create(name='Walk the dog')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'q': 'grocer'})
+        self.assertEqual([todo.name for todo in response.context['cl'].result_list], ['Buy groceries'])
+        if has_fts():
+            self.assertTrue(any(' MATCH ' in query['sql'] for query in queries.captured_queries))
+
+    def test_common_search_terms_walk_the_index_instead(self):
+        ToDo.objects.create(name='Buy groceries')
+        ToDo.objects.create(name='More groceries')
+        with mock.patch('todo.admin.FTS_MATCH_LIMIT', 2):
+            response = self.client.get(self.url, {'q': 'groceries'})
+        self.assertEqual(response.context['cl'].queryset.query.annotations.keys() & {'rank'}, set())
+        self.assertEqual(len(response.context['cl'].result_list), 2)
+
+    def test_status_actions_run_one_update(self):
+        self.create_todos(3)
+        pks = list(ToDo.objects.values_list('pk', flat=True))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {
+                'action': 'mark_done', '_selected_action': pks[:2],
+            }, follow=True)
+        updates = [query for query in queries.captured_queries if query['sql'].startswith('UPDATE "todo_todo"')]
+        self.assertEqual(len(updates), 1)
+        self.assertContains(response, '2 tasks marked as done.')
+        self.assertEqual(ToDo.objects.filter(status='done').count(), 2)
+
+    def test_date_hierarchy_matches_the_dates_present(self):
+        dates = [self.today.replace(year=2024, month=3, day=5), self.today.replace(year=2024, month=3, day=9),
+                 self.today.replace(year=2024, month=7, day=1), self.today.replace(year=2026, month=1, day=2)]
+        ToDo.objects.bulk_create([ToDo(name=str(due), due_date=due) for due in dates])
+        ToDo.objects.create(name='Someday')
+
+        def choices(params):
+            from .templatetags.todo_admin import bounded_date_hierarchy
+            response = self.client.get(self.url, params)
+            return [choice['title'] for choice in bounded_date_hierarchy(response.context['cl'])['choices']]
+
+        self.assertEqual(choices({}), ['2024', '2026'])
+        self.assertEqual(choices({'due_date__year': 2024}), ['March 2024', 'July 2024'])
+        self.assertEqual(choices({'due_date__year': 2024, 'due_date__month': 3}), ['March 5', 'March 9'])
+        self.assertEqual(choices({'due_date__year': 2024, 'due_date__month': 3, 'due_date__day': 9}), ['March 9'])
+        # A single year starts at its months, a single month at its days
+        self.assertEqual(choices({'q': '2024-03'}), ['March 5', 'March 9'])
+
+    def test_date_hierarchy_seeks_instead_of_scanning(self):
+        ToDo.objects.bulk_create([
+            ToDo(name=f'Task {i}', due_date=self.today.replace(year=2020 + i % 5)) for i in range(50)
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('DISTINCT', sql)
+        self.assertNotIn('MIN(', sql)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {'due_date__year': 2022})
+        exists = [query for query in queries.captured_queries if 'EXISTS' in query['sql']]
+        self.assertEqual(len(exists), 1)
+
+    def test_date_periods_seek_on_their_own_bounds(self):
+        from datetime import date
+        from .templatetags.todo_admin import within
+        ToDo.objects.bulk_create([ToDo(name=f'Task {i}', due_date=date(2022, 1 + i % 12, 1)) for i in range(24)])
+        changelist = ToDo.objects.filter(due_date__gte=date(2022, 1, 1), due_date__lt=date(2023, 1, 1))
+        for queryset in (changelist, search_todos('Task', changelist)[0]):
+            march = within(queryset, 'due_date', date(2022, 3, 1), date(2022, 4, 1))
+            self.assertEqual(march.count(), 2)
+            # SQLite seeks on the first bound given for a column, so the
+            # month's must come before the changelist's year
+            params = [value for value in march.query.sql_with_params()[1] if value[:4] == '2022']
+            self.assertEqual(params[:2], ['2022-03-01', '2022-04-01'])
+        plan = within(changelist, 'due_date', date(2022, 3, 1), date(2022, 4, 1)).explain()
+        self.assertIn('todo_due_created_idx (due_date>? AND due_date<?)', plan)
+
+    def test_benchmark_scenario_runs_on_small_tables(self):
+        self.addCleanup(benchmarks.RESULTS.clear)
+        benchmarks.seed_todos(300)
+        benchmarks.bench_admin(lambda line: None, 300, repeat=1)
+        self.assertIn('last_page', benchmarks.RESULTS['admin']['300'])
+
+
+class RecurrenceTests(TestCase):
+    """Recurring tasks are rules expanded for the dates shown, not rows"""
+
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.now().date()
+        self.yesterday = self.today - timedelta(days=1)
+        self.tomorrow = self.today + timedelta(days=1)
+
+    def repeat(self, name, start, **rule):
+        todo = ToDo.objects.create(name=name, due_date=start)
+        return Recurrence.objects.create(todo=todo, **rule)
+
+    def rows(self, page):
+        return [(row.name, row.due_date, row.is_occurrence, row.status) for row in page]
+
+    def test_dates_follow_the_rule(self):
+        start = self.today
+        rule = Recurrence(todo=ToDo(due_date=start), frequency='weekly', interval=2, until=start + timedelta(weeks=6))
+        weeks = [start + timedelta(weeks=n) for n in (2, 4, 6)]
+        self.assertEqual(list(rule.dates(start)), weeks)
+        self.assertEqual(list(rule.dates(start + timedelta(days=15))), weeks[1:])
+        self.assertEqual(list(rule.dates(start, start + timedelta(weeks=4))), weeks[:2])
+        self.assertTrue(rule.occurs_on(weeks[0]))
+        self.assertFalse(rule.occurs_on(start))
+        self.assertFalse(rule.occurs_on(start + timedelta(weeks=1)))
+        self.assertFalse(rule.occurs_on(start + timedelta(weeks=8)))
+
+    def test_only_tasks_with_a_due_date_repeat(self):
+        from django.core.exceptions import ValidationError
+        with self.assertRaises(ValidationError):
+            Recurrence(todo=ToDo(name='Someday')).full_clean(exclude=['todo'])
+        with self.assertRaises(ValidationError):
+            Recurrence(todo=ToDo(due_date=self.today), until=self.yesterday).full_clean(exclude=['todo'])
+
+    def test_today_and_future_merge_occurrences_with_rows(self):
+        self.repeat('Water plants', self.yesterday)
+        ToDo.objects.create(name='Dentist', due_date=self.tomorrow)
+        ToDo.objects.create(name='Call mom', due_date=self.today)
+        pages = load_dashboard(self.today, page_size=3)
+        self.assertEqual(self.rows(pages['today']), [
+            ('Call mom', self.today, False, 'pending'),
+            ('Water plants', self.today, True, 'pending'),
+        ])
+        self.assertEqual(self.rows(pages['future']), [
+            ('Dentist', self.tomorrow, False, 'pending'),
+            ('Water plants', self.tomorrow, True, 'pending'),
+            ('Water plants', self.tomorrow + timedelta(days=1), True, 'pending'),
+        ])
+        self.assertTrue(pages['future'].has_next)
+        # The series' own ToDo is the only row: missed days are not overdue
+        self.assertEqual(self.rows(pages['overdue']), [('Water plants', self.yesterday, False, 'pending')])
+
+    def test_occurrences_page_with_the_keyset(self):
+        self.repeat('Stretch', self.today)
+        dates = []
+        cursor = None
+        for _ in range(3):
+            page = load_dashboard(self.today, {'future': cursor}, page_size=2, buckets=['future'])['future']
+            dates += [row.due_date for row in page]
+            cursor = page.next_cursor
+        self.assertEqual(dates, [self.today + timedelta(days=n) for n in range(1, 7)])
+
+    def test_bad_cursors_with_rules_return_404(self):
+        self.repeat('Stretch', self.today)
+        for key in (['not-a-date', 'x', 1], [None, timezone.now().isoformat(), 1]):
+            cursor = base64.urlsafe_b64encode(json.dumps({'key': key, 'seen': 0}).encode()).decode()
+            for param in ('today_after', 'future_after'):
+                response = self.client.get(reverse('todo_list'), {param: cursor})
+                self.assertEqual(response.status_code, 404, (param, key))
+
+    def test_rules_that_ended_generate_nothing(self):
+        self.repeat('Course', self.today - timedelta(days=10), until=self.yesterday)
+        pages = load_dashboard(self.today)
+        self.assertEqual(list(pages['today']) + list(pages['future']), [])
+
+    def test_occurrence_status_is_stored_as_an_exception(self):
+        rule = self.repeat('Water plants', self.yesterday)
+        url = reverse('todo_occurrence_status', args=[rule.pk, self.tomorrow.isoformat(), 'done'])
+        response = self.client.get(url)
+        self.assertRedirects(response, reverse('todo_list'))
+        self.assertEqual(ToDo.objects.count(), 1)
+        self.assertEqual(list(rule.exceptions.values_list('date', 'status')), [(self.tomorrow, 'done')])
+        future = self.client.get(reverse('todo_list')).context['todos_future']
+        self.assertEqual(future[0].status, 'done')
+
+        self.client.get(reverse('todo_occurrence_status', args=[rule.pk, self.tomorrow.isoformat(), 'pending']))
+        self.assertFalse(RecurrenceException.objects.exists())
+
+    def test_only_generated_dates_can_be_marked(self):
+        rule = self.repeat('Weekly review', self.today, frequency='weekly')
+        for day, status in [
+            (self.tomorrow.isoformat(), 'done'),
+            (self.today.isoformat(), 'done'),
+            ('not-a-date', 'done'),
+            ((self.today + timedelta(weeks=1)).isoformat(), 'finished'),
+        ]:
+            response = self.client.get(reverse('todo_occurrence_status', args=[rule.pk, day, status]))
+            self.assertEqual(response.status_code, 404)
+        self.assertFalse(RecurrenceException.objects.exists())
+
+    def test_occurrence_changes_change_the_etag(self):
+        rule = self.repeat('Water plants', self.today)
+        etag = self.client.get(reverse('todo_list'))['ETag']
+        rule.set_status(self.tomorrow, 'skipped')
+        response = self.client.get(reverse('todo_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.context['todos_future'][0].status, 'skipped')
+
+    def test_rendered_occurrences_link_to_their_date(self):
+        rule = self.repeat('Water plants', self.yesterday)
+        response = self.client.get(reverse('todo_list'))
+        done_url = reverse('todo_occurrence_status', args=[rule.pk, self.today.isoformat(), 'done'])
+        self.assertContains(response, f'href="{done_url}"')
+        # Only the series' own row can be selected for bulk changes
+        self.assertContains(response, f'value="{rule.pk}"', count=1)
+
+    def test_today_badge_counts_occurrences(self):
+        self.repeat('Water plants', self.yesterday)
+        self.repeat('Every other day', self.yesterday, interval=2)
+        self.assertEqual(counters.cached_summary(self.today)['today'], 1)
+
+    @override_settings(ROOT_URLCONF='five.urls_async')
+    async def test_occurrences_render_under_asgi(self):
+        rule = await sync_to_async(self.repeat)('Water plants', self.yesterday)
+        response = await self.async_client.get(reverse('todo_list'))
+        done_url = reverse('todo_occurrence_status', args=[rule.pk, self.today.isoformat(), 'done'])
+        self.assertContains(response, f'href="{done_url}"')
+
+
+class ArchiveTests(TestCase):
+    """Old done and skipped tasks move to the archive and can come back"""
+
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.now().date()
+        self.month_ago = timezone.now() - timedelta(days=31)
+
+    def create(self, name, status='done', age=None, **fields):
+        todo = ToDo.objects.create(name=name, status=status, **fields)
+        if age is not None:
+            ToDo.objects.filter(pk=todo.pk).update(updated_at=timezone.now() - age)
+        return todo
+
+    def test_only_old_finished_tasks_are_archived(self):
+        old_done = self.create('Old done', age=timedelta(days=31), due_date=self.today)
+        old_skipped = self.create('Old skipped', 'skipped', timedelta(days=31))
+        self.create('Old pending', 'pending', timedelta(days=31))
+        self.create('Recent done', age=timedelta(days=1))
+        series = self.create('Old series', age=timedelta(days=31), due_date=self.today)
+        Recurrence.objects.create(todo=series)
+        ToDo.objects.filter(pk=series.pk).update(updated_at=self.month_ago)
+
+        self.assertEqual(archive_todos(timedelta(days=30), batch_size=1), 2)
+        self.assertEqual(
+            sorted(ToDo.objects.values_list('name', flat=True)),
+            ['Old pending', 'Old series', 'Recent done'],
+        )
+        archived = ArchivedToDo.objects.get(pk=old_done.pk)
+        self.assertEqual(
+            (archived.name, archived.status, archived.due_date, archived.created_at),
+            (old_done.name, old_done.status, old_done.due_date, old_done.created_at),
+        )
+        self.assertTrue(ArchivedToDo.objects.filter(pk=old_skipped.pk).exists())
+        self.assertEqual(counters.verify(), [])
+
+    def test_archived_tasks_leave_the_dashboard_and_search(self):
+        todo = self.create('Water plants', age=timedelta(days=31), due_date=self.today)
+        etag = self.client.get(reverse('todo_list'))['ETag']
+        archive_todos(timedelta(days=30))
+        response = self.client.get(reverse('todo_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Water plants')
+
+        response = self.client.get(reverse('todo_search'), {'q': 'plants'})
+        self.assertEqual(response.context['count'], 0)
+        self.assertIsNone(response.context['archived'])
+        response = self.client.get(reverse('todo_search'), {'q': 'plants', 'archived': '1'})
+        self.assertEqual([row.pk for row in response.context['archived']], [todo.pk])
+        self.assertContains(response, reverse('todo_restore', args=[todo.pk]))
+
+    def test_restore_brings_the_task_back(self):
+        todo = self.create('Water plants', age=timedelta(days=31), due_date=self.today)
+        archive_todos(timedelta(days=30))
+        response = self.client.post(reverse('todo_restore', args=[todo.pk]))
+        self.assertRedirects(response, reverse('todo_list'))
+        restored = ToDo.objects.get(pk=todo.pk)
+        self.assertEqual((restored.name, restored.created_at), (todo.name, todo.created_at))
+        self.assertGreater(restored.updated_at, todo.updated_at)
+        self.assertFalse(ArchivedToDo.objects.exists())
+        self.assertEqual(counters.verify(), [])
+        self.assertEqual(list(search_todos('plants')[0]), [restored])
+        self.assertContains(self.client.get(reverse('todo_list')), 'Water plants')
+
+        self.assertEqual(self.client.post(reverse('todo_restore', args=[todo.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('todo_restore', args=[todo.pk])).status_code, 405)
+
+    def test_archive_todos_command(self):
+        todo = self.create('Old done', age=timedelta(days=31))
+        out = io.StringIO()
+        call_command('archive_todos', '--older-than', '30', stdout=out)
+        self.assertIn('Archived 1 todo(s)', out.getvalue())
+        call_command('archive_todos', '--restore', str(todo.pk), stdout=out)
+        self.assertIn('Restored 1 todo(s)', out.getvalue())
+        self.assertTrue(ToDo.objects.filter(pk=todo.pk).exists())
+        with self.assertRaises(CommandError):
+            call_command('archive_todos', stdout=out)
+
+    def test_admin_restore_action(self):
+        from django.contrib.auth import get_user_model
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        todo = self.create('Old done', age=timedelta(days=31))
+        archive_todos(timedelta(days=30))
+        url = reverse('admin:todo_archivedtodo_changelist')
+        self.assertEqual(self.client.get(url).context['cl'].result_count, 1)
+        response = self.client.post(url, {'action': 'restore', '_selected_action': [todo.pk]}, follow=True)
+        self.assertContains(response, '1 task restored.')
+        self.assertTrue(ToDo.objects.filter(pk=todo.pk).exists())
+
+
+class OwnershipTests(TestCase):
+    """Each user sees and changes only their own tasks; anonymous requests see the unowned ones"""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        cache.clear()
+        self.today = timezone.now().date()
+        User = get_user_model()
+        self.alice = User.objects.create_user('alice', password='password')
+        self.bob = User.objects.create_user('bob', password='password')
+        self.mine = ToDo.objects.create(name="Alice's task", due_date=self.today, owner=self.alice)
+        self.theirs = ToDo.objects.create(name="Bob's task", due_date=self.today, owner=self.bob)
+        self.unowned = ToDo.objects.create(name="Nobody's task", due_date=self.today)
+
+    def test_dashboard_and_changes_are_scoped_to_the_user(self):
+        self.client.force_login(self.alice)
+        response = self.client.get(reverse('todo_list'))
+        self.assertEqual(list(response.context['todos_today']), [self.mine])
+        self.assertEqual(response.context['summary']['today'], 1)
+        self.assertNotContains(response, "Bob's task")
+
+        for name in ('todo_edit', 'todo_delete', 'todo_mark_done'):
+            self.assertEqual(self.client.get(reverse(name, args=[self.theirs.pk])).status_code, 404)
+        self.client.post(reverse('todo_bulk_status'), {'pk': [self.mine.pk, self.theirs.pk], 'status': 'done'})
+        self.assertEqual(ToDo.objects.get(pk=self.theirs.pk).status, 'pending')
+        self.assertEqual(ToDo.objects.get(pk=self.mine.pk).status, 'done')
+
+        self.client.post(reverse('todo_list'), {'name': 'Added by Alice'})
+        self.assertEqual(ToDo.objects.get(name='Added by Alice').owner, self.alice)
+        response = self.client.get(reverse('todo_search'), {'q': 'task'})
+        self.assertEqual(list(response.context['results']), [self.mine])
+
+        self.client.logout()
+        response = self.client.get(reverse('todo_list'))
+        self.assertEqual(list(response.context['todos_today']), [self.unowned])
+
+    def test_cached_sections_and_validators_are_per_user(self):
+        self.client.force_login(self.alice)
+        etag = self.client.get(reverse('todo_list'))['ETag']
+        self.client.force_login(self.bob)
+        response = self.client.get(reverse('todo_list'), headers={'if_none_match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, reverse('todo_edit', args=[self.theirs.pk]))
+        self.assertNotContains(response, reverse('todo_edit', args=[self.mine.pk]))
+
+    def test_validator_changes_when_a_task_changes_owner(self):
+        # A later unowned task keeps the highest id and updated_at of the unowned rows
+        later = ToDo.objects.create(name='Later task')
+        url = reverse('todo_search')
+        etag = self.client.get(url, {'q': 'task'})['ETag']
+        self.unowned.owner = self.alice
+        self.unowned.save()
+        response = self.client.get(url, {'q': 'task'}, headers={'if_none_match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['results']), [later])
+
+    def test_api_is_scoped_to_the_user(self):
+        self.client.force_login(self.alice)
+        url = reverse('api_todo_collection')
+        response = self.client.post(url, json.dumps({'name': 'Via the API'}), content_type='application/json')
+        self.assertEqual(ToDo.objects.get(pk=response.json()['id']).owner, self.alice)
+        response = self.client.get(url, {'fields': 'name'})
+        self.assertEqual(response.json()['results'], [{'name': 'Via the API'}, {'name': "Alice's task"}])
+        self.assertEqual(self.client.get(reverse('api_todo_detail', args=[self.theirs.pk])).status_code, 404)
+        response = self.client.delete(f'{url}?ids={self.theirs.pk}')
+        self.assertEqual(response.json(), {'deleted': 0})
+
+    async def test_async_views_are_scoped_to_the_user(self):
+        await self.async_client.aforce_login(self.alice)
+        response = await self.async_client.get(reverse('todo_list'))
+        self.assertEqual(list(response.context['todos_today']), [self.mine])
+        response = await self.async_client.get(reverse('todo_mark_done', args=[self.theirs.pk]))
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get(reverse('api_todo_collection'), {'fields': 'id'})
+        self.assertEqual(response.json()['results'], [{'id': self.mine.pk}])
+
+    def test_dashboard_queries_lead_on_the_owner(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Query plan assertions are written for SQLite')
+        plan = benchmarks.explain(dashboard.dashboard_queryset(self.today, owner=self.alice))
+        self.assertIn('todo_owner_status_due_idx (owner_id=? AND status=? AND due_date<?)', plan)
+        self.assertIn('todo_owner_due_created_idx (owner_id=? AND due_date>?)', plan)
+
+    def test_counters_and_search_per_owner(self):
+        ToDo.objects.create(name="Alice's errand", owner=self.alice)
+        self.assertEqual(counters.summary(self.today, self.alice)['no_date'], 1)
+        self.assertEqual(counters.owned_total(self.alice), 2)
+        ToDo.objects.filter(pk=self.theirs.pk).update(owner=self.alice)
+        self.assertEqual(counters.summary(self.today, self.alice)['today'], 2)
+        self.assertEqual(counters.summary(self.today, self.bob)['today'], 0)
+        self.assertEqual(counters.verify(), [])
+
+        scanned, keyset = search_owned('task', self.alice)
+        self.assertEqual(keyset, dashboard.TODO_KEYSET)
+        self.assertEqual(sorted(todo.pk for todo in scanned), [self.mine.pk, self.theirs.pk])
+        with mock.patch.object(search, 'OWNER_SCAN_LIMIT', 0):
+            matches, _ = search_owned('task', self.alice)
+            self.assertEqual(sorted(todo.pk for todo in matches), [self.mine.pk, self.theirs.pk])
+
+    def test_live_events_carry_the_owner(self):
+        event = live.saved_events(self.mine, created=False)[0]
+        self.assertEqual(event['owner'], self.alice.pk)
+        self.assertTrue(events.for_owner(event, self.alice.pk))
+        self.assertFalse(events.for_owner(event, None))
+        self.assertTrue(events.for_owner({'type': 'reload'}, self.bob.pk))
+
+    def test_archive_keeps_the_owner(self):
+        ToDo.objects.filter(pk=self.mine.pk).update(status='done', updated_at=timezone.now() - timedelta(days=31))
+        archive_todos(timedelta(days=30))
+        self.assertEqual(ArchivedToDo.objects.get(pk=self.mine.pk).owner, self.alice)
+        self.client.force_login(self.bob)
+        response = self.client.get(reverse('todo_search'), {'q': 'task', 'archived': '1'})
+        self.assertEqual(list(response.context['archived']), [])
+        self.assertEqual(self.client.post(reverse('todo_restore', args=[self.mine.pk])).status_code, 404)
+        self.client.force_login(self.alice)
+        self.client.post(reverse('todo_restore', args=[self.mine.pk]))
+        self.assertEqual(ToDo.objects.get(pk=self.mine.pk).owner, self.alice)
+
+    def test_admin_shows_staff_only_their_own_tasks(self):
+        from django.contrib.auth.models import Permission
+        self.alice.is_staff = True
+        self.alice.save()
+        self.alice.user_permissions.add(*Permission.objects.filter(codename__in=['view_todo', 'add_todo']))
+        self.client.force_login(self.alice)
+        response = self.client.get(reverse('admin:todo_todo_changelist'))
+        self.assertEqual(list(response.context['cl'].result_list), [self.mine])
+        self.client.post(reverse('admin:todo_todo_add'), {
+            'name': 'From the admin', 'status': 'pending', 'priority': 'medium',
+            'recurrence-TOTAL_FORMS': '0', 'recurrence-INITIAL_FORMS': '0',
+        })
+        self.assertEqual(ToDo.objects.get(name='From the admin').owner, self.alice)
+
+    def test_import_command_and_default_owner_migration(self):
+        from importlib import import_module
+        from django.apps import apps
+        from django.core.exceptions import ImproperlyConfigured
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as stream:
+            stream.write(json.dumps({'name': 'Imported for Bob', 'status': 'pending'}) + '\n')
+        self.addCleanup(os.remove, stream.name)
+        call_command('import_todos', stream.name, '--owner', 'bob', stdout=io.StringIO())
+        self.assertEqual(ToDo.objects.get(name='Imported for Bob').owner, self.bob)
+        with self.assertRaises(CommandError):
+            call_command('import_todos', stream.name, '--owner', 'nobody', stdout=io.StringIO())
+
+        migration = import_module('todo.migrations.0012_todo_default_owner')
+        with override_settings(TODO_DEFAULT_OWNER='nobody'), self.assertRaises(ImproperlyConfigured):
+            migration.assign_default_owner(apps, None)
+        with override_settings(TODO_DEFAULT_OWNER='alice'):
+            migration.assign_default_owner(apps, None)
+        self.assertEqual(ToDo.objects.get(pk=self.unowned.pk).owner, self.alice)
+        self.assertEqual(counters.verify(), [])
+
+
+class OwnerMigrationTests(TransactionTestCase):
+    """Rolling back the owner migration keeps the search and counter triggers"""
+
+    def triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' ORDER BY name")
+            return [row[0] for row in cursor.fetchall()]
+
+    def migrate(self, target):
+        from django.db.migrations.executor import MigrationExecutor
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([target])
+
+    def test_backwards_reinstalls_triggers(self):
+        from django.db.migrations.loader import MigrationLoader
+        leaf = MigrationLoader(connection).graph.leaf_nodes('todo')[0]
+        installed = self.triggers()
+        self.assertEqual(len(installed), 6)
+        self.addCleanup(self.migrate, leaf)
+
+        self.migrate(('todo', '0010_archivedtodo'))
+        self.assertEqual(self.triggers(), installed)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO todo_todo (name, status, priority, created_at, updated_at) "
+                "VALUES ('Rolled back', 'pending', 'medium', %s, %s)",
+                [timezone.now(), timezone.now()],
+            )
+            cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH '\"Rolled\"'")
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute("SELECT SUM(count) FROM todo_todocounter WHERE status = 'pending'")
+            self.assertEqual(cursor.fetchone()[0], 1)
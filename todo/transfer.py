@@ -0,0 +1,115 @@
+"""Streaming import and export of ToDo rows as CSV or JSON Lines
+
+Both directions work a row at a time: exports read the table with
+``iterator()`` and yield text, imports validate each row with the same
+rules as ``TodoForm`` and insert in ``bulk_create`` batches, one
+transaction per batch. Memory stays flat however large the file is.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+
+from . import events
+from .caching import invalidate
+
+from .forms import TodoImportForm
+from .models import ToDo
+
+FORMATS = ['csv', 'jsonl']
+
+EXPORT_FIELDS = ['id', 'name', 'status', 'priority', 'due_date', 'created_at', 'updated_at']
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def format_for_path(path, default='csv'):
+    """Guess the format from a file extension"""
+    for fmt in FORMATS:
+        if str(path).endswith(f'.{fmt}'):
+            return fmt
+    if str(path).endswith('.ndjson'):
+        return 'jsonl'
+    return default
+
+
+class Echo:
+    """A file-like object whose write() returns the text it was given"""
+
+    def write(self, value):
+        return value
+
+
+def export_lines(queryset=None, fmt='csv', chunk_size=2000):
+    """Yield ``queryset`` as CSV or JSON Lines text, one line at a time"""
+    if queryset is None:
+        queryset = ToDo.objects.all()
+    rows = queryset.order_by('pk').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    if fmt == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(EXPORT_FIELDS, row)), default=str) + '\n'
+
+
+def read_rows(stream, fmt='csv'):
+    """Yield ``(line_number, data)`` pairs from a CSV or JSON Lines stream"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for data in reader:
+            yield reader.line_num, data
+    else:
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                data = None
+            yield line_number, data
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+
+def import_rows(rows, batch_size=1000, owner=None):
+    """Validate ``(line_number, data)`` pairs and bulk insert the valid ones as ``owner``'s
+
+    Invalid rows are skipped and reported in ``ImportResult.errors`` as
+    ``(line_number, form.errors)``. Each batch commits on its own, so a
+    failure part way through keeps the batches already written.
+    """
+    result = ImportResult()
+    todos = validated(rows, result, owner)
+    while True:
+        batch = list(islice(todos, batch_size))
+        if not batch:
+            return result
+        with transaction.atomic():
+            ToDo.objects.bulk_create(batch, batch_size=batch_size)
+            # bulk_create sends no post_save signals
+            invalidate()
+            events.rows_changed.send(sender=ToDo, pks=None)
+        result.created += len(batch)
+
+
+def validated(rows, result, owner=None):
+    for line_number, data in rows:
+        if not isinstance(data, dict):
+            result.errors.append((line_number, {'__all__': ['Expected a JSON object.']}))
+            continue
+        form = TodoImportForm(data=data, instance=ToDo(owner=owner))
+        if form.is_valid():
+            yield form.save(commit=False)
+        else:
+            result.errors.append((line_number, form.errors))
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.todo_list, name='todo_list'),
@@ -9,5 +9,11 @@ urlpatterns = [
     path('mark-done/<int:pk>/', views.todo_mark_done, name='todo_mark_done'),
     path('mark-skipped/<int:pk>/', views.todo_mark_skipped, name='todo_mark_skipped'),
     path('mark-pending/<int:pk>/', views.todo_mark_pending, name='todo_mark_pending'),
+    path('recurring/<int:pk>/<str:day>/<str:status>/', views.todo_occurrence_status, name='todo_occurrence_status'),
+    path('bulk-status/', views.todo_bulk_status, name='todo_bulk_status'),
+    path('restore/<int:pk>/', views.todo_restore, name='todo_restore'),
     path('search/', views.todo_search, name='todo_search'),
+    path('export/', views.todo_export, name='todo_export'),
+    path('api/todos/', api.todo_collection, name='api_todo_collection'),
+    path('api/todos/<int:pk>/', api.todo_detail, name='api_todo_detail'),
 ]
\ No newline at end of file
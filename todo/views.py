@@ -1,14 +1,37 @@
+from datetime import date
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.utils import timezone
-from datetime import timedelta
-from .models import ToDo
-from .forms import TodoForm, QuickAddForm
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.template.defaultfilters import pluralize
+from django.views.decorators.http import require_POST
+from .models import ArchivedToDo, Recurrence, ToDo
+from .forms import TodoForm, QuickAddForm, BulkStatusForm
+from .dashboard import render_dashboard, OVERDUE, TODAY, FUTURE, NO_DATE, TODO_KEYSET
+from .search import search_owned
+from .conditional import todo_table_condition
+from .counters import cached_summary
+from .dates import as_of
+from .owners import owner_of
+from .archive import ARCHIVE_KEYSET, restore_todos, search_archive
+from .transfer import CONTENT_TYPES, FORMATS, export_lines
 
+def lists_html(request):
+    """Whether the Accept header names ``text/html``, as browser form posts do
+
+    ``request.accepts('text/html')`` is also true for ``*/*`` and for no
+    header at all, which is what scripted clients send.
+    """
+    return any(media.main_type == 'text' and media.sub_type == 'html' for media in request.accepted_types)
+
+def owned_todos(request):
+    """The tasks ``request`` may see and change"""
+    return ToDo.objects.owned_by(owner_of(request))
+
+@todo_table_condition
 def todo_list(request):
     """Display all todos with quick add form"""
     if request.method == 'POST':
-        form = QuickAddForm(request.POST)
+        form = QuickAddForm(request.POST, instance=ToDo(owner=owner_of(request)))
         if form.is_valid():
             form.save()
             messages.success(request, 'Task created successfully!')
@@ -16,19 +39,20 @@ def todo_list(request):
     else:
         form = QuickAddForm()
     
-    # Get todos organized by date
-    today = timezone.now().date()
-    todos_today = ToDo.objects.filter(due_date=today)
-    todos_overdue = ToDo.objects.filter(due_date__lt=today, status='pending')
-    todos_future = ToDo.objects.filter(due_date__gt=today)
-    todos_no_date = ToDo.objects.filter(due_date__isnull=True)
+    # Get todos organized by date: cached sections where possible, the
+    # remaining buckets in one query
+    today = as_of(request)
+    fragments, buckets = render_dashboard(request, today)
     
     context = {
         'form': form,
-        'todos_today': todos_today,
-        'todos_overdue': todos_overdue,
-        'todos_future': todos_future,
-        'todos_no_date': todos_no_date,
+        'bucket_fragments': fragments,
+        'has_todos': any(fragment.strip() for fragment in fragments),
+        'summary': cached_summary(today, owner_of(request)),
+        'todos_today': buckets[TODAY],
+        'todos_overdue': buckets[OVERDUE],
+        'todos_future': buckets[FUTURE],
+        'todos_no_date': buckets[NO_DATE],
         'today': today,
     }
     return render(request, 'todo/todo_list.html', context)
@@ -36,7 +60,7 @@ def todo_list(request):
 def todo_create(request):
     """Create a new todo"""
     if request.method == 'POST':
-        form = TodoForm(request.POST)
+        form = TodoForm(request.POST, instance=ToDo(owner=owner_of(request)))
         if form.is_valid():
             form.save()
             messages.success(request, 'Task created successfully!')
@@ -49,7 +73,7 @@ def todo_create(request):
 
 def todo_edit(request, pk):
     """Edit an existing todo"""
-    todo = get_object_or_404(ToDo, pk=pk)
+    todo = get_object_or_404(owned_todos(request), pk=pk)
     
     if request.method == 'POST':
         form = TodoForm(request.POST, instance=todo)
@@ -65,7 +89,7 @@ def todo_edit(request, pk):
 
 def todo_delete(request, pk):
     """Delete a todo"""
-    todo = get_object_or_404(ToDo, pk=pk)
+    todo = get_object_or_404(owned_todos(request), pk=pk)
     
     if request.method == 'POST':
         todo.delete()
@@ -75,46 +99,132 @@ def todo_delete(request, pk):
     context = {'todo': todo}
     return render(request, 'todo/todo_confirm_delete.html', context)
 
+STATUS_MESSAGES = {
+    'done': (messages.success, 'marked as done!'),
+    'skipped': (messages.info, 'marked as skipped.'),
+    'pending': (messages.info, 'marked as pending.'),
+}
+
+def apply_status(todos, status, expected=None):
+    """Set ``status`` on ``todos`` with a single conditional UPDATE
+
+    Only ``status`` and ``updated_at`` are written, so concurrent edits to
+    other fields survive. With ``expected``, rows whose status has
+    changed since the caller last saw it are left alone.
+    """
+    if expected:
+        todos = todos.filter(status=expected)
+    return todos.set_status(status)
+
+@require_POST
+def todo_bulk_status(request):
+    """Apply one status to a list of todos and report how many changed"""
+    form = BulkStatusForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    status = form.cleaned_data['status']
+    todos = owned_todos(request).filter(pk__in=form.cleaned_data['pk'])
+    updated = apply_status(todos, status, form.cleaned_data['expected'])
+    if not lists_html(request):
+        return JsonResponse({'status': status, 'updated': updated})
+    notify, text = STATUS_MESSAGES[status]
+    notify(request, f'{updated} task{pluralize(updated)} {text}')
+    return redirect('todo_list')
+
+def mark_status(request, pk, status):
+    """Single-item status change: ``UPDATE ... WHERE pk=? [AND status=?]``
+
+    ``?expected=<status>`` makes the change conditional on the current
+    status. Returns 404 when no row matched.
+    """
+    expected = request.GET.get('expected')
+    if not apply_status(owned_todos(request).filter(pk=pk), status, expected):
+        raise Http404('No Todo matches the given query.')
+    notify, text = STATUS_MESSAGES[status]
+    notify(request, f'Task {text}')
+    return redirect('todo_list')
+
 def todo_mark_done(request, pk):
     """Mark a todo as done"""
-    todo = get_object_or_404(ToDo, pk=pk)
-    todo.status = 'done'
-    todo.save()
-    messages.success(request, f'Task "{todo.name}" marked as done!')
-    return redirect('todo_list')
+    return mark_status(request, pk, 'done')
 
 def todo_mark_skipped(request, pk):
     """Mark a todo as skipped"""
-    todo = get_object_or_404(ToDo, pk=pk)
-    todo.status = 'skipped'
-    todo.save()
-    messages.info(request, f'Task "{todo.name}" marked as skipped.')
-    return redirect('todo_list')
+    return mark_status(request, pk, 'skipped')
 
 def todo_mark_pending(request, pk):
     """Mark a todo as pending (undo done/skipped)"""
-    todo = get_object_or_404(ToDo, pk=pk)
-    todo.status = 'pending'
-    todo.save()
-    messages.info(request, f'Task "{todo.name}" marked as pending.')
+    return mark_status(request, pk, 'pending')
+
+def todo_occurrence_status(request, pk, day, status):
+    """Set the status of one occurrence of a recurring todo
+
+    Stored as an exception to the rule; back to pending removes it.
+    Returns 404 for dates the rule doesn't generate.
+    """
+    recurrence = get_object_or_404(
+        Recurrence.objects.select_related('todo').filter(todo__owner=owner_of(request)), pk=pk,
+    )
+    try:
+        day = date.fromisoformat(day)
+    except ValueError:
+        raise Http404('Invalid date')
+    if status not in STATUS_MESSAGES or not recurrence.occurs_on(day):
+        raise Http404('No occurrence matches the given query.')
+    recurrence.set_status(day, status)
+    notify, text = STATUS_MESSAGES[status]
+    notify(request, f'Task {text}')
     return redirect('todo_list')
 
 # Search Feature
 
+@todo_table_condition
 def todo_search(request):
-    """Search for todos by name"""
+    """Search for todos by name, one page at a time"""
     query = request.GET.get('q', '')
+    owner = owner_of(request)
     
     if query:
-        # Case-insensitive search
-        results = ToDo.objects.filter(name__icontains=query)
+        # Case-insensitive substring search, best matches first where
+        # the full-text index is available
+        matches, keyset = search_owned(query, owner)
     else:
-        # Empty query returns all tasks
-        results = ToDo.objects.all()
+        # Empty query returns all of the owner's tasks
+        matches, keyset = ToDo.objects.owned_by(owner), TODO_KEYSET
+    # The total comes from a window count in the same query as the rows
+    results = keyset.paginate(matches.with_overdue(as_of(request)), request.GET.get('after'), with_total=True)
+    # The archive is only searched on request, with its own cursor
+    include_archived = bool(request.GET.get('archived'))
+    archived = None
+    if include_archived:
+        archived = ARCHIVE_KEYSET.paginate(
+            search_archive(query, owner), request.GET.get('archived_after'), with_total=True,
+        )
     
     context = {
         'results': results,
         'query': query,
-        'count': results.count()
+        'count': results.total,
+        'include_archived': include_archived,
+        'archived': archived,
     }
-    return render(request, 'todo/todo_search.html', context)
\ No newline at end of file
+    return render(request, 'todo/todo_search.html', context)
+
+@require_POST
+def todo_restore(request, pk):
+    """Move an archived todo back to the task list"""
+    if not restore_todos([pk], ArchivedToDo.objects.owned_by(owner_of(request))):
+        raise Http404('No archived Todo matches the given query.')
+    messages.success(request, 'Task restored!')
+    return redirect('todo_list')
+
+# Export
+
+def todo_export(request):
+    """Stream every todo the request sees as CSV or JSON Lines (?format=csv|jsonl)"""
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in FORMATS:
+        return HttpResponseBadRequest(f'Unknown format {fmt!r}')
+    response = StreamingHttpResponse(export_lines(owned_todos(request), fmt=fmt), content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="todos.{fmt}"'
+    return response